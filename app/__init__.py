@@ -2,6 +2,14 @@ import os
 from flask import Flask
 from flask_login import LoginManager
 from .models import db, User  # Import User model for Flask-Login
+from .achievements import init_achievements
+from .database import database_uri_from_env, engine_options, init_database
+from .jobs import init_job_queue
+from .leaderboard import init_leaderboard
+from .notifications import init_notifications
+from .progress_cache import init_progress_cache
+from .skill_tree import init_skill_tree
+from .user_cache import init_user_cache, get_user_cache
 from config import Config  # Import Config from the root level
 
 
@@ -23,19 +31,37 @@ def create_app(test_config=None):
     # Configure app from mapping (overrides Config and sets instance path correctly for dev)
     app.config.from_mapping(
         SECRET_KEY='dev',
-        # Use Flask's instance_path for the DB file location
-        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(app.instance_path, 'sololeveling.db'),
+        # DATABASE_URL (e.g. a pooled server database) wins; otherwise use
+        # Flask's instance_path for the SQLite DB file location
+        SQLALCHEMY_DATABASE_URI=database_uri_from_env() or
+            'sqlite:///' + os.path.join(app.instance_path, 'sololeveling.db'),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
     )
 
+    # Test configuration (e.g. an in-memory database) overrides the defaults
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+
     # ensure the instance folder exists
     try:
         os.makedirs(app.instance_path)
     except OSError:
         pass
 
+    # Pool options depend on the final database URI
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], app.config.get('SQLALCHEMY_ENGINE_OPTIONS'))
+
     # Initialize extensions
     db.init_app(app)
+    init_database(app, db)
+    init_achievements(app)
+    init_progress_cache(app)
+    init_user_cache(app)
+    init_job_queue(app)
+    init_notifications(app)
+    init_leaderboard(app)
+    init_skill_tree(app)
 
     # Initialize Flask-Login
     login_manager = LoginManager()
@@ -45,12 +71,17 @@ def create_app(test_config=None):
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return get_user_cache().load(int(user_id))
 
     # Register application blueprints (routes)
     from .main_routes import main_bp
     app.register_blueprint(main_bp)
 
+    # Register the activity/API endpoints (quest completion, stat activities,
+    # /api/progress). Registered after `main` so its pages take precedence.
+    from .routes import main_bp as activity_bp
+    app.register_blueprint(activity_bp, name='activity')
+
     # Register personal development blueprint
     from .pd_routes import pd_bp
     app.register_blueprint(pd_bp, url_prefix='/pd')
@@ -0,0 +1,209 @@
+"""In-memory achievement engine.
+
+Achievement definitions are loaded once per app, their requirement strings
+compiled into an index (see ``requirements.py``), and the whole thing dropped
+whenever an Achievement row changes in this process. Changes made elsewhere
+(another worker, migrate_db.py, plain SQL) are picked up when the rows are
+re-read after ``ACHIEVEMENT_DEFINITIONS_TTL`` seconds; the index is only
+rebuilt if they differ. Each user's earned achievement ids are
+cached as a set, and only the requirements that read a stat changed by the
+current activity are evaluated, so a steady-state activity costs no
+achievement queries. A user's first check in this process, and the first
+after the definitions changed, evaluates every requirement instead, so
+achievements added after a user passed their threshold are still granted.
+
+The cached sets only know about this process's grants, so grants are
+inserted with ``ON CONFLICT DO NOTHING``: an achievement another worker or
+job already granted is treated as earned instead of failing the activity.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .database import upsert_insert
+from .models import db, Achievement, EarnedAchievement
+from .requirements import RequirementIndex, compile_requirement
+
+# Session.info key holding grants that are inserted but not yet committed
+_PENDING_KEY = 'pending_achievement_grants'
+
+
+def user_stat_values(user):
+    """Return the flat stat mapping that requirements are evaluated against."""
+    stats = dict(user.core_stats or {})
+    stats.update(user.player_stats or {})
+    stats['level'] = user.level or 1
+    stats['xp'] = user.xp or 0
+    return stats
+
+
+class AchievementEngine:
+    """Evaluates compiled requirements against cached definitions and earned sets."""
+
+    def __init__(self, max_users=10000, ttl=300):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._lock = Lock()
+        self._definitions = None  # RequirementIndex over all achievements
+        self._rows = None  # the achievement rows it was built from
+        self._loaded_at = 0.0
+        self._earned = OrderedDict()  # user id -> set of achievement ids
+        self._checked = {}  # user id -> definitions every requirement was last evaluated against
+
+    def invalidate(self):
+        """Forget cached achievement definitions (reloaded on next use)."""
+        with self._lock:
+            self._definitions = None
+
+    def forget_user(self, user_id):
+        """Drop a user's cached earned set."""
+        with self._lock:
+            self._earned.pop(user_id, None)
+            self._checked.pop(user_id, None)
+
+    def definitions(self):
+        """Return the cached requirement index over all achievements.
+
+        Rows without a requirement are never granted automatically; rows with
+        an unparseable one are logged and skipped.
+        """
+        with self._lock:
+            definitions = self._definitions
+            if definitions is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return definitions
+
+        rows = [tuple(row) for row in db.session.query(
+            Achievement.id, Achievement.title, Achievement.requirement).order_by(Achievement.id)]
+        with self._lock:
+            if definitions is not None and definitions is self._definitions and rows == self._rows:
+                # Unchanged: keep the index, so users aren't re-checked in full
+                self._loaded_at = time.monotonic()
+                return definitions
+
+        definitions = RequirementIndex()
+        for ach_id, title, requirement in rows:
+            if not requirement:
+                continue
+            try:
+                definitions.add(ach_id, title, compile_requirement(requirement))
+            except ValueError as exc:
+                current_app.logger.warning('Skipping achievement %s: %s', ach_id, exc)
+        with self._lock:
+            self._definitions = definitions
+            self._rows = rows
+            self._loaded_at = time.monotonic()
+        return definitions
+
+    def earned_ids(self, user_id):
+        """Return the cached set of achievement ids earned by a user."""
+        with self._lock:
+            earned = self._earned.get(user_id)
+            if earned is not None:
+                self._earned.move_to_end(user_id)
+                return earned
+
+        rows = db.session.query(EarnedAchievement.achievement_id).filter_by(user_id=user_id).all()
+        earned = {ach_id for (ach_id,) in rows}
+        with self._lock:
+            self._earned[user_id] = earned
+            while len(self._earned) > self.max_users:
+                evicted, _ = self._earned.popitem(last=False)
+                self._checked.pop(evicted, None)
+        return earned
+
+    def _pending_ids(self, user_id):
+        pending = db.session.info.get(_PENDING_KEY, ())
+        return {ach_id for engine, uid, ach_id in pending if engine is self and uid == user_id}
+
+    def grant(self, user, achievement_id):
+        """Insert an EarnedAchievement row unless the user already has it (no commit).
+
+        Returns the achievement id, or None if it was already earned.
+        """
+        if achievement_id in self.earned_ids(user.id) or achievement_id in self._pending_ids(user.id):
+            return None
+
+        stmt = upsert_insert(EarnedAchievement, db.session.get_bind()).values(
+            user_id=user.id, achievement_id=achievement_id)
+        stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', 'achievement_id'])
+        if not db.session.execute(stmt).rowcount:
+            # Granted elsewhere since the earned set was cached
+            self._commit_grant(user.id, achievement_id)
+            return None
+        db.session.info.setdefault(_PENDING_KEY, []).append((self, user.id, achievement_id))
+        return achievement_id
+
+    def award(self, user, changed_stats=None):
+        """Grant every newly satisfied achievement and return their titles.
+
+        Only requirements depending on ``changed_stats`` are checked; pass
+        None to evaluate all of them, or map each changed stat to its value
+        before the change to skip thresholds that were already passed.
+        """
+        definitions = self.definitions()
+        stats = user_stat_values(user)
+        with self._lock:
+            if self._checked.get(user.id) is not definitions:
+                changed_stats = None
+
+        earned = []
+        for ach_id in definitions.satisfied(stats, changed_stats):
+            if self.grant(user, ach_id):
+                earned.append(definitions.titles[ach_id])
+        if changed_stats is None:
+            with self._lock:
+                if user.id in self._earned:
+                    self._checked[user.id] = definitions
+        return earned
+
+    def _commit_grant(self, user_id, achievement_id):
+        with self._lock:
+            earned = self._earned.get(user_id)
+            if earned is not None:
+                earned.add(achievement_id)
+
+
+def get_achievement_engine():
+    """Return the achievement engine bound to the current app."""
+    return current_app.extensions['achievement_engine']
+
+
+def init_achievements(app):
+    """Attach the achievement engine configured for the app."""
+    app.extensions['achievement_engine'] = AchievementEngine(
+        ttl=app.config.get('ACHIEVEMENT_DEFINITIONS_TTL', 300),
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_grants(session):
+    for engine, user_id, achievement_id in session.info.pop(_PENDING_KEY, ()):
+        engine._commit_grant(user_id, achievement_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_grants(session):
+    # The earned set may have been reloaded mid-transaction; start it over
+    for engine, user_id, achievement_id in session.info.pop(_PENDING_KEY, ()):
+        engine.forget_user(user_id)
+
+
+def _invalidate_definitions(mapper, connection, target):
+    if has_app_context() and 'achievement_engine' in current_app.extensions:
+        get_achievement_engine().invalidate()
+
+
+def _forget_earned(mapper, connection, target):
+    if has_app_context() and 'achievement_engine' in current_app.extensions:
+        get_achievement_engine().forget_user(target.user_id)
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Achievement, _event_name, _invalidate_definitions)
+# The engine's own grants are Core inserts, merged into the cache on commit
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(EarnedAchievement, _event_name, _forget_earned)
@@ -0,0 +1,111 @@
+"""Append-only activity log.
+
+Every XP or player stat change made by the activity pipeline is also staged
+as an ``ActivityEvent`` row and committed in the same transaction, so the log
+and the user row cannot disagree. A user's totals can be rebuilt from their
+``ActivitySnapshot`` (a roll-up of the log up to some event id) plus the
+events after it, without touching the user row. ``rollup()`` advances the
+snapshots of users whose tail has grown long; run it periodically with
+``flask main activity-rollup``.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from . import daily_reports
+from .models import db, User, ActivityEvent, ActivitySnapshot
+
+# Events after a user's snapshot before ``rollup()`` rolls them up
+ROLLUP_MIN_EVENTS = 100
+
+# Users snapshotted per commit during a roll-up
+ROLLUP_BATCH = 500
+
+
+def record_event(user_id, activity_type, xp_delta=0, stat_deltas=None, report=True):
+    """Stage an event for a user in the session (no commit) and return it.
+
+    The day's report counters are bumped in the same transaction unless
+    ``report`` is False (the caller queues that instead). Zero deltas are
+    dropped; when nothing changed no event is recorded and None is returned.
+    """
+    stat_deltas = {stat: delta for stat, delta in (stat_deltas or {}).items() if delta}
+    if not xp_delta and not stat_deltas:
+        return None
+    event = ActivityEvent(user_id=user_id, activity_type=activity_type,
+                          xp_delta=xp_delta or 0, stat_deltas=stat_deltas or None)
+    db.session.add(event)
+    if report:
+        daily_reports.bump(user_id, daily_reports.event_counts(xp_delta, stat_deltas))
+    return event
+
+
+def replay(user_id):
+    """Rebuild a user's totals from their snapshot and the events after it.
+
+    Returns ``(totals, last_event_id)`` where ``totals`` maps ``xp`` and every
+    player stat to its value as of event ``last_event_id``.
+    """
+    totals = dict.fromkeys(User.PLAYER_STAT_KEYS, 0)
+    totals['xp'] = 0
+    last_event_id = 0
+
+    snapshot = db.session.get(ActivitySnapshot, user_id)
+    if snapshot is not None:
+        totals.update(snapshot.stats or {})
+        totals['xp'] = snapshot.xp
+        last_event_id = snapshot.last_event_id
+
+    tail = db.session.execute(
+        select(ActivityEvent.id, ActivityEvent.xp_delta, ActivityEvent.stat_deltas)
+        .where(ActivityEvent.user_id == user_id, ActivityEvent.id > last_event_id)
+        .order_by(ActivityEvent.id)
+    )
+    for event_id, xp_delta, stat_deltas in tail:
+        totals['xp'] += xp_delta
+        for stat, delta in (stat_deltas or {}).items():
+            totals[stat] = totals.get(stat, 0) + delta
+        last_event_id = event_id
+    return totals, last_event_id
+
+
+def take_snapshot(user_id):
+    """Roll a user's tail into their snapshot (no commit) and return it."""
+    totals, last_event_id = replay(user_id)
+    snapshot = db.session.get(ActivitySnapshot, user_id)
+    if snapshot is None:
+        snapshot = ActivitySnapshot(user_id=user_id)
+        db.session.add(snapshot)
+    elif snapshot.last_event_id == last_event_id:
+        return snapshot
+
+    snapshot.xp = totals.pop('xp')
+    snapshot.stats = totals
+    snapshot.last_event_id = last_event_id
+    snapshot.created_at = datetime.utcnow()
+    return snapshot
+
+
+def rollup(min_events=ROLLUP_MIN_EVENTS, batch_size=ROLLUP_BATCH):
+    """Snapshot every user with at least ``min_events`` events past their snapshot.
+
+    The users are found with one aggregate query; snapshots are committed
+    ``batch_size`` users at a time. Returns the number of users rolled up.
+    """
+    user_ids = db.session.scalars(
+        select(ActivityEvent.user_id)
+        .outerjoin(ActivitySnapshot, ActivitySnapshot.user_id == ActivityEvent.user_id)
+        .where(ActivityEvent.id > func.coalesce(ActivitySnapshot.last_event_id, 0))
+        .group_by(ActivityEvent.user_id)
+        .having(func.count() >= min_events)
+    ).all()
+
+    for start in range(0, len(user_ids), batch_size):
+        try:
+            for user_id in user_ids[start:start + batch_size]:
+                take_snapshot(user_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return len(user_ids)
@@ -0,0 +1,92 @@
+"""Atomic counter updates on the user row.
+
+Stat and XP increments are sent as one ``UPDATE user SET x = x + :delta ...
+RETURNING x`` statement, so concurrent requests for the same user never lose
+each other's increments and no row has to be read first. The returned values
+are stored on the instance as its committed state. Objects that are not
+persistent yet (no row to update) are incremented in memory instead.
+
+Core UPDATEs bypass the ORM's mapper events, so the user cache entry is
+dropped here explicitly. XP awards also bump the user's hourly, daily and
+weekly XP buckets and are staged for the leaderboards.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import and_, func, inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import leaderboard, progression, xp_windows
+from .models import db, User
+from .user_cache import get_user_cache
+
+
+def increment_counters(user, deltas):
+    """Add ``deltas`` (attribute name -> amount) to a user's counters.
+
+    Returns the new values by attribute name, together with the user's
+    current ``level``. Zero deltas are skipped; with nothing to add no SQL
+    is sent.
+    """
+    deltas = {key: amount for key, amount in deltas.items() if amount}
+    if not deltas:
+        return {'level': user.level or 1}
+
+    if not inspect(user).persistent:
+        for key, amount in deltas.items():
+            setattr(user, key, (getattr(user, key) or 0) + amount)
+        return dict({key: getattr(user, key) for key in deltas}, level=user.level or 1)
+
+    columns = {key: getattr(User, key) for key in deltas}
+    stmt = (
+        update(User)
+        .where(User.id == user.id)
+        .values({column: func.coalesce(column, 0) + deltas[key] for key, column in columns.items()})
+        .returning(User.level, *columns.values())
+        .execution_options(synchronize_session=False)
+    )
+    row = db.session.execute(stmt).one()
+
+    values = {'level': row[0] or 1}
+    for key, value in zip(columns, row[1:]):
+        set_committed_value(user, key, value)
+        values[key] = value
+    if has_app_context() and 'user_cache' in current_app.extensions:
+        get_user_cache().invalidate_on_commit(user.id)
+    return values
+
+
+def award_xp(user, amount, stat_deltas=None):
+    """Add XP (and ``stat_deltas``) to a user in SQL and apply any level/rank change (no commit).
+
+    XP and stats are incremented in the same statement. The level is then
+    raised with a guarded UPDATE (``WHERE level < :new``) so two concurrent
+    awards can never move it backwards. Returns the usual level-up info dict.
+    """
+    persistent = inspect(user).persistent
+    values = increment_counters(user, dict(stat_deltas or {}, xp=amount or 0))
+    old_level = values['level']
+    new_level = progression.level_for_xp(values.get('xp', user.xp or 0))
+
+    if persistent:
+        xp_windows.bump(user.id, amount)
+        leaderboard.stage_award(user.id, values.get('xp', user.xp or 0), max(new_level, old_level), amount)
+
+    if new_level <= old_level:
+        if persistent:
+            set_committed_value(user, 'level', old_level)
+        return {'leveledUp': False, 'newLevel': old_level, 'newRank': None}
+
+    rank = progression.rank_for_level(new_level)
+    if persistent:
+        db.session.execute(
+            update(User)
+            .where(and_(User.id == user.id, func.coalesce(User.level, 1) < new_level))
+            .values(level=new_level, rank=rank)
+            .execution_options(synchronize_session=False)
+        )
+        set_committed_value(user, 'level', new_level)
+        set_committed_value(user, 'rank', rank)
+    else:
+        user.level = new_level
+        user.rank = rank
+    return {'leveledUp': True, 'newLevel': new_level, 'newRank': rank}
+
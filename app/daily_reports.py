@@ -0,0 +1,102 @@
+"""Incrementally maintained daily reports.
+
+Each recorded activity event bumps the counters of the user's ``daily_report``
+row for that (UTC) day with a single upsert, so a day's report or a year of
+history is a range read over at most one row per day instead of a rescan of
+quests, habits and events.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, update
+
+from .database import upsert_insert
+from .models import db, DailyReport
+
+REPORT_COUNTERS = ('xp_gained', 'quests_completed', 'habits_tracked', 'activities')
+
+# Longest history served by one range read
+MAX_REPORT_DAYS = 366
+
+
+def event_counts(xp_delta, stat_deltas):
+    """Return the report counters contributed by one activity event."""
+    stat_deltas = stat_deltas or {}
+    return {
+        'xp_gained': xp_delta or 0,
+        'quests_completed': stat_deltas.get('quests_completed', 0),
+        'habits_tracked': stat_deltas.get('habits_completed', 0),
+        'activities': 1,
+    }
+
+
+def bump(user_id, counts, day=None):
+    """Add ``counts`` to a user's report row for ``day`` (default today), creating it if needed.
+
+    One ``INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x`` in the
+    current transaction; nothing is committed.
+    """
+    counts = {name: counts.get(name, 0) for name in REPORT_COUNTERS}
+    stmt = upsert_insert(DailyReport, db.session.get_bind()).values(
+        user_id=user_id, day=day or datetime.utcnow().date(), **counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day'],
+        set_={name: getattr(DailyReport, name) + stmt.excluded[name] for name in REPORT_COUNTERS},
+    )
+    db.session.execute(stmt)
+
+
+def report_range(user_id, start, end):
+    """Return one report dict per day from ``start`` to ``end`` (inclusive).
+
+    Days without activity are filled in with zero counters.
+    """
+    rows = db.session.scalars(
+        select(DailyReport)
+        .where(DailyReport.user_id == user_id, DailyReport.day.between(start, end))
+        .order_by(DailyReport.day)
+    )
+    by_day = {row.day: row for row in rows}
+
+    reports = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day)
+        report = {'day': day.isoformat()}
+        report.update({name: getattr(row, name) if row else 0 for name in REPORT_COUNTERS})
+        report['submitted'] = bool(row and row.submitted_at)
+        reports.append(report)
+    return reports
+
+
+def submit_reflection(user_id, the_win, the_lesson, the_plan, day=None):
+    """Store the day's reflection; return False if it was already submitted.
+
+    The row is claimed with a guarded UPDATE (``submitted_at IS NULL``) so two
+    concurrent submissions can't both succeed. Nothing is committed.
+    """
+    day = day or datetime.utcnow().date()
+    bump(user_id, {}, day)
+    result = db.session.execute(
+        update(DailyReport)
+        .where(DailyReport.user_id == user_id, DailyReport.day == day,
+               DailyReport.submitted_at.is_(None))
+        .values(the_win=the_win, the_lesson=the_lesson, the_plan=the_plan,
+                submitted_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def parse_range(start, end, today=None):
+    """Parse ISO ``start``/``end`` query values into dates (default: the last 30 days).
+
+    Raises ValueError for malformed dates, reversed or over-long ranges.
+    """
+    today = today or datetime.utcnow().date()
+    end = date.fromisoformat(end) if end else today
+    start = date.fromisoformat(start) if start else end - timedelta(days=29)
+    if start > end:
+        raise ValueError('start must not be after end')
+    if (end - start).days + 1 > MAX_REPORT_DAYS:
+        raise ValueError(f'At most {MAX_REPORT_DAYS} days per request')
+    return start, end
@@ -0,0 +1,93 @@
+"""Database engine tuning.
+
+SQLite's defaults (rollback journal, synchronous=FULL, no busy timeout) make
+concurrent writers from several gunicorn workers fail fast with "database is
+locked". The ``production`` profile switches every new connection to WAL with
+synchronous=NORMAL, waits on locks instead of failing, and gives SQLite a
+larger page cache and memory-mapped I/O. Set ``SQLITE_PROFILE = 'off'`` to
+keep SQLite's defaults.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+
+# Engine options that only make sense for a real connection pool (recycling
+# the single in-memory SQLite connection would throw the database away)
+POOL_SIZING_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle')
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING / DO UPDATE
+_UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def database_uri_from_env():
+    """Return the database URI from ``DATABASE_URL``, or None when unset.
+
+    Read at app creation time (not import time) so the environment of the
+    running process decides. Legacy ``postgres://`` URLs are accepted.
+    """
+    uri = os.environ.get('DATABASE_URL')
+    if not uri:
+        return None
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def sqlite_pragmas(config):
+    """Return the ``(pragma, value)`` pairs for the configured SQLite profile."""
+    if config.get('SQLITE_PROFILE', 'production') != 'production':
+        return []
+    return [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 268435456))),
+        # Negative cache_size is in KiB rather than pages
+        ('cache_size', -int(config.get('SQLITE_CACHE_SIZE_KB', 20000))),
+    ]
+
+
+def engine_options(uri, options):
+    """Return engine options suitable for ``uri``.
+
+    In-memory SQLite runs on a single shared connection (StaticPool or
+    SingletonThreadPool), which rejects pool sizing arguments, so those are
+    dropped for it unless a ``poolclass`` is given explicitly.
+    """
+    options = dict(options or {})
+    url = make_url(uri)
+    in_memory = url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    if url.get_backend_name() == 'sqlite' and in_memory and 'poolclass' not in options:
+        for key in POOL_SIZING_OPTIONS:
+            options.pop(key, None)
+    return options
+
+
+def upsert_insert(entity, bind):
+    """Return an INSERT for ``entity`` that supports ``on_conflict_do_*`` on ``bind``'s dialect.
+
+    Raises NotImplementedError on backends other than SQLite and PostgreSQL.
+    """
+    name = bind.dialect.name
+    if name not in _UPSERT_INSERTS:
+        raise NotImplementedError(
+            f'Upserts need SQLite or PostgreSQL; the {name!r} backend is not supported')
+    return _UPSERT_INSERTS[name](entity)
+
+
+def init_database(app, db):
+    """Install per-connection tuning on the app's SQLite engine."""
+    pragmas = sqlite_pragmas(app.config)
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
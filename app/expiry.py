@@ -0,0 +1,113 @@
+"""Quest deadline expiry.
+
+Open quests whose deadline has passed are marked failed (``failed_at``) by
+``sweep()``. A one-off quest's deadline is a date (stored as its midnight)
+and the quest can still be completed all that day, so it fails once the
+day is over; a recurring quest instance's deadline is already the end of
+its period. The partial index ``ix_quest_completed_deadline`` on
+``(completed, deadline)`` only holds quests that haven't failed, so it works
+as a due-date queue: each batch is a range scan from the oldest deadline
+that stops at ``now``, and expired quests leave the index as they are
+marked. A sweep costs time in proportion to the quests that expired since
+the last one plus the one-off quests due today, not to the size of the
+quest table.
+
+Quests are claimed with a guarded ``UPDATE ... RETURNING`` (``failed_at IS
+NULL``), so overlapping sweeps never expire (or penalize) a quest twice.
+With a ``penalty`` fraction, each owner loses that share of the expired
+quests' XP rewards (never dropping below 0 XP), recorded as a
+``QUEST_EXPIRED`` activity event in the same transaction. Levels are never
+taken away.
+
+Run it every few minutes (``flask main expire-quests``).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, update
+
+from .activity_log import record_event
+from .counters import award_xp
+from .models import db, User, Quest
+from .progress_cache import get_progress_cache
+
+# Quests expired per transaction
+EXPIRY_BATCH = 500
+
+# One-off deadlines are due dates; they end this long after their midnight
+DEADLINE_DAY = timedelta(days=1)
+
+
+def due_quests(now, limit):
+    """Select the ids of up to ``limit`` overdue open quests, oldest deadline first."""
+    return (
+        select(Quest.id)
+        .where(
+            Quest.completed == False, Quest.failed_at.is_(None),
+            # Bounds the index range scan; the OR only filters within it
+            Quest.deadline <= now,
+            or_(Quest.deadline <= now - DEADLINE_DAY, Quest.recurring_quest_id.isnot(None)),
+        )
+        .order_by(Quest.deadline)
+        .limit(limit)
+    )
+
+
+def _expire_batch(now, limit):
+    due = due_quests(now, limit).scalar_subquery()
+    return db.session.execute(
+        update(Quest)
+        .where(Quest.id.in_(due), Quest.completed == False, Quest.failed_at.is_(None))
+        .values(failed_at=now)
+        .returning(Quest.user_id, Quest.xp_reward)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _apply_penalties(expired, penalty):
+    """Take ``penalty`` of each owner's expired XP rewards (no commit); return the total."""
+    owed = {}
+    for user_id, xp_reward in expired:
+        owed[user_id] = owed.get(user_id, 0) + round((xp_reward or 0) * penalty)
+    owed = {user_id: amount for user_id, amount in owed.items() if amount > 0}
+    if not owed:
+        return {}
+
+    applied = {}
+    for user in User.query.filter(User.id.in_(owed)).all():
+        amount = min(owed[user.id], user.xp or 0)
+        if amount:
+            award_xp(user, -amount)
+            record_event(user.id, 'QUEST_EXPIRED', -amount)
+            applied[user.id] = amount
+    return applied
+
+
+def sweep(now=None, batch_size=EXPIRY_BATCH, max_batches=None, penalty=0.0):
+    """Mark quests past their deadline as failed, oldest deadline first.
+
+    Works in batches of ``batch_size`` quests, each committed on its own,
+    until no overdue quest is left or ``max_batches`` batches ran. Returns
+    ``{'expired', 'penalty_xp', 'batches'}``.
+    """
+    now = now or datetime.utcnow()
+    summary = {'expired': 0, 'penalty_xp': 0, 'batches': 0}
+    while max_batches is None or summary['batches'] < max_batches:
+        try:
+            expired = _expire_batch(now, batch_size)
+            penalized = _apply_penalties(expired, penalty) if penalty > 0 else {}
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if not expired:
+            break
+
+        cache = get_progress_cache()
+        for user_id in penalized:
+            cache.invalidate(user_id)
+        summary['expired'] += len(expired)
+        summary['penalty_xp'] += sum(penalized.values())
+        summary['batches'] += 1
+        if len(expired) < batch_size:
+            break
+    return summary
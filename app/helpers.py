@@ -1,23 +1,53 @@
+import json
+from datetime import date, datetime
+
 from flask import jsonify
-from .models import db, User, Achievement
-
-def process_activity(user, activity_type):
-    """Process an activity for a user, handling XP, achievements, and level ups."""
-    # Add XP and check for level up
-    level_info = user.add_xp(activity_type)
-    
-    # Check for new achievements
-    new_achievements = user.check_achievements()
-    
-    # Prepare response data
-    response = {
-        'success': True,
-        'notifications': []
-    }
-    
+from sqlalchemy import select, update
+
+from .models import db, User, Achievement, Quest
+from . import daily_reports
+from .activity_log import record_event
+from .counters import award_xp, increment_counters
+from .jobs import enqueue, job
+from .notifications import publish_progress, store_notifications
+from .progress_cache import get_progress_cache
+
+# Upper bound on quests completed in a single batch request
+MAX_QUEST_BATCH = 500
+
+# Rows inserted per executemany batch when importing quests
+QUEST_IMPORT_CHUNK = 500
+
+# Longest imported quest description kept
+QUEST_DESCRIPTION_MAX = 2000
+
+QUEST_DIFFICULTIES = ('E', 'D', 'C', 'B', 'A', 'S')
+QUEST_TYPES = ('daily', 'weekly', 'achievement')
+
+
+def player_stat_deltas(stat_updates):
+    """Return the player stat deltas from ``stat_updates``, dropping unknown names."""
+    return {stat: value for stat, value in (stat_updates or {}).items() if stat in User.PLAYER_STAT_KEYS}
+
+
+def apply_stat_updates(user, stat_updates):
+    """Increment the user's player stats in SQL without committing.
+
+    Unknown stat names are ignored. Returns True when any stat changed.
+    """
+    deltas = player_stat_deltas(stat_updates)
+    if deltas:
+        increment_counters(user, deltas)
+    return bool(deltas)
+
+
+def build_notifications(level_info, new_achievements):
+    """Build the notifications list sent back to the frontend."""
+    notifications = []
+
     # Add level up notification if applicable
     if level_info and level_info['leveledUp']:
-        response['notifications'].append({
+        notifications.append({
             'type': 'levelup',
             'message': f"Advanced to Level {level_info['newLevel']}!",
             'details': {
@@ -25,33 +55,289 @@ def process_activity(user, activity_type):
                 'rank': level_info['newRank']
             }
         })
-    
+
     # Add achievement notifications
     for achievement_id in new_achievements:
-        response['notifications'].append({
+        notifications.append({
             'type': 'achievement',
             'message': f"Achievement Unlocked: {achievement_id}!",
             'achievement': achievement_id
         })
-    
-    # Get updated progress data
-    response['progress'] = user.get_progress()
-    
-    return jsonify(response)
-
-def update_stats(user, stat_updates):
-    """Update user stats and process achievements."""
-    for stat, value in stat_updates.items():
-        if hasattr(user, stat):
-            setattr(user, stat, getattr(user, stat) + value)
-    
-    db.session.commit()
-    
-    # Check for achievements and get progress
-    new_achievements = user.check_achievements()
-    progress = user.get_progress()
-    
+
+    return notifications
+
+
+def stats_before(user, deltas, old_level):
+    """Map the stats an activity changed to their values before it.
+
+    Reads the new values the counters' atomic UPDATE left on ``user``, so the
+    achievement check only visits the thresholds this activity crossed.
+    """
+    before = {stat: (getattr(user, stat) or 0) - delta for stat, delta in deltas.items()}
+    before['level'] = old_level
+    return before
+
+
+def defer_followups(user_id, xp, stats, changed_stats):
+    """Queue the work an activity triggers but its response doesn't need.
+
+    Jobs are staged in the activity's transaction: the achievement check
+    (which stores its own notifications) and the daily report bump. The
+    level-up is not queued; the activity publishes and returns it.
+    """
+    enqueue('check_achievements', {'user_id': user_id, 'changed_stats': changed_stats})
+    if xp or stats:
+        enqueue('daily_report', {
+            'user_id': user_id,
+            'day': datetime.utcnow().date().isoformat(),
+            'counts': daily_reports.event_counts(xp, stats),
+        })
+
+
+def run_activity(user, activity_type, stat_updates=None, defer=False):
+    """Apply an activity as a single unit of work and return the response data.
+
+    Stat deltas and XP are added with one atomic UPDATE; the level/rank change
+    and achievement grants join the same transaction, so an activity costs a
+    single commit. With ``defer=True`` the achievement check and daily report
+    are queued as jobs instead (see ``defer_followups``), and the response
+    carries only the level-up notification.
+    """
+    try:
+        stats = player_stat_deltas(stat_updates)
+        xp = User.XP_REWARDS.get(activity_type, 0)
+        old_level = user.level or 1  # levels only rise, so a stale value just widens the check
+        if activity_type in User.XP_REWARDS:
+            # Stats and XP go out in one UPDATE
+            level_info = award_xp(user, xp, stats)
+        else:
+            level_info = None
+            apply_stat_updates(user, stats)
+        record_event(user.id, activity_type, xp, stats, report=not defer)
+        changed_stats = stats_before(user, dict(stats, xp=xp), old_level)
+        if defer:
+            new_achievements = []
+            defer_followups(user.id, xp, stats, changed_stats)
+        else:
+            new_achievements = user.check_achievements(commit=False, changed_stats=changed_stats)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    progress, _ = get_progress_cache().refresh(user)
+    notifications = build_notifications(level_info, new_achievements)
+    publish_progress(user.id, progress)
     return {
-        'achievements': new_achievements,
+        'success': True,
+        'notifications': notifications,
         'progress': progress
-    }
\ No newline at end of file
+    }
+
+
+def complete_quests(user, quest_ids, defer=False):
+    """Complete several of a user's quests as a single unit of work.
+
+    Quests are claimed with one guarded ``UPDATE ... RETURNING`` (owned by the
+    user, still open and not expired), so a double submit or a concurrent
+    expiry sweep can never complete a quest twice or complete an expired one;
+    XP is awarded only for the rows the UPDATE returned. Quests that are
+    missing, owned by someone else, already completed or expired are
+    reported in ``skipped``. Everything is committed together. ``defer``
+    queues the follow-up work as in ``run_activity``.
+    """
+    quest_ids = list(dict.fromkeys(quest_ids))
+    try:
+        claimed = dict(db.session.execute(
+            update(Quest)
+            .where(Quest.id.in_(quest_ids), Quest.user_id == user.id,
+                   Quest.completed == False, Quest.failed_at.is_(None))
+            .values(completed=True, completed_at=datetime.utcnow())
+            .returning(Quest.id, Quest.xp_reward)
+            .execution_options(synchronize_session=False)
+        ).all())
+    except Exception:
+        db.session.rollback()
+        raise
+
+    completed = [quest_id for quest_id in quest_ids if quest_id in claimed]
+    xp_gained = sum(xp_reward or 0 for xp_reward in claimed.values())
+    skipped = []
+    unclaimed = [quest_id for quest_id in quest_ids if quest_id not in claimed]
+    if unclaimed:
+        states = {quest_id: failed_at is not None for quest_id, failed_at in db.session.execute(
+            select(Quest.id, Quest.failed_at)
+            .where(Quest.id.in_(unclaimed), Quest.user_id == user.id)
+        )}
+        for quest_id in unclaimed:
+            if quest_id not in states:
+                skipped.append({'id': quest_id, 'reason': 'not_found'})
+            elif states[quest_id]:
+                skipped.append({'id': quest_id, 'reason': 'expired'})
+            else:
+                skipped.append({'id': quest_id, 'reason': 'already_completed'})
+
+    level_info = None
+    new_achievements = []
+    if completed:
+        try:
+            stats = {'quests_completed': len(completed)}
+            old_level = user.level or 1
+            level_info = award_xp(user, xp_gained, stats)
+            record_event(user.id, 'COMPLETE_QUEST', xp_gained, stats, report=not defer)
+            changed_stats = stats_before(user, dict(stats, xp=xp_gained), old_level)
+            if defer:
+                defer_followups(user.id, xp_gained, stats, changed_stats)
+            else:
+                new_achievements = user.check_achievements(commit=False, changed_stats=changed_stats)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    else:
+        # End the transaction the UPDATE opened
+        db.session.commit()
+
+    cache = get_progress_cache()
+    progress, _ = cache.refresh(user) if completed else cache.snapshot(user)
+    notifications = build_notifications(level_info, new_achievements)
+    if completed:
+        publish_progress(user.id, progress)
+    return {
+        'success': bool(completed),
+        'completed': completed,
+        'skipped': skipped,
+        'xp_gained': xp_gained,
+        'notifications': notifications,
+        'progress': progress
+    }
+
+
+def calculate_xp_reward(difficulty):
+    """Calculate XP reward based on task difficulty."""
+    xp_map = {
+        'E': 50,
+        'D': 100,
+        'C': 200,
+        'B': 350,
+        'A': 500,
+        'S': 1000
+    }
+    return xp_map.get(difficulty.upper(), 100)
+
+
+def parse_quest_line(line, user_id):
+    """Validate one JSON Lines quest record and return the row to insert.
+
+    Raises ValueError with a readable message for invalid records.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise ValueError('Invalid JSON')
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+
+    title = data.get('title')
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError('Missing title')
+
+    difficulty = str(data.get('difficulty') or '').upper()
+    if difficulty not in QUEST_DIFFICULTIES:
+        raise ValueError(f'Invalid difficulty: {data.get("difficulty")!r}')
+
+    description = data.get('description')
+    if description is not None and not isinstance(description, str):
+        raise ValueError('Invalid description: expected a string')
+
+    quest_type = data.get('quest_type')
+    if quest_type not in QUEST_TYPES:
+        raise ValueError(f'Invalid quest_type: {quest_type!r}')
+
+    deadline = None
+    if data.get('deadline'):
+        try:
+            deadline = datetime.strptime(data['deadline'], '%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid deadline: {data["deadline"]!r}')
+
+    return {
+        'title': title.strip()[:200],
+        'description': description.strip()[:QUEST_DESCRIPTION_MAX] if description is not None else None,
+        'difficulty': difficulty,
+        'xp_reward': calculate_xp_reward(difficulty),
+        'quest_type': quest_type,
+        'deadline': deadline,
+        'completed': False,
+        'created_at': datetime.utcnow(),
+        'user_id': user_id
+    }
+
+
+def import_quests(lines, user_id, chunk_size=QUEST_IMPORT_CHUNK):
+    """Bulk-create quests for a user from an iterable of JSON Lines.
+
+    Lines are validated one at a time and valid rows are inserted in
+    executemany batches of ``chunk_size``, each committed on its own. Bad
+    lines (or a failed batch) are reported by line number and the rest of the
+    import carries on.
+    """
+    created = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        nonlocal created
+        if not chunk:
+            return
+        try:
+            db.session.execute(db.insert(Quest), [row for _, row in chunk])
+            db.session.commit()
+            created += len(chunk)
+        except Exception as exc:
+            db.session.rollback()
+            errors.extend({'line': lineno, 'error': f'Insert failed: {exc}'} for lineno, _ in chunk)
+        chunk.clear()
+
+    for lineno, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        try:
+            chunk.append((lineno, parse_quest_line(line, user_id)))
+        except ValueError as exc:
+            errors.append({'line': lineno, 'error': str(exc)})
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    return {'created': created, 'errors': errors}
+
+
+def process_activity(user, activity_type, stat_updates=None, defer=False):
+    """Process an activity for a user, handling stats, XP, achievements, and level ups."""
+    return jsonify(run_activity(user, activity_type, stat_updates, defer=defer))
+
+
+@job('check_achievements')
+def check_achievements_job(payload):
+    """Deferred achievement check; stores notifications for new grants."""
+    user = db.session.get(User, payload['user_id'])
+    if user is None:
+        return
+    new_achievements = user.check_achievements(commit=False, changed_stats=payload.get('changed_stats'))
+    if new_achievements:
+        store_notifications(user.id, build_notifications(None, new_achievements))
+        db.session.commit()
+        progress, _ = get_progress_cache().refresh(user)
+        publish_progress(user.id, progress)
+
+
+@job('daily_report')
+def daily_report_job(payload):
+    """Deferred daily report bump for one activity."""
+    day = date.fromisoformat(payload['day'])
+    daily_reports.bump(payload['user_id'], payload['counts'], day)
+
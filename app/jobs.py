@@ -0,0 +1,257 @@
+"""In-process job queue backed by a durable table.
+
+Work that doesn't have to finish before a response is sent (achievement
+checks, daily report updates) is staged as a ``Job`` row in the
+same transaction as the change that caused it, so it is queued exactly when
+that change commits. A dispatcher thread claims pending rows with one guarded
+``UPDATE ... RETURNING`` (safe with several worker processes on the same
+database) and runs them on a thread pool.
+
+Handlers run inside the job's own transaction: the job row is deleted in it,
+so work that commits is never repeated. Failures are retried with backoff up
+to ``JOB_QUEUE_MAX_ATTEMPTS`` and then kept with status ``failed``. Jobs left
+``running`` by a crashed process are requeued when the queue starts.
+
+Worker threads start with the first request and are never started under
+``TESTING`` or with ``JOB_QUEUE_WORKERS = 0``; ``run_pending()`` drains the
+queue in the calling thread instead (also available as ``flask main
+run-jobs``).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+from .models import db, Job
+
+# Session.info key set when a transaction enqueued jobs
+_WAKE_KEY = 'job_queue_wake'
+
+# kind -> handler(payload)
+HANDLERS = {}
+
+
+def job(kind):
+    """Register the decorated function as the handler for ``kind`` jobs."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None):
+    """Stage a job in the session; it is queued when the session commits."""
+    if kind not in HANDLERS:
+        raise ValueError(f'No handler registered for job kind {kind!r}')
+    row = Job(kind=kind, payload=payload)
+    db.session.add(row)
+    db.session.info[_WAKE_KEY] = True
+    return row
+
+
+class JobQueue:
+    """Claims jobs from the queue table and runs them on a thread pool."""
+
+    def __init__(self, app, workers=2, batch_size=20, poll_interval=5.0,
+                 max_attempts=5, retry_delay=10, stale_after=300):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        self.processed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._slots = threading.Semaphore(max(workers, 1))
+        self._executor = None
+        self._stopping = False
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self):
+        """Start the dispatcher and worker threads (once per process)."""
+        if self.workers <= 0 or self._executor is not None:
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+            with self.app.app_context():
+                self.requeue_stale()
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='job-worker')
+            threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True).start()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def wake(self):
+        """Tell the dispatcher new jobs were committed."""
+        self._wake.set()
+
+    def _dispatch(self):
+        while not self._stopping:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            while not self._stopping:
+                # Claim only as many jobs as there are idle workers
+                free = 0
+                while free < self.batch_size and self._slots.acquire(blocking=(free == 0)):
+                    free += 1
+                try:
+                    with self.app.app_context():
+                        claimed = self.claim(free)
+                except Exception:
+                    self.app.logger.exception('Claiming jobs failed')
+                    claimed = []
+                for _ in range(free - len(claimed)):
+                    self._slots.release()
+                for entry in claimed:
+                    self._executor.submit(self._run_and_release, *entry)
+                if not claimed:
+                    break
+
+    def _run_and_release(self, job_id, kind, payload, attempts):
+        try:
+            with self.app.app_context():
+                self.run(job_id, kind, payload, attempts)
+        finally:
+            self._slots.release()
+
+    # -- queue operations (need an app context) --------------------------
+
+    def claim(self, limit):
+        """Mark up to ``limit`` available jobs as running and return them.
+
+        Returns ``(id, kind, payload, attempts)`` tuples, oldest first.
+        """
+        now = datetime.utcnow()
+        available = (
+            select(Job.id)
+            .where(Job.status == 'pending', Job.available_at <= now)
+            .order_by(Job.id)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        try:
+            rows = db.session.execute(
+                update(Job)
+                .where(Job.id.in_(available), Job.status == 'pending')
+                .values(status='running', started_at=now, attempts=Job.attempts + 1)
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return sorted(tuple(row) for row in rows)
+
+    def run(self, job_id, kind, payload, attempts):
+        """Run one claimed job and delete it, or schedule a retry on failure."""
+        try:
+            db.session.execute(delete(Job).where(Job.id == job_id))
+            HANDLERS[kind](payload or {})
+            db.session.commit()
+            with self._lock:
+                self.processed += 1
+        except Exception as exc:
+            db.session.rollback()
+            with self._lock:
+                self.errors += 1
+            current_app.logger.exception('Job %s (%s) failed', job_id, kind)
+            failed = attempts >= self.max_attempts
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(status='failed' if failed else 'pending',
+                        available_at=datetime.utcnow() + timedelta(seconds=self.retry_delay * attempts),
+                        last_error=f'{type(exc).__name__}: {exc}'[:1000])
+            )
+            db.session.commit()
+
+    def run_pending(self, limit=None):
+        """Run available jobs in the calling thread; return how many ran."""
+        ran = 0
+        while limit is None or ran < limit:
+            claimed = self.claim(self.batch_size if limit is None else min(self.batch_size, limit - ran))
+            if not claimed:
+                break
+            for entry in claimed:
+                self.run(*entry)
+                ran += 1
+        return ran
+
+    def requeue_stale(self):
+        """Return jobs left running by a dead process to the queue."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        result = db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', Job.started_at < cutoff)
+            .values(status='pending')
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def metrics(self):
+        """Queue depth and lag (from the table) plus this process's counters."""
+        pending = Job.status == 'pending'
+        depth, running, failed, oldest = db.session.execute(
+            select(
+                func.count(case((pending, 1))),
+                func.count(case((Job.status == 'running', 1))),
+                func.count(case((Job.status == 'failed', 1))),
+                func.min(case((pending, Job.enqueued_at))),
+            )
+        ).one()
+        lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+        with self._lock:
+            processed, errors = self.processed, self.errors
+        return {
+            'depth': depth,
+            'running': running,
+            'failed': failed,
+            'lag_seconds': round(max(lag, 0.0), 3),
+            'processed': processed,
+            'errors': errors,
+            'workers': self.workers if self._executor is not None else 0,
+        }
+
+
+def init_job_queue(app):
+    """Attach the job queue; worker threads start with the first request."""
+    workers = 0 if app.testing else app.config.get('JOB_QUEUE_WORKERS', 2)
+    queue = JobQueue(
+        app,
+        workers=workers,
+        batch_size=app.config.get('JOB_QUEUE_BATCH_SIZE', 20),
+        poll_interval=app.config.get('JOB_QUEUE_POLL_INTERVAL', 5.0),
+        max_attempts=app.config.get('JOB_QUEUE_MAX_ATTEMPTS', 5),
+        retry_delay=app.config.get('JOB_QUEUE_RETRY_DELAY', 10),
+    )
+    app.extensions['job_queue'] = queue
+    if workers > 0:
+        app.before_request(queue.start)
+
+
+def get_job_queue():
+    """Return the job queue bound to the current app."""
+    return current_app.extensions['job_queue']
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop(_WAKE_KEY, False) and has_app_context() and 'job_queue' in current_app.extensions:
+        get_job_queue().wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_wake(session):
+    session.info.pop(_WAKE_KEY, None)
@@ -0,0 +1,243 @@
+"""In-memory leaderboards.
+
+Three boards are kept per process: total XP across all hunters, total XP
+within each hunter rank tier (``progression.HUNTER_RANKS``), and XP earned
+this (UTC, Monday-based) week. Each board is a list of ``(-score, user_id)``
+keys kept sorted, so a user's position is a bisect and a top-N or
+"position ± k" page is a slice; no request ever sorts the user table.
+
+The boards are rebuilt from the database when the app starts (the weekly
+board from the weekly XP buckets) and kept current by ``counters.award_xp``,
+which stages each award in the session; awards are applied once their
+transaction commits and dropped on rollback. Awards are applied as deltas,
+so the order in which concurrent transactions report back doesn't matter.
+
+Awards made by other worker processes are only picked up by a rebuild,
+which happens once the boards are ``LEADERBOARD_REFRESH_SECONDS`` old.
+Ties are broken by user id (the older account ranks first).
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from . import progression
+from .models import db, User, XpBucket
+from .streaks import period_index
+
+BOARDS = ('global', 'tier', 'weekly')
+
+# Session.info key holding the awards of the current transaction
+_PENDING_KEY = 'leaderboard_pending'
+
+
+def current_week(now=None):
+    """Return the index of the current UTC week (see ``streaks.period_index``)."""
+    return period_index((now or datetime.utcnow()).date(), 'weekly')
+
+
+class RankedScores:
+    """Scores per member, kept sorted from highest to lowest."""
+
+    def __init__(self, scores=None):
+        self._scores = dict(scores or {})
+        self._keys = sorted((-score, member) for member, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def score(self, member):
+        return self._scores.get(member)
+
+    def set(self, member, score):
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, member))]
+        insort(self._keys, (-score, member))
+        self._scores[member] = score
+
+    def add(self, member, amount):
+        self.set(member, self._scores.get(member, 0) + amount)
+
+    def remove(self, member):
+        old = self._scores.pop(member, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, member))]
+
+    def position(self, member):
+        """Return the member's 0-based position, or None if it has no score."""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score, member))
+
+    def slice(self, start, stop):
+        """Return ``(position, member, score)`` for positions ``start`` to ``stop - 1``."""
+        start = max(start, 0)
+        return [(start + offset, member, -negated)
+                for offset, (negated, member) in enumerate(self._keys[start:stop])]
+
+    def top(self, count):
+        return self.slice(0, count)
+
+    def around(self, member, k):
+        """Return the member's entry with up to ``k`` entries either side of it."""
+        position = self.position(member)
+        if position is None:
+            return []
+        return self.slice(position - k, position + k + 1)
+
+
+class Leaderboard:
+    """The global, per-tier and weekly boards of one process."""
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds
+        self.built_at = None
+        self._lock = threading.RLock()
+        self._reset(RankedScores(), {}, {}, RankedScores(), current_week())
+
+    def _reset(self, everyone, levels, tiers, weekly, week):
+        self.everyone = everyone
+        self.levels = levels  # user id -> highest level seen
+        self.tiers = tiers  # rank name -> RankedScores
+        self.weekly = weekly
+        self.week = week
+
+    def rebuild(self, now=None):
+        """Reload every board from the database (needs an app context)."""
+        week = current_week(now)
+        xp, levels, tiers = {}, {}, {}
+        for user_id, user_xp, level in db.session.execute(select(User.id, User.xp, User.level)):
+            xp[user_id] = user_xp or 0
+            levels[user_id] = level or 1
+            tiers.setdefault(progression.rank_for_level(level), {})[user_id] = user_xp or 0
+
+        weekly = dict(db.session.execute(
+            select(XpBucket.user_id, XpBucket.xp)
+            .where(XpBucket.granularity == 'week', XpBucket.bucket == week, XpBucket.xp != 0)
+        ).all())
+
+        boards = (RankedScores(xp), levels,
+                  {rank: RankedScores(scores) for rank, scores in tiers.items()},
+                  RankedScores(weekly), week)
+        with self._lock:
+            self._reset(*boards)
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Rebuild the boards if they were never built or are past their refresh age."""
+        built_at = self.built_at
+        if built_at is None or (self.refresh_seconds > 0 and
+                                time.monotonic() - built_at >= self.refresh_seconds):
+            self.rebuild()
+
+    def record(self, user_id, xp, level, amount, now=None):
+        """Apply an XP award of ``amount`` that left the user at ``xp``/``level``."""
+        with self._lock:
+            if self.everyone.score(user_id) is None:
+                self.everyone.set(user_id, xp)
+            else:
+                self.everyone.add(user_id, amount)
+            total = self.everyone.score(user_id)
+
+            old_level = self.levels.get(user_id)
+            level = max(level or 1, old_level or 1)
+            self.levels[user_id] = level
+            old_rank = progression.rank_for_level(old_level) if old_level else None
+            rank = progression.rank_for_level(level)
+            if old_rank is not None and old_rank != rank:
+                self.tiers[old_rank].remove(user_id)
+            self.tiers.setdefault(rank, RankedScores()).set(user_id, total)
+
+            week = current_week(now)
+            if week != self.week:
+                self.weekly, self.week = RankedScores(), week
+            self.weekly.add(user_id, amount)
+
+    def ensure(self, user_id, xp, level):
+        """Put a user who joined since the last rebuild on the XP boards."""
+        with self._lock:
+            if user_id in self.levels:
+                return
+            self.levels[user_id] = level or 1
+            self.everyone.set(user_id, xp or 0)
+            self.tiers.setdefault(progression.rank_for_level(level), RankedScores()).set(user_id, xp or 0)
+
+    def _board(self, board, tier):
+        if board == 'weekly':
+            week = current_week()
+            if week != self.week:
+                self.weekly, self.week = RankedScores(), week
+            return self.weekly
+        if board == 'tier':
+            return self.tiers.get(tier) or RankedScores()
+        return self.everyone
+
+    def rank_of(self, user_id):
+        """Return the tier a user is ranked in, or None if they aren't on the boards."""
+        with self._lock:
+            level = self.levels.get(user_id)
+        return progression.rank_for_level(level) if level else None
+
+    def top(self, board='global', count=10, tier=None):
+        """Return ``(board size, entries)`` for the first ``count`` positions."""
+        with self._lock:
+            scores = self._board(board, tier)
+            return len(scores), scores.top(count)
+
+    def around(self, user_id, board='global', k=5, tier=None):
+        """Return ``(board size, position, entries)`` for a user and ``k`` neighbours each side.
+
+        The position is None (and there are no entries) if the user isn't on the board.
+        """
+        with self._lock:
+            scores = self._board(board, tier)
+            return len(scores), scores.position(user_id), scores.around(user_id, k)
+
+
+def stage_award(user_id, xp, level, amount):
+    """Queue an XP award for the leaderboards; applied when the session commits."""
+    if amount:
+        db.session.info.setdefault(_PENDING_KEY, []).append((user_id, xp, level, amount))
+
+
+def init_leaderboard(app):
+    """Attach the leaderboards and build them from the database.
+
+    If the tables don't exist yet (a fresh database) the boards are built on
+    first use instead.
+    """
+    leaderboard = Leaderboard(refresh_seconds=app.config.get('LEADERBOARD_REFRESH_SECONDS', 300))
+    app.extensions['leaderboard'] = leaderboard
+    with app.app_context():
+        try:
+            leaderboard.rebuild()
+        except (OperationalError, ProgrammingError):
+            db.session.rollback()
+
+
+def get_leaderboard():
+    """Return the leaderboards bound to the current app."""
+    return current_app.extensions['leaderboard']
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_awards(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and has_app_context() and 'leaderboard' in current_app.extensions:
+        leaderboard = get_leaderboard()
+        for award in pending:
+            leaderboard.record(*award)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_awards(session):
+    session.info.pop(_PENDING_KEY, None)
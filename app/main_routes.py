@@ -1,6 +1,22 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+import click
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from .models import User, Quest, db  # Import the models and db object
+from sqlalchemy import update
+from .models import User, UserSkillNode, db  # Import the models and db object
+from . import streaks
+from .activity_log import record_event, rollup, ROLLUP_MIN_EVENTS
+from .counters import award_xp
+from .database import upsert_insert
+from .helpers import import_quests
+from .expiry import sweep, EXPIRY_BATCH
+from .jobs import get_job_queue
+from .notifications import prune_notifications
+from .progress_cache import ProgressCache, get_progress_cache
+from .quest_scheduler import materialize, SCHEDULER_BATCH
+from .queries import active_quests, user_activity_counts
+from .skill_tree import PROGRESS_STATUSES, get_skill_tree
 
 # Create the Blueprint
 main_bp = Blueprint('main', __name__)
@@ -85,7 +101,7 @@ def dashboard():
     }
     
     # Get active quests for the user
-    quests = Quest.query.filter_by(user_id=current_user.id, completed=False).limit(5).all()
+    quests = active_quests(current_user.id, limit=5)
     
     return render_template('dashboard.html', user=user_data, quests=quests, title='Dashboard')
 
@@ -110,14 +126,12 @@ def player_status():
     Keeps labels and clean tables, removes dump/sample data and exposes only
     relevant information from the logged-in user's stats and progress.
     """
-    # Safely gather stats (core_stats and player_stats are JSON columns)
+    # Safely gather stats (dict views over the typed stat columns)
     core = current_user.core_stats or {}
     player = current_user.player_stats or {}
 
-    # Basic activity counters
-    active_quests = Quest.query.filter_by(user_id=current_user.id, completed=False).count()
-    total_quests = Quest.query.filter_by(user_id=current_user.id).count()
-    achievements_count = len(current_user.earned_achievements or [])
+    # Basic activity counters (a single aggregate query)
+    counts = user_activity_counts(current_user.id)
 
     stats = {
         'core': {
@@ -137,9 +151,9 @@ def player_status():
         'level': current_user.level,
         'xp': current_user.xp,
         'rank': current_user.rank,
-        'active_quests': active_quests,
-        'total_quests': total_quests,
-        'achievements_count': achievements_count
+        'active_quests': counts['active_quests'],
+        'total_quests': counts['total_quests'],
+        'achievements_count': counts['achievements_count']
     }
 
     return render_template('player_status.html', title='Player Status', stats=stats)
@@ -170,9 +184,15 @@ def profile():
                 flash('Email already registered.', 'danger')
                 return redirect(url_for('main.profile'))
 
+        timezone = request.form.get('timezone') or current_user.timezone
+        if not streaks.is_valid_timezone(timezone):
+            flash('Unknown time zone.', 'danger')
+            return redirect(url_for('main.profile'))
+
         # Apply changes
         current_user.username = username
         current_user.email = email
+        current_user.timezone = timezone
         if password:
             current_user.set_password(password)
 
@@ -184,10 +204,182 @@ def profile():
     # GET -> render profile page
     return render_template('profile.html', title='Your Profile')
 
+@main_bp.route('/skills')
+@login_required
+def skills():
+    """Skill tree page; the graph is loaded from /api/skills/nodes."""
+    return render_template('skill_tree.html', title='Skill Tree')
+
+@main_bp.route('/api/skills/nodes')
+@login_required
+def get_skill_nodes():
+    """Nodes (with the user's status) and edges of every skill tree, or of ``?skill=<id>``.
+
+    Sent with an ETag; a request carrying a matching If-None-Match gets an
+    empty 304.
+    """
+    engine = get_skill_tree()
+    skill_id = request.args.get('skill', type=int)
+    if skill_id is not None and skill_id not in engine.graphs():
+        return jsonify({'success': False, 'message': 'Skill not found'}), 404
+
+    document = engine.document(current_user.id, skill_id)
+    etag = ProgressCache.make_etag(document)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(document)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@main_bp.route('/api/skills/nodes/<int:node_id>', methods=['POST'])
+@login_required
+def update_skill_node(node_id):
+    """Start or complete an unlocked skill node; completing it awards its XP.
+
+    Example JSON: { "status": "completed" }
+    """
+    status = (request.get_json(silent=True) or {}).get('status')
+    if status not in PROGRESS_STATUSES:
+        return jsonify({'success': False, 'message': f'status must be one of {", ".join(PROGRESS_STATUSES)}'}), 400
+
+    engine = get_skill_tree()
+    graph = engine.graph_for_node(node_id)
+    if graph is None:
+        return jsonify({'success': False, 'message': 'Node not found'}), 404
+    progress = engine.user_progress(current_user.id)
+    before = engine.node_statuses(current_user.id, graph, progress)
+    if before[node_id] == 'completed':
+        return jsonify({'success': False, 'message': 'Node already completed'}), 400
+    if before[node_id] == 'locked':
+        return jsonify({'success': False, 'message': 'Node is locked'}), 400
+
+    xp_gained = graph.nodes[node_id]['xp_reward'] if status == 'completed' else 0
+    completed_at = datetime.utcnow() if status == 'completed' else None
+    try:
+        claimed = False
+        if node_id not in progress:
+            # A concurrent first submit may have created the row; fall through to the update
+            stmt = upsert_insert(UserSkillNode, db.session.get_bind()).values(
+                user_id=current_user.id, node_id=node_id, status=status, completed_at=completed_at)
+            stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', 'node_id'])
+            claimed = bool(db.session.execute(stmt).rowcount)
+        if not claimed:
+            # Guarded so two concurrent completions can't both award XP
+            claimed = db.session.execute(
+                update(UserSkillNode)
+                .where(UserSkillNode.user_id == current_user.id, UserSkillNode.node_id == node_id,
+                       UserSkillNode.status != 'completed')
+                .values(status=status, completed_at=completed_at)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not claimed:
+                db.session.rollback()
+                return jsonify({'success': False, 'message': 'Node already completed'}), 400
+        level_info = None
+        if xp_gained:
+            level_info = award_xp(current_user, xp_gained)
+            record_event(current_user.id, 'COMPLETE_SKILL_NODE', xp_gained)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if xp_gained:
+        get_progress_cache().invalidate(current_user.id)
+    progress[node_id] = status
+    after = engine.node_statuses(current_user.id, graph, progress)
+    return jsonify({
+        'success': True,
+        'status': status,
+        'xp_gained': xp_gained,
+        'leveled_up': bool(level_info and level_info['leveledUp']),
+        'unlocked': [other for other, value in after.items() if value == 'unlocked' and before[other] == 'locked']
+    })
+
 
 @main_bp.cli.command('init-db')
 def init_db_command():
     """Clear existing data and create new tables."""
     db.drop_all()
     db.create_all()
-    print('Initialized the database at sololeveling.db.')
\ No newline at end of file
+    print('Initialized the database at sololeveling.db.')
+
+
+@main_bp.cli.command('import-quests')
+@click.argument('path', type=click.File('rb'))
+@click.option('--user', 'username', required=True, help='Username that will own the quests.')
+def import_quests_command(path, username):
+    """Bulk-create quests for a user from a JSON Lines file ('-' for stdin)."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'No user named {username!r}.')
+
+    result = import_quests(path, user.id)
+    for error in result['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"Imported {result['created']} quests for {username} ({len(result['errors'])} errors).")
+
+@main_bp.cli.command('activity-rollup')
+@click.option('--min-events', type=int, default=ROLLUP_MIN_EVENTS, show_default=True,
+              help='Roll up users with at least this many events past their snapshot.')
+def activity_rollup_command(min_events):
+    """Advance activity snapshots for users with a long event tail."""
+    rolled = rollup(min_events=min_events)
+    print(f'Rolled up {rolled} users.')
+
+
+@main_bp.cli.command('run-jobs')
+@click.option('--limit', type=int, default=None, help='Stop after this many jobs.')
+def run_jobs_command(limit):
+    """Run queued jobs in this process until the queue is empty."""
+    ran = get_job_queue().run_pending(limit)
+    print(f'Ran {ran} jobs.')
+
+
+@main_bp.cli.command('job-metrics')
+def job_metrics_command():
+    """Print the job queue's depth, lag and failures as JSON."""
+    print(json.dumps(get_job_queue().metrics()))
+
+
+@main_bp.cli.command('prune-notifications')
+@click.option('--days', type=int, default=7, show_default=True, help='Keep notifications this many days.')
+def prune_notifications_command(days):
+    """Delete stored notifications older than --days (run daily)."""
+    pruned = prune_notifications(datetime.utcnow() - timedelta(days=days))
+    db.session.commit()
+    print(f'Pruned {pruned} notifications.')
+
+
+@main_bp.cli.command('habit-rollover')
+def habit_rollover_command():
+    """Reset habit streaks whose last period passed without a completion (run hourly)."""
+    reset = streaks.rollover()
+    print(f'Reset {reset} habit streaks.')
+
+
+@main_bp.cli.command('schedule-quests')
+@click.option('--batch-size', type=int, default=SCHEDULER_BATCH, show_default=True,
+              help='Recurring quests per INSERT.')
+def schedule_quests_command(batch_size):
+    """Create this day's and week's instances of every recurring quest (run hourly)."""
+    summary = materialize(batch_size=batch_size)
+    print(f"Created {summary['created']} quests from {summary['templates']} recurring quests "
+          f"in {summary['batches']} batches.")
+
+
+@main_bp.cli.command('expire-quests')
+@click.option('--penalty', type=float, default=None,
+              help='Share of an expired quest\'s XP reward taken from its owner (default: QUEST_EXPIRY_PENALTY).')
+@click.option('--batch-size', type=int, default=EXPIRY_BATCH, show_default=True, help='Quests per transaction.')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+def expire_quests_command(penalty, batch_size, max_batches):
+    """Mark open quests past their deadline as failed (run every few minutes)."""
+    if penalty is None:
+        penalty = current_app.config.get('QUEST_EXPIRY_PENALTY', 0.0)
+    summary = sweep(batch_size=batch_size, max_batches=max_batches, penalty=penalty)
+    print(f"Expired {summary['expired']} quests in {summary['batches']} batches "
+          f"({summary['penalty_xp']} XP in penalties).")
@@ -4,14 +4,23 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
 
+from .progression import LEVEL_THRESHOLDS, HUNTER_RANKS, level_progress
+
 db = SQLAlchemy()
 
+
+def _stat_value(value, default):
+    # Column defaults only apply on INSERT, so pending users still read None
+    return default if value is None else value
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    timezone = db.Column(db.String(50), nullable=False, default='UTC', server_default='UTC')  # IANA name; decides day/week/month boundaries
     
     # Solo Levelling / Character Progression
     level = db.Column(db.Integer, default=1)
@@ -19,24 +28,19 @@ class User(UserMixin, db.Model):
     xp = db.Column(db.Integer, default=0)
     
     # Core Stats (System-defined: 5 base stats that grow with leveling)
-    # Stored as JSON for flexibility
-    core_stats = db.Column(db.JSON, default=lambda: {
-        'strength': 10,
-        'intelligence': 10,
-        'agility': 10,
-        'willpower': 10,
-        'discipline': 10
-    })
-    
-    # Player Stats (User-defined: personal development metrics)
-    # Stored as JSON for flexibility
-    player_stats = db.Column(db.JSON, default=lambda: {
-        'meditation_streak': 0,
-        'books_read': 0,
-        'habits_completed': 0,
-        'goals_achieved': 0,
-        'quests_completed': 0
-    })
+    # Typed columns so stats can be indexed, aggregated and incremented in SQL
+    strength = db.Column('system_strength', db.Integer, nullable=False, default=10, server_default='10')
+    intelligence = db.Column('system_intelligence', db.Integer, nullable=False, default=10, server_default='10')
+    agility = db.Column('system_agility', db.Integer, nullable=False, default=10, server_default='10')
+    willpower = db.Column('system_willpower', db.Integer, nullable=False, default=10, server_default='10')
+    discipline = db.Column('system_discipline', db.Integer, nullable=False, default=10, server_default='10')
+
+    # Player Stats (personal development counters)
+    meditation_streak = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    books_read = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    habits_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    goals_achieved = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    quests_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     # 'Achievement' model holds achievement definitions; EarnedAchievement tracks which user earned which achievement
@@ -48,74 +52,46 @@ class User(UserMixin, db.Model):
         'MEDITATION_DAILY': 50,
         'READ_BOOK': 150,
         'COMPLETE_HABIT': 30,
-        'ACHIEVE_GOAL': 200
+        'ACHIEVE_GOAL': 200,
+        'DAILY_REPORT': 50
     }
 
-    # Level Thresholds
-    LEVEL_THRESHOLDS = [
-        0,      # Level 1
-        1000,   # Level 2
-        2500,   # Level 3
-        5000,   # Level 4
-        8000,   # Level 5
-        12000,  # Level 6
-        17000,  # Level 7
-        23000,  # Level 8
-        30000,  # Level 9
-        38000   # Level 10
-    ]
-
-    # Hunter Ranks
-    HUNTER_RANKS = {
-        1: 'E-Rank Hunter',
-        3: 'D-Rank Hunter',
-        5: 'C-Rank Hunter',
-        7: 'B-Rank Hunter',
-        9: 'A-Rank Hunter',
-        10: 'S-Rank Hunter'
-    }
-    
-    # Backward compatibility properties for core stats
-    @property
-    def strength(self):
-        return self.core_stats.get('strength', 10)
-    
-    @property
-    def intelligence(self):
-        return self.core_stats.get('intelligence', 10)
-    
-    @property
-    def agility(self):
-        return self.core_stats.get('agility', 10)
-    
-    @property
-    def willpower(self):
-        return self.core_stats.get('willpower', 10)
-    
-    @property
-    def discipline(self):
-        return self.core_stats.get('discipline', 10)
-    
-    # Backward compatibility properties for player stats
-    @property
-    def meditation_streak(self):
-        return self.player_stats.get('meditation_streak', 0)
-    
-    @property
-    def books_read(self):
-        return self.player_stats.get('books_read', 0)
-    
-    @property
-    def habits_completed(self):
-        return self.player_stats.get('habits_completed', 0)
+    # System stat keys (columns system_<key>)
+    CORE_STAT_KEYS = (
+        'strength',
+        'intelligence',
+        'agility',
+        'willpower',
+        'discipline'
+    )
+
+    # Player stat keys that activities may increment
+    PLAYER_STAT_KEYS = (
+        'meditation_streak',
+        'books_read',
+        'habits_completed',
+        'goals_achieved',
+        'quests_completed'
+    )
+
+    # Level Thresholds and Hunter Ranks (precomputed in progression.py)
+    LEVEL_THRESHOLDS = LEVEL_THRESHOLDS
+    HUNTER_RANKS = HUNTER_RANKS
     
+    # Backward compatibility views of the former JSON columns
     @property
-    def goals_achieved(self):
-        return self.player_stats.get('goals_achieved', 0)
-    
+    def core_stats(self):
+        return {key: _stat_value(getattr(self, key), 10) for key in self.CORE_STAT_KEYS}
+
     @property
-    def quests_completed(self):
-        return self.player_stats.get('quests_completed', 0)
+    def player_stats(self):
+        return {key: _stat_value(getattr(self, key), 0) for key in self.PLAYER_STAT_KEYS}
+
+    @player_stats.setter
+    def player_stats(self, values):
+        for key, value in (values or {}).items():
+            if key in self.PLAYER_STAT_KEYS:
+                setattr(self, key, value)
     
     # Password hashing and verification
     def set_password(self, password):
@@ -126,91 +102,42 @@ class User(UserMixin, db.Model):
         """Checks the provided password against the stored hash."""
         return check_password_hash(self.password_hash, password)
 
-    def add_xp(self, activity_type):
-        """Add XP for an activity and check for level up."""
-        if activity_type in self.XP_REWARDS:
-            old_level = self.level
-            self.xp += self.XP_REWARDS[activity_type]
-            
-            # Check for level up
-            for level, threshold in enumerate(self.LEVEL_THRESHOLDS):
-                if self.xp >= threshold:
-                    self.level = level + 1 # level-up to next level.
-            
-            # Check for rank update if leveled up
-            if self.level > old_level: # The relationship between the level & rank
-                self._update_rank()
-
-                
+    def check_achievements(self, commit=True, changed_stats=None):
+        """Check for new achievements and return any that were earned.
+
+        Rules are evaluated in memory by the app's achievement engine; only
+        those reading one of ``changed_stats`` are checked (all when None;
+        see ``RequirementIndex.satisfied`` for passing the old values).
+        New grants are committed together at the end, or left pending in the
+        session when ``commit=False``.
+        """
+        from .achievements import get_achievement_engine
+
+        earned = get_achievement_engine().award(self, changed_stats)
+        if earned and commit:
             db.session.commit()
-            return { # A dictionary to indicate level up status
-                'leveledUp': self.level > old_level,
-                'newLevel': self.level,
-                'newRank': self.rank if self.level > old_level else None
-            }
-        return None
-
-    def _update_rank(self):
-        """Update the hunter rank based on current level."""
-        for req_level, rank in sorted(self.HUNTER_RANKS.items(), reverse=True):
-            if self.level >= req_level:
-                self.rank = rank
-                break
-
-    def check_achievements(self):
-        """Check for new achievements and return any that were earned."""
-        earned = []
-        
-        # Achievement unlock conditions mapped to their titles
-        conditions = {
-            'Beginner Hunter': self.quests_completed >= 1,
-            'Dedicated Hunter': self.quests_completed >= 10,
-            'Meditation Master': self.meditation_streak >= 7,
-            'Bookworm': self.books_read >= 5,
-            'Habit Former': self.habits_completed >= 20,
-            'Goal Achiever': self.goals_achieved >= 5,
-        }
-        
-        # Check each condition and add achievement if earned
-        for title, condition_met in conditions.items():
-            if condition_met:
-                ach = Achievement.query.filter_by(title=title).first()
-                if ach:
-                    result = self._add_achievement(ach.id)
-                    if result:
-                        earned.append(title)
-        
         return earned
 
-    def _add_achievement(self, achievement_id):
+    def _add_achievement(self, achievement_id, commit=True):
         """Add an achievement if not already earned."""
-        existing = EarnedAchievement.query.filter_by(
-            user_id=self.id,
-            achievement_id=achievement_id
-        ).first()
-
-        if not existing:
-            earned = EarnedAchievement(
-                user_id=self.id,
-                achievement_id=achievement_id
-            )
-            db.session.add(earned)
+        from .achievements import get_achievement_engine
+
+        result = get_achievement_engine().grant(self, achievement_id)
+        if result and commit:
             db.session.commit()
-            # Return the achievement ID for logging
-            return achievement_id
-        return None
+        # Return the achievement ID for logging
+        return result
 
     def get_progress(self):
         """Get the user's current progress data for frontend display."""
-        next_level_xp = self.LEVEL_THRESHOLDS[self.level] if self.level < len(self.LEVEL_THRESHOLDS) else float('inf')
-        current_level_xp = self.LEVEL_THRESHOLDS[self.level - 1] if self.level > 0 else 0
-        
+        xp_progress, xp_needed = level_progress(self.xp, self.level)
+
         return {
             'level': self.level,
             'rank': self.rank,
             'xp': self.xp,
-            'xp_progress': (self.xp - current_level_xp) / (next_level_xp - current_level_xp) * 100,
-            'xp_needed': next_level_xp - self.xp,
+            'xp_progress': xp_progress,
+            'xp_needed': xp_needed,
             'stats': {
                 'strength': self.strength,
                 'intelligence': self.intelligence,
@@ -247,8 +174,52 @@ class Quest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     deadline = db.Column(db.DateTime)
     completed = db.Column(db.Boolean, default=False)
+    completed_at = db.Column(db.DateTime)
+    failed_at = db.Column(db.DateTime)  # set by the expiry sweep once the deadline passed
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('quests', lazy=True))
+    # Set on instances materialized from a RecurringQuest; period is the
+    # streaks.period_index of the day/week the instance belongs to
+    recurring_quest_id = db.Column(db.Integer, db.ForeignKey('recurring_quest.id'))
+    period = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.Index('ix_quest_user_type', 'user_id', 'quest_type'),
+        # A user's open quests in id order (dashboard, quest board), then the
+        # recently closed ones for the quest board
+        db.Index('ix_quest_user_open', 'user_id', 'id',
+                 sqlite_where=db.text('completed = 0 AND failed_at IS NULL'),
+                 postgresql_where=db.text('completed = false AND failed_at IS NULL')),
+        db.Index('ix_quest_user_completed_at', 'user_id', 'completed_at',
+                 sqlite_where=db.text('completed_at IS NOT NULL'),
+                 postgresql_where=db.text('completed_at IS NOT NULL')),
+        db.Index('ix_quest_user_failed_at', 'user_id', 'failed_at',
+                 sqlite_where=db.text('failed_at IS NOT NULL'), postgresql_where=db.text('failed_at IS NOT NULL')),
+        # Idempotency key: at most one instance per recurring quest and period
+        db.Index('ix_quest_recurrence', 'recurring_quest_id', 'period', unique=True),
+        # Due-date queue for the expiry sweep; expired quests drop out of it
+        db.Index('ix_quest_completed_deadline', 'completed', 'deadline',
+                 sqlite_where=db.text('failed_at IS NULL'), postgresql_where=db.text('failed_at IS NULL')),
+    )
+
+class RecurringQuest(db.Model):
+    """A daily or weekly quest the scheduler re-issues every period."""
+    __tablename__ = 'recurring_quest'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    difficulty = db.Column(db.String(50))
+    xp_reward = db.Column(db.Integer)
+    quest_type = db.Column(db.String(50), nullable=False)  # daily, weekly
+    active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    until = db.Column(db.DateTime)  # no instances after this (UTC); also caps their deadline
+
+    # The scheduler walks active templates of one type in id order
+    __table_args__ = (
+        db.Index('ix_recurring_quest_type_active', 'quest_type', 'active', 'id'),
+    )
 
 class Achievement(db.Model):
     __tablename__ = 'achievement'
@@ -260,6 +231,10 @@ class Achievement(db.Model):
     requirement = db.Column(db.Text)
     xp_bonus = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_achievement_title', 'title'),
+    )
     
     # Achievement definitions are global, not user-specific
     # EarnedAchievement handles the many-to-many relationship with User
@@ -274,9 +249,16 @@ class Habit(db.Model):
     best_streak = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_completed = db.Column(db.DateTime)
+    last_period = db.Column(db.Integer)  # streaks.period_index of last_completed in the owner's time zone
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('habits', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_habit_user', 'user_id'),
+        # Nightly rollover finds lapsed streaks per frequency
+        db.Index('ix_habit_frequency_period', 'frequency', 'last_period'),
+    )
+
 
 class EarnedAchievement(db.Model):
     __tablename__ = 'earned_achievement'
@@ -288,3 +270,168 @@ class EarnedAchievement(db.Model):
     # Relationships
     achievement = db.relationship('Achievement', backref='earned_by')
 
+    # One row per user/achievement pair; also the index for "has this user earned it"
+    __table_args__ = (
+        db.Index('ix_earned_achievement_user_achievement', 'user_id', 'achievement_id', unique=True),
+    )
+
+
+
+class ActivityEvent(db.Model):
+    """Append-only record of one XP/stat change; never updated in place."""
+    __tablename__ = 'activity_event'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    activity_type = db.Column(db.String(50), nullable=False)  # COMPLETE_QUEST, READ_BOOK, ...
+    xp_delta = db.Column(db.Integer, nullable=False, default=0)
+    stat_deltas = db.Column(db.JSON)  # {player stat: delta}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Replays read one user's tail in id order
+    __table_args__ = (
+        db.Index('ix_activity_event_user_id', 'user_id', 'id'),
+    )
+
+
+class ActivitySnapshot(db.Model):
+    """Per-user roll-up of the activity log up to ``last_event_id``."""
+    __tablename__ = 'activity_snapshot'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    xp = db.Column(db.Integer, nullable=False, default=0)
+    stats = db.Column(db.JSON)  # {player stat: total}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class DailyReport(db.Model):
+    """One user's activity totals (and optional reflection) for one day.
+
+    Counters are maintained incrementally as activity events are recorded.
+    """
+    __tablename__ = 'daily_report'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC
+    xp_gained = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    quests_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    habits_tracked = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    activities = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Daily Pro-Action Report reflection
+    the_win = db.Column(db.Text)
+    the_lesson = db.Column(db.Text)
+    the_plan = db.Column(db.Text)
+    submitted_at = db.Column(db.DateTime)
+
+    # One row per user and day; also serves history range reads
+    __table_args__ = (
+        db.Index('ix_daily_report_user_day', 'user_id', 'day', unique=True),
+    )
+
+
+class XpBucket(db.Model):
+    """XP one user earned in one hour, day or week (UTC).
+
+    ``bucket`` is the period's sequential index (see ``xp_windows.bucket_index``).
+    Maintained incrementally by every XP award.
+    """
+    __tablename__ = 'xp_bucket'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day, week
+    bucket = db.Column(db.Integer, nullable=False)
+    xp = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # One row per user and period; also serves range reads
+    __table_args__ = (
+        db.Index('ix_xp_bucket_user_period', 'user_id', 'granularity', 'bucket', unique=True),
+    )
+
+
+class Job(db.Model):
+    """Durable queue entry for deferred work; deleted once it has run."""
+    __tablename__ = 'job_queue'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    enqueued_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # retry backoff
+    started_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    # Workers claim the oldest available pending jobs
+    __table_args__ = (
+        db.Index('ix_job_queue_status_available', 'status', 'available_at'),
+    )
+
+
+class UserNotification(db.Model):
+    """A notification produced outside the request that earned it, kept for delivery from any process."""
+    __tablename__ = 'user_notification'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)  # as built by helpers.build_notifications
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Streams and polls read one user's notifications after a cursor
+    __table_args__ = (
+        db.Index('ix_user_notification_user_id', 'user_id', 'id'),
+    )
+
+
+class Skill(db.Model):
+    """A skill tree: nodes linked by prerequisites."""
+    __tablename__ = 'skill'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    description = db.Column(db.Text)
+    category = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SkillNode(db.Model):
+    """One topic or lesson in a skill tree."""
+    __tablename__ = 'skill_node'
+    id = db.Column(db.Integer, primary_key=True)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    node_type = db.Column(db.String(20), nullable=False, default='lesson')  # topic, lesson
+    xp_reward = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    skill = db.relationship('Skill', backref=db.backref('nodes', lazy=True))
+
+    __table_args__ = (
+        db.Index('ix_skill_node_skill', 'skill_id'),
+    )
+
+
+class NodeDependency(db.Model):
+    """Edge from a prerequisite node to the node that needs it (same skill).
+
+    Optional edges only suggest an order; they don't lock the node.
+    """
+    __tablename__ = 'node_dependency'
+    id = db.Column(db.Integer, primary_key=True)
+    node_id = db.Column(db.Integer, db.ForeignKey('skill_node.id'), nullable=False)
+    requires_id = db.Column(db.Integer, db.ForeignKey('skill_node.id'), nullable=False)
+    required = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
+
+    __table_args__ = (
+        db.Index('ix_node_dependency_edge', 'node_id', 'requires_id', unique=True),
+    )
+
+
+class UserSkillNode(db.Model):
+    """A user's progress on one skill node (no row: not started)."""
+    __tablename__ = 'user_skill_node'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    node_id = db.Column(db.Integer, db.ForeignKey('skill_node.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in-progress')  # in-progress, completed
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_user_skill_node_user_node', 'user_id', 'node_id', unique=True),
+    )
@@ -0,0 +1,178 @@
+"""In-process pub/sub for live user notifications.
+
+Progress updates and stored notifications are streamed to the browser over Server-Sent Events (``/api/notifications/stream``).
+Every subscriber has its own bounded buffer: a slow or stalled client loses
+its oldest messages (and is told to resync) instead of growing memory or
+holding up the publisher. Each user can hold only a few streams at once.
+Streams are opt-in (``SSE_ENABLED``) since each one holds a worker thread;
+without them pages poll ``/api/notifications`` and ``/api/progress``.
+
+Published messages are best effort and per process: they only reach streams
+connected to the worker process that published them, so only progress
+updates go this way. Level-ups and achievements a request produces are
+shown from its response, which always carries them. Notifications produced
+later by deferred jobs (achievements earned in the background) are stored
+as ``UserNotification`` rows, which every stream reads after its cursor
+once per heartbeat and clients without a stream fetch from
+``/api/notifications``. Stored events carry their row
+id as the SSE event id, so a reconnecting stream resumes where it left off.
+"""
+import json
+import threading
+from collections import deque
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from .models import db, UserNotification
+
+# Stored notifications read per query
+STORED_BATCH = 50
+
+
+class Subscription:
+    """One stream's bounded message buffer."""
+
+    def __init__(self, user_id, max_messages):
+        self.user_id = user_id
+        self._messages = deque(maxlen=max_messages)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, message):
+        with self._cond:
+            if len(self._messages) == self._messages.maxlen:
+                self.dropped += 1
+            self._messages.append(message)
+            self._cond.notify()
+
+    def get(self, timeout):
+        """Wait up to ``timeout`` seconds and return ``(messages, dropped)``.
+
+        Both are reset once returned; ``messages`` is empty on a timeout.
+        """
+        with self._cond:
+            if not self._messages:
+                self._cond.wait(timeout)
+            messages = list(self._messages)
+            self._messages.clear()
+            dropped, self.dropped = self.dropped, 0
+        return messages, dropped
+
+
+class NotificationBroker:
+    """Fans published messages out to each of a user's subscriptions."""
+
+    def __init__(self, buffer_size=100, max_streams_per_user=5):
+        self.buffer_size = buffer_size
+        self.max_streams_per_user = max_streams_per_user
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user id -> list of Subscription
+
+    def subscribe(self, user_id):
+        """Return a new subscription, or None if the user has too many streams."""
+        subscription = Subscription(user_id, self.buffer_size)
+        with self._lock:
+            subscriptions = self._subscribers.setdefault(user_id, [])
+            if len(subscriptions) >= self.max_streams_per_user:
+                return None
+            subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event, data):
+        """Queue an ``event`` with JSON ``data`` for every stream of a user."""
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put((event, data))
+        return len(subscriptions)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+
+def format_sse(event, data, event_id=None):
+    """Encode one Server-Sent Events message."""
+    message = f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+    return message if event_id is None else f'id: {event_id}\n{message}'
+
+
+def stream_messages(broker, subscription, heartbeat=15, retry_ms=3000, fetch_stored=None, after=0):
+    """Yield SSE text for a subscription until the client goes away.
+
+    Sends a comment every ``heartbeat`` seconds so proxies keep the
+    connection open, and a ``resync`` event when the buffer overflowed.
+    ``fetch_stored(after)`` is called once per wakeup for the stored
+    notifications past the last one sent (``after`` to begin with).
+    """
+    try:
+        yield f'retry: {retry_ms}\n\n'
+        while True:
+            sent = False
+            if fetch_stored is not None:
+                for event_id, notification in fetch_stored(after):
+                    yield format_sse(notification['type'], notification, event_id)
+                    after, sent = event_id, True
+            messages, dropped = subscription.get(heartbeat)
+            if dropped:
+                yield format_sse('resync', {'dropped': dropped})
+            for event, data in messages:
+                yield format_sse(event, data)
+            if not (sent or messages or dropped):
+                yield ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def publish_progress(user_id, progress):
+    """Publish a progress payload to the user's streams in this process."""
+    get_notification_broker().publish(user_id, 'progress', progress)
+
+
+def store_notifications(user_id, notifications):
+    """Stage notifications for delivery from any process (no commit)."""
+    db.session.add_all(UserNotification(user_id=user_id, payload=notification) for notification in notifications)
+
+
+def stored_notifications(user_id, after, limit=STORED_BATCH):
+    """Return ``[(id, notification)]`` stored for a user after id ``after``, oldest first."""
+    return db.session.execute(
+        select(UserNotification.id, UserNotification.payload)
+        .where(UserNotification.user_id == user_id, UserNotification.id > after)
+        .order_by(UserNotification.id)
+        .limit(limit)
+    ).all()
+
+
+def latest_notification_id(user_id):
+    """Return the id of the user's newest stored notification (0 if none): a cursor for new ones."""
+    return db.session.scalar(
+        select(func.max(UserNotification.id)).where(UserNotification.user_id == user_id)
+    ) or 0
+
+
+def prune_notifications(before):
+    """Delete stored notifications created before ``before`` (no commit); return how many."""
+    return db.session.execute(delete(UserNotification).where(UserNotification.created_at < before)).rowcount
+
+
+def init_notifications(app):
+    """Attach the notification broker configured for the app."""
+    app.extensions['notification_broker'] = NotificationBroker(
+        buffer_size=app.config.get('SSE_BUFFER_SIZE', 100),
+        max_streams_per_user=app.config.get('SSE_MAX_STREAMS_PER_USER', 5),
+    )
+
+
+def get_notification_broker():
+    """Return the notification broker bound to the current app."""
+    return current_app.extensions['notification_broker']
@@ -1,29 +1,51 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for
 from flask_login import login_required, current_user
-from .models import db, Quest, Achievement, Habit, User
+from .models import db, Quest, Achievement, Habit, User, RecurringQuest
+from .helpers import complete_quests, calculate_xp_reward, import_quests, MAX_QUEST_BATCH
+from .activity_log import record_event
+from .counters import increment_counters
+from . import quest_scheduler, streaks
+from .daily_reports import bump as bump_daily_report
+from .progression import level_for_xp
+from .progress_cache import get_progress_cache
+from .queries import quest_board, QUEST_BOARD_PAGE_SIZE
 from datetime import datetime, timedelta
 
 pd_bp = Blueprint('pd', __name__)
 
 @pd_bp.route('/tasks')
 def tasks():
-    """List all personal development tasks."""
+    """List personal development tasks.
+
+    Shows open quests and those completed in the last ``days`` days (default
+    7), a page at a time; ``after`` is the cursor returned by the previous
+    page.
+    """
+    days = min(max(request.args.get('days', 7, type=int), 0), 3650)
+    after = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', QUEST_BOARD_PAGE_SIZE, type=int), 1), QUEST_BOARD_PAGE_SIZE)
+
     # Get the current user's quests
-    daily_quests = Quest.query.filter_by(user_id=current_user.id, quest_type='daily').all() if current_user.is_authenticated else []
-    weekly_quests = Quest.query.filter_by(user_id=current_user.id, quest_type='weekly').all() if current_user.is_authenticated else []
-    achievement_quests = Quest.query.filter_by(user_id=current_user.id, quest_type='achievement').all() if current_user.is_authenticated else []
-    
+    board, next_cursor = {}, None
+    if current_user.is_authenticated:
+        board, next_cursor = quest_board(current_user.id, completed_within_days=days, after_id=after, limit=limit)
+
     return render_template('tasks.html',
-                         daily_quests=daily_quests,
-                         weekly_quests=weekly_quests,
-                         achievement_quests=achievement_quests)
+                         daily_quests=board.get('daily', []),
+                         weekly_quests=board.get('weekly', []),
+                         achievement_quests=board.get('achievement', []),
+                         next_cursor=next_cursor,
+                         days=days)
 
 @pd_bp.route('/tasks/new', methods=['POST'])
 @login_required
 def create_task():
     """Create a new personal development task."""
     data = request.json
-    
+
+    if data.get('recurring'):
+        return create_recurring_task(data)
+
     new_quest = Quest(
         title=data['title'],
         description=data['description'],
@@ -39,37 +61,100 @@ def create_task():
     
     return jsonify({'message': 'Task created successfully!', 'quest_id': new_quest.id})
 
+def create_recurring_task(data):
+    """Create a recurring daily/weekly quest and issue this period's instance.
+
+    ``deadline`` (optional) is the last day the quest recurs.
+    """
+    if data.get('quest_type') not in quest_scheduler.RECURRING_TYPES:
+        return jsonify({'message': 'Only daily and weekly quests can recur.'}), 400
+
+    template = RecurringQuest(
+        title=data['title'],
+        description=data.get('description'),
+        difficulty=data['difficulty'],
+        xp_reward=calculate_xp_reward(data['difficulty']),
+        quest_type=data['quest_type'],
+        until=datetime.strptime(data['deadline'], '%Y-%m-%d') + timedelta(days=1) if data.get('deadline') else None,
+        user_id=current_user.id
+    )
+    try:
+        db.session.add(template)
+        db.session.flush()
+        quest_scheduler.issue(template)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    quest = Quest.query.filter_by(recurring_quest_id=template.id).first()
+    return jsonify({'message': 'Recurring task created successfully!', 'recurring_quest_id': template.id,
+                    'quest_id': quest.id if quest else None})
+
+@pd_bp.route('/tasks/recurring/<int:recurring_id>/stop', methods=['POST'])
+@login_required
+def stop_recurring_task(recurring_id):
+    """Stop issuing new instances of a recurring quest (existing ones stay)."""
+    template = RecurringQuest.query.filter_by(id=recurring_id, user_id=current_user.id).first_or_404()
+    template.active = False
+    db.session.commit()
+    return jsonify({'message': 'Recurring task stopped.'})
+
+@pd_bp.route('/tasks/import', methods=['POST'])
+@login_required
+def import_tasks():
+    """Bulk-create tasks from a JSON Lines body (one quest object per line).
+
+    Each line looks like the /tasks/new payload. Invalid lines are reported
+    with their line number and don't stop the rest of the import.
+    """
+    result = import_quests(request.stream, current_user.id)
+    result['success'] = result['created'] > 0 or not result['errors']
+    return jsonify(result)
+
 @pd_bp.route('/tasks/<int:task_id>/complete', methods=['POST'])
 @login_required
 def complete_task(task_id):
-    """Mark a task as complete and award XP."""
-    quest = Quest.query.get_or_404(task_id)
-    user = current_user
-    
-    if quest.completed:
-        return jsonify({'message': 'Task already completed!'})
-    
-    # Mark quest as complete
-    quest.completed = True
-    
-    # Award XP to user
-    user.xp += quest.xp_reward
-    
-    # Check for level up
-    new_level = calculate_level(user.xp)
-    if new_level > user.level:
-        user.level = new_level
-        flash(f'Congratulations! You reached level {new_level}!', 'success')
-    
-    db.session.commit()
-    
+    """Mark one of the user's tasks as complete and award its XP."""
+    # Same unit of work as the batch endpoint; achievements and the daily
+    # report are queued
+    result = complete_quests(current_user, [task_id], defer=True)
+    if not result['success']:
+        reason = result['skipped'][0]['reason']
+        if reason == 'already_completed':
+            return jsonify({'message': 'Task already completed!'})
+        if reason == 'expired':
+            return jsonify({'message': 'Task expired!'}), 400
+        return jsonify({'message': 'Task not found.'}), 404
+
     return jsonify({
         'message': 'Task completed successfully!',
-        'xp_gained': quest.xp_reward,
-        'new_total_xp': user.xp,
-        'level': user.level
+        'xp_gained': result['xp_gained'],
+        'new_total_xp': result['progress']['xp'],
+        'level': result['progress']['level'],
+        'notifications': result['notifications']
     })
 
+@pd_bp.route('/tasks/complete', methods=['POST'])
+@login_required
+def complete_tasks():
+    """Complete several tasks in one request.
+
+    Example JSON: { "ids": [3, 4, 7] }
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'success': False, 'message': 'Provide a non-empty list of task ids.'}), 400
+    if len(ids) > MAX_QUEST_BATCH:
+        return jsonify({'success': False, 'message': f'At most {MAX_QUEST_BATCH} tasks per request.'}), 400
+    try:
+        ids = [int(task_id) for task_id in ids]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Task ids must be integers.'}), 400
+
+    return jsonify(complete_quests(current_user, ids))
+
 @pd_bp.route('/habits')
 @login_required
 def habits():
@@ -78,27 +163,35 @@ def habits():
     return render_template('habits.html', habits=habits)
 
 @pd_bp.route('/habits/track', methods=['POST'])
+@login_required
 def track_habit():
-    """Track a habit completion."""
-    data = request.json
-    habit = Habit.query.get_or_404(data['habit_id'])
-    
-    # Update streak
-    if not habit.last_completed or \
-       habit.last_completed.date() < datetime.utcnow().date() - timedelta(days=1):
-        habit.current_streak = 1
-    else:
-        habit.current_streak += 1
-    
-    # Update best streak if current is higher
-    if habit.current_streak > habit.best_streak:
-        habit.best_streak = habit.current_streak
-    
-    habit.last_completed = datetime.utcnow()
-    db.session.commit()
-    
+    """Track a habit completion for the current period (day, week or month).
+
+    Example JSON: { "habit_id": 3 }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        habit_id = int(data.get('habit_id'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Provide a habit_id.'}), 400
+
+    habit = Habit.query.filter_by(id=habit_id, user_id=current_user.id).first()
+    if habit is None:
+        return jsonify({'success': False, 'message': 'Habit not found.'}), 404
+
+    tracked = streaks.track(habit, streaks.get_zone(current_user.timezone))
+    if tracked:
+        try:
+            bump_daily_report(habit.user_id, {'habits_tracked': 1})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
     return jsonify({
-        'message': 'Habit tracked successfully!',
+        'success': True,
+        'message': 'Habit tracked successfully!' if tracked else f'Already tracked this {streaks.PERIOD_NAMES.get(habit.frequency, "day")}.',
+        'tracked': tracked,
         'current_streak': habit.current_streak,
         'best_streak': habit.best_streak
     })
@@ -121,53 +214,44 @@ def stats():
 def update_stats():
     """Update player-defined stats. Accepts JSON payload with keys for player_stats.
 
-    Example JSON: { "meditation_streak": 3, "books_read": 2 }
+    Top-level keys set a stat to the given value and keys under
+    ``increments`` add to it. Both are applied in SQL as deltas (a set is the
+    difference from the loaded value), so concurrent updates don't overwrite
+    each other and each change is recorded in the activity log.
+
+    Example JSON: { "meditation_streak": 3, "increments": { "books_read": 1 } }
     """
     data = request.get_json() or {}
+    increments = data.pop('increments', None) or {}
+    if not isinstance(increments, dict):
+        return jsonify({'success': False, 'message': 'increments must be an object.'}), 400
+
     # Only accept known player stat keys to avoid accidental injection
-    allowed = {'meditation_streak', 'books_read', 'habits_completed', 'goals_achieved', 'quests_completed'}
-    player = current_user.player_stats or {}
+    try:
+        values = {k: int(v) for k, v in data.items() if k in User.PLAYER_STAT_KEYS}
+        increments = {k: int(v) for k, v in increments.items() if k in User.PLAYER_STAT_KEYS}
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Stat values must be integers.'}), 400
+
+    if not values and not increments:
+        return jsonify({'success': False, 'message': 'No valid fields provided.'}), 400
+
+    # Set values become deltas against the loaded row so the activity log
+    # stays a complete history of every change
+    deltas = dict(increments)
+    for k, v in values.items():
+        deltas[k] = deltas.get(k, 0) + v - (getattr(current_user, k) or 0)
 
-    changed = False
-    for k, v in data.items():
-        if k in allowed:
-            try:
-                player[k] = int(v)
-            except Exception:
-                player[k] = v
-            changed = True
-
-    if changed:
-        current_user.player_stats = player
-        db.session.add(current_user)
+    try:
+        increment_counters(current_user, deltas)
+        record_event(current_user.id, 'UPDATE_STATS', 0, deltas)
         db.session.commit()
-        return jsonify({'success': True, 'player_stats': current_user.player_stats})
-
-    return jsonify({'success': False, 'message': 'No valid fields provided.'}), 400
-
-def calculate_xp_reward(difficulty):
-    """Calculate XP reward based on task difficulty."""
-    xp_map = {
-        'E': 50,
-        'D': 100,
-        'C': 200,
-        'B': 350,
-        'A': 500,
-        'S': 1000
-    }
-    return xp_map.get(difficulty.upper(), 100)
+    except Exception:
+        db.session.rollback()
+        raise
+    get_progress_cache().invalidate(current_user.id)
+    return jsonify({'success': True, 'player_stats': current_user.player_stats})
 
 def calculate_level(xp):
-    """Calculate level based on total XP."""
-    # Each level requires base_xp * level_multiplier * current_level XP
-    base_xp = 1000
-    level_multiplier = 1.5
-    
-    level = 1
-    xp_required = base_xp
-    
-    while xp >= xp_required:
-        level += 1
-        xp_required = int(base_xp * (level_multiplier ** (level - 1)))
-    
-    return level
\ No newline at end of file
+    """Calculate level based on total XP (shared progression table)."""
+    return level_for_xp(xp)
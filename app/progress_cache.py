@@ -0,0 +1,169 @@
+"""Per-user progress snapshot cache.
+
+``User.get_progress()`` loads the user's earned achievements and re-derives
+XP progress on every call, and the dashboard polls it. Snapshots are cached
+per user together with an ETag so unchanged polls can be answered with a 304
+without rebuilding anything. The activity pipeline refreshes the snapshot
+whenever it changes a user's progress.
+
+Refreshes and invalidations only reach the backend of the process that made
+the write. Two backends are available, picked with
+``PROGRESS_CACHE_BACKEND``:
+
+- ``memory``: in-process LRU with a TTL (default). Other gunicorn workers
+  and CLI jobs (such as expiry penalties) don't clear it, so a worker can
+  serve a snapshot up to ``PROGRESS_CACHE_TTL`` seconds (15 by default)
+  older than the database.
+- ``sqlite``: a local SQLite file shared by every worker on the host, so
+  writes made on that host are seen at once; writes from other hosts still
+  take up to ``PROGRESS_CACHE_TTL`` to show.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import current_app
+
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SqliteBackend:
+    """Cache stored in a local SQLite file so several worker processes share it.
+
+    SQLite locks the file across processes and applies each statement
+    atomically, so an invalidation is never lost to another worker's write
+    and no reader sees a half-written record. Values are JSON encoded with a
+    wall-clock expiry. A busy store or an undecodable record is a miss; a
+    delete that fails after ``timeout`` seconds is logged, as the old
+    snapshot can then be served until it expires.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS progress_cache '
+                         '(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)')
+
+    @contextmanager
+    def _connect(self):
+        # One connection per call: nothing is shared across threads or forked workers
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT expires_at, value FROM progress_cache WHERE key = ?',
+                                   (str(key),)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or row[0] < time.time():
+            return None
+        try:
+            return json.loads(row[1])
+        except ValueError:
+            return None
+
+    def set(self, key, value, ttl):
+        try:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO progress_cache (key, expires_at, value) VALUES (?, ?, ?)',
+                             (str(key), time.time() + ttl, json.dumps(value)))
+        except sqlite3.Error:
+            pass  # the next read rebuilds it
+
+    def delete(self, key):
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM progress_cache WHERE key = ?', (str(key),))
+        except sqlite3.Error:
+            current_app.logger.warning('Progress cache: could not invalidate user %s in %s', key, self.path, exc_info=True)
+
+
+class ProgressCache:
+    """Caches ``User.get_progress()`` snapshots and their ETags."""
+
+    def __init__(self, backend, ttl=15):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def make_etag(payload):
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()
+
+    def peek(self, user_id):
+        """Return the cached ``(payload, etag)`` for a user, or None."""
+        snapshot = self.backend.get(user_id)
+        if snapshot is None:
+            return None
+        return snapshot['payload'], snapshot['etag']
+
+    def refresh(self, user):
+        """Rebuild, store and return the ``(payload, etag)`` for a user."""
+        payload = user.get_progress()
+        etag = self.make_etag(payload)
+        self.backend.set(user.id, {'payload': payload, 'etag': etag}, self.ttl)
+        return payload, etag
+
+    def snapshot(self, user):
+        """Return the cached snapshot for a user, building it on a miss."""
+        return self.peek(user.id) or self.refresh(user)
+
+    def invalidate(self, user_id):
+        self.backend.delete(user_id)
+
+
+def init_progress_cache(app):
+    """Attach the progress cache configured for the app."""
+    if app.config.get('PROGRESS_CACHE_BACKEND', 'memory') == 'sqlite':
+        path = app.config.get('PROGRESS_CACHE_PATH') or os.path.join(app.instance_path, 'progress_cache.sqlite')
+        backend = SqliteBackend(path)
+    else:
+        backend = MemoryBackend(app.config.get('PROGRESS_CACHE_SIZE', 10000))
+    app.extensions['progress_cache'] = ProgressCache(backend, app.config.get('PROGRESS_CACHE_TTL', 15))
+
+
+def get_progress_cache():
+    """Return the progress cache bound to the current app."""
+    return current_app.extensions['progress_cache']
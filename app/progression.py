@@ -0,0 +1,79 @@
+"""Level and rank progression.
+
+The XP needed for every level is precomputed once into a sorted table so
+resolving a level (or rank) is a bisect, however high the level cap goes.
+XP is awarded by ``counters.award_xp``, which resolves levels through this
+table.
+"""
+from bisect import bisect_right
+
+# Hand-tuned thresholds for the first ten levels
+BASE_LEVEL_THRESHOLDS = [
+    0,      # Level 1
+    1000,   # Level 2
+    2500,   # Level 3
+    5000,   # Level 4
+    8000,   # Level 5
+    12000,  # Level 6
+    17000,  # Level 7
+    23000,  # Level 8
+    30000,  # Level 9
+    38000   # Level 10
+]
+
+MAX_LEVEL = 500
+
+# Past level 10 each level costs 1000 XP more than the previous one
+LEVEL_STEP_INCREASE = 1000
+
+# Hunter Ranks (minimum level -> rank)
+HUNTER_RANKS = {
+    1: 'E-Rank Hunter',
+    3: 'D-Rank Hunter',
+    5: 'C-Rank Hunter',
+    7: 'B-Rank Hunter',
+    9: 'A-Rank Hunter',
+    10: 'S-Rank Hunter'
+}
+
+
+def _build_level_thresholds(max_level):
+    thresholds = list(BASE_LEVEL_THRESHOLDS[:max_level])
+    step = thresholds[-1] - thresholds[-2]
+    while len(thresholds) < max_level:
+        step += LEVEL_STEP_INCREASE
+        thresholds.append(thresholds[-1] + step)
+    return thresholds
+
+
+# LEVEL_THRESHOLDS[n] is the total XP needed to reach level n + 1
+LEVEL_THRESHOLDS = _build_level_thresholds(MAX_LEVEL)
+
+_RANK_LEVELS = sorted(HUNTER_RANKS)
+_RANK_NAMES = [HUNTER_RANKS[level] for level in _RANK_LEVELS]
+
+
+def level_for_xp(xp):
+    """Return the level reached with ``xp`` total XP."""
+    return max(bisect_right(LEVEL_THRESHOLDS, xp or 0), 1)
+
+
+def rank_for_level(level):
+    """Return the hunter rank for a level."""
+    index = bisect_right(_RANK_LEVELS, level or 1) - 1
+    return _RANK_NAMES[max(index, 0)]
+
+
+def level_progress(xp, level):
+    """Return ``(percent through the level, XP still needed)`` for display."""
+    xp = xp or 0
+    level = min(max(level or 1, 1), MAX_LEVEL)
+    if level >= MAX_LEVEL:
+        return 100.0, 0
+
+    current_level_xp = LEVEL_THRESHOLDS[level - 1]
+    next_level_xp = LEVEL_THRESHOLDS[level]
+    percent = (xp - current_level_xp) / (next_level_xp - current_level_xp) * 100
+    # Levels reached under an older curve can sit outside their XP band
+    return min(max(percent, 0.0), 100.0), max(next_level_xp - xp, 0)
+
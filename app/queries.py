@@ -0,0 +1,88 @@
+"""Read-side queries for the dashboard and player status pages.
+
+Each helper answers what a page needs in a fixed number of queries, however
+many quests or achievements the user has.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, select, union_all
+from sqlalchemy.orm import selectinload
+
+from .models import db, Quest, EarnedAchievement
+
+QUEST_BOARD_PAGE_SIZE = 100
+QUEST_BOARD_TYPES = ('daily', 'weekly', 'achievement')
+
+
+def user_activity_counts(user_id):
+    """Return total quests, active quests and earned achievements in one query."""
+    achievements = (
+        select(func.count(EarnedAchievement.id))
+        .where(EarnedAchievement.user_id == user_id)
+        .scalar_subquery()
+    )
+    stmt = select(
+        func.count(Quest.id),
+        func.coalesce(func.sum(case((and_(Quest.completed == False, Quest.failed_at.is_(None)), 1), else_=0)), 0),
+        achievements,
+    ).where(Quest.user_id == user_id)
+
+    total, active, achievement_count = db.session.execute(stmt).one()
+    return {
+        'total_quests': total,
+        'active_quests': active,
+        'achievements_count': achievement_count
+    }
+
+
+def active_quests(user_id, limit=None):
+    """Return a user's open quests (oldest first) with their owner preloaded."""
+    query = (
+        Quest.query
+        .options(selectinload(Quest.user))
+        .filter_by(user_id=user_id, completed=False, failed_at=None)
+        .order_by(Quest.id)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def _quest_board_ids(user_id, cutoff, after_id, limit):
+    """Select the ids on one board page: a UNION ALL of three index range scans.
+
+    Open quests come from ``ix_quest_user_open`` already in id order; quests
+    completed or expired since ``cutoff`` from ``ix_quest_user_completed_at``
+    and ``ix_quest_user_failed_at``. Old history is never read.
+    """
+    def branch(*conditions):
+        stmt = select(Quest.id).where(Quest.user_id == user_id, *conditions)
+        if after_id is not None:
+            stmt = stmt.where(Quest.id > after_id)
+        return select(stmt.order_by(Quest.id).limit(limit + 1).subquery().c.id)
+
+    return union_all(
+        branch(Quest.completed == False, Quest.failed_at.is_(None)),
+        branch(Quest.completed_at >= cutoff),
+        branch(Quest.failed_at >= cutoff),
+    ).subquery()
+
+
+def quest_board(user_id, completed_within_days=7, after_id=None, limit=QUEST_BOARD_PAGE_SIZE):
+    """Return one page of a user's quest board in a single query.
+
+    The page holds open quests plus those completed or expired in the last
+    ``completed_within_days`` days, ordered by id and resumed after
+    ``after_id`` (keyset pagination). Returns the quests partitioned by type
+    and the cursor for the next page (None on the last one).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=completed_within_days)
+    ids = _quest_board_ids(user_id, cutoff, after_id, limit)
+    rows = Quest.query.filter(Quest.id.in_(select(ids.c.id))).order_by(Quest.id).limit(limit + 1).all()
+
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    board = {quest_type: [] for quest_type in QUEST_BOARD_TYPES}
+    for quest in rows[:limit]:
+        if quest.quest_type in board:
+            board[quest.quest_type].append(quest)
+    return board, next_cursor
@@ -0,0 +1,136 @@
+"""Recurring daily and weekly quests.
+
+A ``RecurringQuest`` is a template the scheduler turns into one ``Quest``
+instance per day or week, following the owner's time zone like habit
+streaks do. Each instance carries ``(recurring_quest_id, period)`` under a
+unique index, which is the idempotency key: instances are created with
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING``, so re-running the
+scheduler (or running it again after a crash half-way through) never
+duplicates a quest.
+
+``materialize()`` issues one such statement per batch of templates per
+(time zone, quest type) pair and logs how long each batch took. Instances
+are due at the end of their period, or at the template's ``until`` when that
+comes first; templates past ``until`` are skipped. Run it hourly (``flask
+main schedule-quests``) so every time zone's new day is covered shortly
+after midnight.
+"""
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import DateTime, Integer, and_, case, distinct, false, func, literal, or_, select
+
+from .database import upsert_insert
+from .models import db, User, Quest, RecurringQuest
+from .streaks import DEFAULT_TIMEZONE, current_period, get_zone
+
+RECURRING_TYPES = ('daily', 'weekly')
+
+# Templates per INSERT ... SELECT
+SCHEDULER_BATCH = 1000
+
+_INSTANCE_COLUMNS = ('user_id', 'title', 'description', 'difficulty', 'xp_reward', 'quest_type',
+                     'created_at', 'deadline', 'completed', 'recurring_quest_id', 'period')
+
+
+def period_bounds(quest_type, zone, now=None):
+    """Return ``(period, start, end)`` of the current day or week in ``zone``.
+
+    ``start`` and ``end`` are naive UTC datetimes (local midnights).
+    """
+    period = current_period(quest_type, zone, now)
+    if quest_type == 'weekly':
+        first, length = date.fromordinal(period * 7 + 1), 7
+    else:
+        first, length = date.fromordinal(period), 1
+
+    def utc(day):
+        local = datetime.combine(day, datetime.min.time(), tzinfo=zone)
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return period, utc(first), utc(first + timedelta(days=length))
+
+
+def _due_templates(quest_type, zone_name, start):
+    zone_users = select(User.id).where(func.coalesce(User.timezone, DEFAULT_TIMEZONE) == zone_name)
+    return and_(
+        RecurringQuest.quest_type == quest_type,
+        RecurringQuest.active == True,
+        or_(RecurringQuest.until.is_(None), RecurringQuest.until > start),
+        RecurringQuest.user_id.in_(zone_users),
+    )
+
+
+def _insert_instances(quest_type, zone_name, now, *conditions):
+    """Create the current instance of every matching template; return how many were new."""
+    period, start, end = period_bounds(quest_type, get_zone(zone_name), now)
+    deadline = case(
+        (and_(RecurringQuest.until.isnot(None), RecurringQuest.until < end), RecurringQuest.until),
+        else_=literal(end, DateTime),
+    )
+    rows = select(
+        RecurringQuest.user_id, RecurringQuest.title, RecurringQuest.description,
+        RecurringQuest.difficulty, RecurringQuest.xp_reward, RecurringQuest.quest_type,
+        literal(now, DateTime), deadline, false(), RecurringQuest.id, literal(period, Integer),
+    ).where(_due_templates(quest_type, zone_name, start), *conditions)
+
+    stmt = upsert_insert(Quest, db.session.get_bind()).from_select(_INSTANCE_COLUMNS, rows)
+    stmt = stmt.on_conflict_do_nothing(index_elements=['recurring_quest_id', 'period'])
+    return db.session.execute(stmt).rowcount
+
+
+def issue(template, now=None):
+    """Create the current instance of one template, if it doesn't exist yet (no commit)."""
+    owner = db.session.get(User, template.user_id)
+    return _insert_instances(template.quest_type, owner.timezone or DEFAULT_TIMEZONE,
+                             now or datetime.utcnow(), RecurringQuest.id == template.id)
+
+
+def materialize(now=None, batch_size=SCHEDULER_BATCH):
+    """Create this period's instance of every active recurring quest.
+
+    Templates are walked in id order, ``batch_size`` at a time per time zone
+    and quest type; each batch is one INSERT committed on its own, so an
+    interrupted run loses at most one batch of work. Returns
+    ``{'templates', 'created', 'batches'}``.
+    """
+    now = now or datetime.utcnow()
+    zones = db.session.scalars(
+        select(distinct(func.coalesce(User.timezone, DEFAULT_TIMEZONE)))
+        .join(RecurringQuest, RecurringQuest.user_id == User.id)
+        .where(RecurringQuest.active == True)
+    ).all()
+
+    summary = {'templates': 0, 'created': 0, 'batches': 0}
+    for zone_name in zones:
+        zone = get_zone(zone_name)
+        for quest_type in RECURRING_TYPES:
+            _, start, _ = period_bounds(quest_type, zone, now)
+            after = 0
+            while True:
+                started = time.perf_counter()
+                ids = db.session.scalars(
+                    select(RecurringQuest.id)
+                    .where(_due_templates(quest_type, zone_name, start), RecurringQuest.id > after)
+                    .order_by(RecurringQuest.id)
+                    .limit(batch_size)
+                ).all()
+                if not ids:
+                    break
+                try:
+                    created = _insert_instances(quest_type, zone_name, now,
+                                                RecurringQuest.id.between(ids[0], ids[-1]))
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+                current_app.logger.info(
+                    'Quest scheduler: %s %s batch %d-%d: %d templates, %d created in %.1f ms',
+                    zone_name, quest_type, ids[0], ids[-1], len(ids), created,
+                    (time.perf_counter() - started) * 1000)
+                summary['templates'] += len(ids)
+                summary['created'] += created
+                summary['batches'] += 1
+                after = ids[-1]
+    return summary
@@ -0,0 +1,148 @@
+"""Compiler for Achievement.requirement expressions.
+
+Requirements are small comparisons against a user's stats, optionally joined
+with ``and``::
+
+    quests_completed >= 10
+    books_read >= 5 and meditation_streak >= 7
+
+They are parsed once into predicate objects (no ``eval``) and indexed by the
+stats they read. Plain ``stat >= N`` thresholds, which is what almost every
+achievement uses, are kept in sorted lists. When the caller knows a stat's
+value before the change, only the thresholds crossed since then are visited
+(two bisects), so an activity costs nothing for the achievements already
+passed.
+"""
+import operator
+import re
+from bisect import bisect_right, insort
+from collections.abc import Mapping
+
+_CONDITION_RE = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(>=|<=|==|!=|>|<)\s*(-?\d+)\s*$')
+_AND_RE = re.compile(r'\s+and\s+', re.IGNORECASE)
+
+_OPERATORS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+class Condition:
+    """A single ``stat <op> value`` comparison."""
+
+    __slots__ = ('stat', 'op', 'value', '_compare')
+
+    def __init__(self, stat, op, value):
+        self.stat = stat
+        self.op = op
+        self.value = value
+        self._compare = _OPERATORS[op]
+
+    def __call__(self, stats):
+        return self._compare(stats.get(self.stat) or 0, self.value)
+
+    def __repr__(self):
+        return f'{self.stat} {self.op} {self.value}'
+
+
+class Requirement:
+    """A conjunction of conditions compiled from a requirement string."""
+
+    __slots__ = ('conditions',)
+
+    def __init__(self, conditions):
+        self.conditions = tuple(conditions)
+
+    @property
+    def stats(self):
+        return {condition.stat for condition in self.conditions}
+
+    def threshold(self):
+        """Return ``(stat, minimum)`` when this is a single lower bound, else None."""
+        if len(self.conditions) != 1:
+            return None
+        condition = self.conditions[0]
+        if condition.op == '>=':
+            return condition.stat, condition.value
+        if condition.op == '>':
+            return condition.stat, condition.value + 1
+        return None
+
+    def __call__(self, stats):
+        return all(condition(stats) for condition in self.conditions)
+
+    def __repr__(self):
+        return ' and '.join(repr(condition) for condition in self.conditions)
+
+
+def compile_requirement(text):
+    """Parse a requirement string into a Requirement.
+
+    Raises ValueError for anything that isn't a comparison (or ``and`` of
+    comparisons) between a stat name and an integer.
+    """
+    if not text or not text.strip():
+        raise ValueError('Empty requirement')
+
+    conditions = []
+    for part in _AND_RE.split(text.strip()):
+        match = _CONDITION_RE.match(part)
+        if not match:
+            raise ValueError(f'Invalid requirement: {text!r}')
+        stat, op, value = match.groups()
+        conditions.append(Condition(stat, op, int(value)))
+    return Requirement(conditions)
+
+
+class RequirementIndex:
+    """Compiled requirements indexed by the stats they depend on."""
+
+    def __init__(self):
+        self._thresholds = {}  # stat -> sorted [(minimum, achievement id)]
+        self._others = {}  # stat -> [(achievement id, requirement)]
+        self.titles = {}  # achievement id -> title
+
+    def add(self, achievement_id, title, requirement):
+        self.titles[achievement_id] = title
+        threshold = requirement.threshold()
+        if threshold is not None:
+            stat, minimum = threshold
+            insort(self._thresholds.setdefault(stat, []), (minimum, achievement_id))
+            return
+        for stat in requirement.stats:
+            self._others.setdefault(stat, []).append((achievement_id, requirement))
+
+    @property
+    def stats(self):
+        return set(self._thresholds) | set(self._others)
+
+    def satisfied(self, stats, changed_stats=None):
+        """Yield ids of achievements satisfied by ``stats``.
+
+        Only requirements reading one of ``changed_stats`` are considered
+        (every stat when None). When ``changed_stats`` maps each stat to its
+        value before the change, only thresholds in ``(before, now]`` are
+        yielded; given just the names, every threshold up to the current
+        value is. Ids may repeat for compound requirements.
+        """
+        if changed_stats is None:
+            changed_stats = self.stats
+        before = changed_stats if isinstance(changed_stats, Mapping) else {}
+
+        for stat in changed_stats:
+            thresholds = self._thresholds.get(stat)
+            if thresholds:
+                end = bisect_right(thresholds, (stats.get(stat) or 0, float('inf')))
+                start = 0
+                if before.get(stat) is not None:
+                    # Thresholds at or below the old value were crossed before
+                    start = bisect_right(thresholds, (before[stat], float('inf')))
+                for _, achievement_id in thresholds[start:end]:
+                    yield achievement_id
+            for achievement_id, requirement in self._others.get(stat, ()):
+                if requirement(stats):
+                    yield achievement_id
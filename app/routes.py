@@ -1,7 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, jsonify, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from .models import db, User, Achievement, Quest
-from .helpers import process_activity, update_stats
+from .models import db, User, Achievement
+from .progression import HUNTER_RANKS
+from .daily_reports import parse_range, report_range, submit_reflection
+from .helpers import process_activity, complete_quests, run_activity
+from .jobs import get_job_queue
+from .leaderboard import BOARDS, get_leaderboard
+from .notifications import get_notification_broker, latest_notification_id, stored_notifications, stream_messages
+from .progress_cache import get_progress_cache
+from .queries import active_quests
+from .xp_windows import parse_window, xp_gained, xp_series
 from werkzeug.security import generate_password_hash
 
 main_bp = Blueprint('main', __name__)
@@ -12,7 +20,7 @@ def index():
         # Provide templates that expect `user` and `quests`
         user = current_user
         # active quests for dashboard
-        quests = Quest.query.filter_by(user_id=current_user.id, completed=False).all()
+        quests = active_quests(current_user.id)
         return render_template('dashboard.html', user=user, quests=quests)
     return redirect(url_for('main.login'))
 
@@ -109,92 +117,195 @@ def complete_task():
     if not task_id:
         return jsonify({'success': False, 'message': 'Missing task id'}), 400
 
-    quest = Quest.query.get(task_id)
-    if not quest or quest.user_id != current_user.id:
-        return jsonify({'success': False, 'message': 'Quest not found'}), 404
+    try:
+        task_id = int(task_id)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid task id'}), 400
 
-    if quest.completed:
-        return jsonify({'success': False, 'message': 'Quest already completed'}), 400
-
-    # Mark quest complete and award its XP
-    quest.completed = True
-    prev_level = current_user.level
-    current_user.xp = (current_user.xp or 0) + (quest.xp_reward or 0)
-
-    # Recalculate level based on thresholds defined on the model
-    new_level = prev_level
-    for idx, threshold in enumerate(current_user.LEVEL_THRESHOLDS):
-        if current_user.xp >= threshold:
-            new_level = idx + 1
-
-    leveled_up = False
-    if new_level > prev_level:
-        current_user.level = new_level
-        current_user._update_rank()
-        leveled_up = True
-
-    db.session.commit()
-
-    # Check achievements
-    new_achievements = current_user.check_achievements()
-
-    notifications = []
-    if leveled_up:
-        notifications.append({
-            'type': 'levelup',
-            'message': f'Advanced to Level {current_user.level}!',
-            'details': {'level': current_user.level, 'rank': current_user.rank}
-        })
-
-    for ach in new_achievements:
-        notifications.append({
-            'type': 'achievement',
-            'message': f'Achievement Unlocked: {ach}!'
-        })
+    # Mark quest complete and award its XP in one transaction; achievements
+    # and the daily report are queued
+    result = complete_quests(current_user, [task_id], defer=True)
+    if not result['success']:
+        if result['skipped'][0]['reason'] == 'already_completed':
+            return jsonify({'success': False, 'message': 'Quest already completed'}), 400
+        if result['skipped'][0]['reason'] == 'expired':
+            return jsonify({'success': False, 'message': 'Quest expired'}), 400
+        return jsonify({'success': False, 'message': 'Quest not found'}), 404
 
     return jsonify({
         'success': True,
         'message': 'Quest completed successfully!',
-        'xp_gained': quest.xp_reward,
-        'notifications': notifications,
-        'progress': current_user.get_progress()
+        'xp_gained': result['xp_gained'],
+        'notifications': result['notifications'],
+        'progress': result['progress']
     })
 
 @main_bp.route('/update-meditation', methods=['POST'])
 @login_required
 def update_meditation():
     """Update meditation streak."""
-    # Update meditation via helper (avoids double increments)
-    result = update_stats(current_user, {'meditation_streak': 1})
-    return process_activity(current_user, 'MEDITATION_DAILY')
+    # Stats and XP are committed together; achievement checks are queued
+    return process_activity(current_user, 'MEDITATION_DAILY', {'meditation_streak': 1}, defer=True)
 
 @main_bp.route('/complete-book', methods=['POST'])
 @login_required
 def complete_book():
     """Mark a book as read."""
-    result = update_stats(current_user, {'books_read': 1})
-    return process_activity(current_user, 'READ_BOOK')
+    return process_activity(current_user, 'READ_BOOK', {'books_read': 1}, defer=True)
 
 @main_bp.route('/complete-habit', methods=['POST'])
 @login_required
 def complete_habit():
     """Complete a daily habit."""
-    result = update_stats(current_user, {'habits_completed': 1})
-    return process_activity(current_user, 'COMPLETE_HABIT')
+    return process_activity(current_user, 'COMPLETE_HABIT', {'habits_completed': 1}, defer=True)
 
 @main_bp.route('/achieve-goal', methods=['POST'])
 @login_required
 def achieve_goal():
     """Mark a goal as achieved."""
-    result = update_stats(current_user, {'goals_achieved': 1})
-    return process_activity(current_user, 'ACHIEVE_GOAL')
+    return process_activity(current_user, 'ACHIEVE_GOAL', {'goals_achieved': 1}, defer=True)
+
+@main_bp.route('/daily-report', methods=['GET', 'POST'])
+@login_required
+def daily_report():
+    """Daily Pro-Action Report: a once-a-day reflection worth XP."""
+    if request.method == 'POST':
+        fields = {name: (request.form.get(name) or '').strip() for name in ('the_win', 'the_lesson', 'the_plan')}
+        if not all(fields.values()):
+            flash('Please fill in all three sections.', 'danger')
+            return render_template('daily_report.html')
+
+        try:
+            submitted = submit_reflection(current_user.id, **fields)
+        except Exception:
+            db.session.rollback()
+            raise
+        if not submitted:
+            db.session.rollback()
+            flash("You've already submitted today's report.", 'info')
+            return redirect(url_for('main.dashboard'))
+
+        # The reflection is committed together with its XP
+        run_activity(current_user, 'DAILY_REPORT')
+        flash(f"Report submitted! +{User.XP_REWARDS['DAILY_REPORT']} XP", 'success')
+        return redirect(url_for('main.dashboard'))
+
+    return render_template('daily_report.html')
 
 # API endpoints for frontend updates
+@main_bp.route('/api/daily-report')
+@login_required
+def get_daily_report():
+    """Per-day activity totals for a date range (default: the last 30 days).
+
+    Example: /api/daily-report?start=2026-01-01&end=2026-12-31
+    """
+    try:
+        start, end = parse_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': report_range(current_user.id, start, end)
+    })
+
+@main_bp.route('/api/xp-window')
+@login_required
+def get_xp_window():
+    """XP earned in a UTC time window (default: the last 7 days).
+
+    With ``granularity`` (hour, day or week) the per-bucket series is included.
+    Example: /api/xp-window?start=2026-10-12T00:00&end=2026-10-19T00:00&granularity=day
+    """
+    granularity = request.args.get('granularity')
+    try:
+        start, end = parse_window(request.args.get('start'), request.args.get('end'), granularity)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    payload = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'xp': xp_gained(current_user.id, start, end)
+    }
+    if granularity:
+        payload['granularity'] = granularity
+        payload['buckets'] = xp_series(current_user.id, granularity, start, end)
+    return jsonify(payload)
+
 @main_bp.route('/api/progress')
 @login_required
 def get_progress():
-    """Get current user progress data."""
-    return jsonify(current_user.get_progress())
+    """Get current user progress data.
+
+    Served from the progress snapshot cache with an ETag; a poll carrying a
+    matching If-None-Match gets an empty 304.
+    """
+    payload, etag = get_progress_cache().snapshot(current_user)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@main_bp.route('/api/notifications/stream')
+@login_required
+def notification_stream():
+    """Server-Sent Events stream of the user's levelup, achievement and progress events.
+
+    Stored notifications are sent from the reconnecting client's
+    ``Last-Event-ID``, else from the ``after`` id, else from now on. Only
+    served with ``SSE_ENABLED``: each stream ties up a worker thread.
+    """
+    if not current_app.config.get('SSE_ENABLED'):
+        return jsonify({'success': False, 'message': 'Notification stream is disabled'}), 404
+    broker = get_notification_broker()
+    subscription = broker.subscribe(current_user.id)
+    if subscription is None:
+        return jsonify({'success': False, 'message': 'Too many open notification streams'}), 429
+
+    user_id = current_user.id
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = request.args.get('after', type=int)
+    if after is None:
+        after = latest_notification_id(user_id)
+    app = current_app._get_current_object()
+
+    def fetch_stored(after):
+        # Each read gets its own session, so the open stream holds no connection
+        with app.app_context():
+            return stored_notifications(user_id, after)
+
+    # Subscribed before the response starts so nothing published in between is lost
+    stream = stream_messages(broker, subscription,
+                             heartbeat=current_app.config.get('SSE_HEARTBEAT_SECONDS', 15),
+                             fetch_stored=fetch_stored, after=after)
+    response = Response(stream, mimetype='text/event-stream')
+    # Also covers a client that leaves before the stream starts
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+@main_bp.route('/api/notifications')
+@login_required
+def get_notifications():
+    """Stored notifications after the ``after`` id, for clients without the stream.
+
+    Without ``after`` only the cursor (``last_id``) is returned.
+    """
+    after = request.args.get('after', type=int)
+    if after is None:
+        return jsonify({'notifications': [], 'last_id': latest_notification_id(current_user.id)})
+    stored = stored_notifications(current_user.id, after)
+    return jsonify({
+        'notifications': [notification for _, notification in stored],
+        'last_id': stored[-1][0] if stored else after,
+    })
 
 @main_bp.route('/api/achievements')
 @login_required
@@ -208,3 +319,78 @@ def get_achievements():
         for achievement in current_user.earned_achievements
     ]
     return jsonify(achievements)
+
+@main_bp.route('/api/jobs/metrics')
+@login_required
+def get_job_metrics():
+    """Deferred-work queue depth, lag and this process's job counters.
+
+    Operational data, so only served when ``JOB_METRICS_ENDPOINT`` is set;
+    ``flask main job-metrics`` reports the same from the command line.
+    """
+    if not current_app.config.get('JOB_METRICS_ENDPOINT'):
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    return jsonify(get_job_queue().metrics())
+
+def _leaderboard_query():
+    """Return ``(leaderboard, board, tier)`` for the request, or raise ValueError.
+
+    The tier board defaults to the current user's own tier.
+    """
+    board = request.args.get('board', 'global')
+    if board not in BOARDS:
+        raise ValueError(f'board must be one of {", ".join(BOARDS)}')
+    leaderboard = get_leaderboard()
+    leaderboard.ensure_fresh()
+    tier = None
+    if board == 'tier':
+        tier = request.args.get('tier') or leaderboard.rank_of(current_user.id) or current_user.rank
+        if tier not in HUNTER_RANKS.values():
+            raise ValueError('Unknown tier')
+    return leaderboard, board, tier
+
+def _leaderboard_entries(entries):
+    names = dict(db.session.execute(
+        db.select(User.id, User.username).where(User.id.in_([user_id for _, user_id, _ in entries]))
+    ).all()) if entries else {}
+    return [
+        {'position': position + 1, 'user_id': user_id, 'username': names.get(user_id), 'xp': score}
+        for position, user_id, score in entries
+    ]
+
+@main_bp.route('/api/leaderboard')
+@login_required
+def get_leaderboard_top():
+    """Top hunters of a board (global, tier or weekly).
+
+    Example: /api/leaderboard?board=tier&tier=E-Rank%20Hunter&limit=10
+    """
+    try:
+        leaderboard, board, tier = _leaderboard_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1),
+                current_app.config.get('LEADERBOARD_MAX_ENTRIES', 100))
+    size, entries = leaderboard.top(board, limit, tier)
+    return jsonify({'board': board, 'tier': tier, 'size': size,
+                    'entries': _leaderboard_entries(entries)})
+
+@main_bp.route('/api/leaderboard/me')
+@login_required
+def get_leaderboard_position():
+    """The current user's position on a board with ``k`` neighbours either side.
+
+    ``position`` is null when the user has no score on the board (e.g. no XP
+    earned this week).
+    """
+    try:
+        leaderboard, board, tier = _leaderboard_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    leaderboard.ensure(current_user.id, current_user.xp, current_user.level)
+    k = min(max(request.args.get('k', 5, type=int), 0),
+            current_app.config.get('LEADERBOARD_MAX_ENTRIES', 100) // 2)
+    size, position, entries = leaderboard.around(current_user.id, board, k, tier)
+    return jsonify({'board': board, 'tier': tier, 'size': size,
+                    'position': None if position is None else position + 1,
+                    'entries': _leaderboard_entries(entries)})
@@ -0,0 +1,232 @@
+"""Skill tree graph engine.
+
+Each skill tree is loaded once into a ``SkillGraph``: its nodes in
+topological order (prerequisites first), adjacency lists from every node to
+the nodes that require it, and the required prerequisites of each node.
+Graphs are shared by all requests and rebuilt when a skill, node or
+dependency changes in this process, or after ``SKILL_TREE_TTL`` seconds to
+pick up edits made elsewhere.
+
+A node is unlockable once all of its required prerequisites are completed.
+Per user and tree the engine keeps a ``Frontier`` (completed nodes, the
+number of prerequisites each node still misses, and the unlockable set) in
+a small LRU. The user's completed nodes are always read from the database;
+when they only grew since the cached frontier, just the new completions are
+applied, touching each one's outgoing edges. The whole tree is only walked
+when the frontier is first built, the graph changed or progress was undone.
+"""
+import heapq
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from .models import db, Skill, SkillNode, NodeDependency, UserSkillNode
+from .progress_cache import MemoryBackend
+
+# Statuses stored in user_skill_node; other nodes are 'unlocked' or 'locked'
+PROGRESS_STATUSES = ('in-progress', 'completed')
+
+
+class SkillGraph:
+    """One skill tree: topological order plus adjacency lists."""
+
+    def __init__(self, skill, nodes, dependencies):
+        self.skill_id = skill.id
+        self.name = skill.name
+        self.nodes = {node.id: {
+            'id': node.id,
+            'label': node.title,
+            'description': node.description,
+            'xp_reward': node.xp_reward or 0,
+            'group': 'topic' if node.node_type == 'topic' else 'lesson',
+            'skill_id': skill.id,
+        } for node in nodes}
+        self.children = {node_id: [] for node_id in self.nodes}  # prerequisite -> nodes requiring it
+        self.requires = {node_id: [] for node_id in self.nodes}  # node -> required prerequisites
+        self.edges = []
+
+        successors = {node_id: [] for node_id in self.nodes}
+        indegree = dict.fromkeys(self.nodes, 0)
+        for dependency in dependencies:
+            if dependency.node_id not in self.nodes or dependency.requires_id not in self.nodes:
+                continue  # edges between trees are ignored
+            self.edges.append({'from': dependency.requires_id, 'to': dependency.node_id,
+                               'dashes': not dependency.required})
+            successors[dependency.requires_id].append(dependency.node_id)
+            indegree[dependency.node_id] += 1
+            if dependency.required:
+                self.children[dependency.requires_id].append(dependency.node_id)
+                self.requires[dependency.node_id].append(dependency.requires_id)
+
+        # Kahn's algorithm (lowest id first among ready nodes); nodes on a
+        # cycle are listed last, and a cycle of required edges never unlocks
+        ready = sorted(node_id for node_id, count in indegree.items() if not count)
+        self.order = []
+        while ready:
+            node_id = heapq.heappop(ready)
+            self.order.append(node_id)
+            for child in successors[node_id]:
+                indegree[child] -= 1
+                if not indegree[child]:
+                    heapq.heappush(ready, child)
+        self.cyclic = sorted(node_id for node_id, count in indegree.items() if count)
+        self.order += self.cyclic
+
+    def frontier(self, completed):
+        """Build the frontier for a set of completed node ids (walks the whole tree)."""
+        completed = set(completed) & self.nodes.keys()
+        missing = {node_id: sum(parent not in completed for parent in parents)
+                   for node_id, parents in self.requires.items()}
+        unlockable = {node_id for node_id, count in missing.items() if not count and node_id not in completed}
+        return Frontier(completed, missing, unlockable)
+
+
+class Frontier:
+    """A user's completed nodes in one tree and the nodes they can take on next."""
+
+    def __init__(self, completed, missing, unlockable):
+        self.completed = completed
+        self.missing = missing  # node id -> required prerequisites not completed yet
+        self.unlockable = unlockable
+
+    def advance(self, graph, node_id):
+        """Apply one newly completed node."""
+        if node_id in self.completed or node_id not in graph.nodes:
+            return
+        self.completed.add(node_id)
+        self.unlockable.discard(node_id)
+        for child in graph.children[node_id]:
+            self.missing[child] -= 1
+            if not self.missing[child] and child not in self.completed:
+                self.unlockable.add(child)
+
+
+class SkillTreeEngine:
+    """Caches skill graphs and per-user frontiers for one app."""
+
+    def __init__(self, ttl=300, max_frontiers=10000):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._graphs = None
+        self._node_graphs = {}  # node id -> SkillGraph, rebuilt with the graphs
+        self._built_at = 0.0
+        self._frontiers = MemoryBackend(max_frontiers)  # (user id, skill id) -> (SkillGraph, Frontier)
+
+    def invalidate(self):
+        """Drop the cached graphs (and with them every frontier)."""
+        with self._lock:
+            self._graphs = None
+
+    def graphs(self):
+        """Return ``{skill id: SkillGraph}``, loading the trees when needed (three queries)."""
+        with self._lock:
+            graphs = self._graphs
+            if graphs is not None and time.monotonic() - self._built_at < self.ttl:
+                return graphs
+
+        skills = db.session.scalars(select(Skill).order_by(Skill.id)).all()
+        nodes, dependencies = {}, {}
+        for node in db.session.scalars(select(SkillNode).order_by(SkillNode.id)):
+            nodes.setdefault(node.skill_id, []).append(node)
+        skill_of = {node.id: node.skill_id for tree in nodes.values() for node in tree}
+        for dependency in db.session.scalars(select(NodeDependency).order_by(NodeDependency.id)):
+            dependencies.setdefault(skill_of.get(dependency.node_id), []).append(dependency)
+
+        graphs = {skill.id: SkillGraph(skill, nodes.get(skill.id, []), dependencies.get(skill.id, []))
+                  for skill in skills}
+        for graph in graphs.values():
+            if graph.cyclic:
+                current_app.logger.warning('Skill %s has a dependency cycle through nodes %s',
+                                           graph.skill_id, graph.cyclic)
+        node_graphs = {node_id: graph for graph in graphs.values() for node_id in graph.nodes}
+        with self._lock:
+            self._graphs = graphs
+            self._node_graphs = node_graphs
+            self._built_at = time.monotonic()
+        return graphs
+
+    def unlockable(self, user_id, graph, completed):
+        """Return the nodes of ``graph`` the user can unlock, given their completed node ids."""
+        key = (user_id, graph.skill_id)
+        with self._lock:
+            cached = self._frontiers.get(key)
+            # Frontiers built against a replaced graph are never reused
+            if cached is not None and cached[0] is graph and cached[1].completed <= completed:
+                frontier = cached[1]
+                for node_id in completed - frontier.completed:
+                    frontier.advance(graph, node_id)
+                return frozenset(frontier.unlockable)
+
+        frontier = graph.frontier(completed)
+        with self._lock:
+            self._frontiers.set(key, (graph, frontier), self.ttl)
+        return frozenset(frontier.unlockable)
+
+    def user_progress(self, user_id):
+        """Return ``{node id: status}`` of every node the user started or completed."""
+        return dict(db.session.execute(
+            select(UserSkillNode.node_id, UserSkillNode.status).where(UserSkillNode.user_id == user_id)
+        ).all())
+
+    def node_statuses(self, user_id, graph, progress):
+        """Return ``{node id: status}`` for every node of one tree."""
+        completed = {node_id for node_id in graph.nodes if progress.get(node_id) == 'completed'}
+        unlockable = self.unlockable(user_id, graph, completed)
+        statuses = {}
+        for node_id in graph.order:
+            if node_id in completed:
+                statuses[node_id] = 'completed'
+            elif progress.get(node_id) == 'in-progress':
+                statuses[node_id] = 'in-progress'
+            elif node_id in unlockable:
+                statuses[node_id] = 'unlocked'
+            else:
+                statuses[node_id] = 'locked'
+        return statuses
+
+    def document(self, user_id, skill_id=None):
+        """Return the ``{'skills', 'nodes', 'edges'}`` document for a user's skill trees."""
+        graphs = self.graphs()
+        selected = [graphs[skill_id]] if skill_id is not None else list(graphs.values())
+        progress = self.user_progress(user_id)
+
+        skills, nodes, edges = [], [], []
+        for graph in selected:
+            statuses = self.node_statuses(user_id, graph, progress)
+            skills.append({'id': graph.skill_id, 'name': graph.name,
+                           'completed': sum(status == 'completed' for status in statuses.values()),
+                           'total': len(statuses)})
+            nodes.extend(dict(graph.nodes[node_id], status=statuses[node_id]) for node_id in graph.order)
+            edges.extend(graph.edges)
+        return {'skills': skills, 'nodes': nodes, 'edges': edges}
+
+    def graph_for_node(self, node_id):
+        """Return the graph holding ``node_id``, or None."""
+        self.graphs()
+        with self._lock:
+            return self._node_graphs.get(node_id)
+
+
+def init_skill_tree(app):
+    """Attach the skill tree engine configured for the app."""
+    app.extensions['skill_tree'] = SkillTreeEngine(
+        ttl=app.config.get('SKILL_TREE_TTL', 300),
+        max_frontiers=app.config.get('SKILL_TREE_FRONTIERS', 10000),
+    )
+
+
+def get_skill_tree():
+    """Return the skill tree engine bound to the current app."""
+    return current_app.extensions['skill_tree']
+
+
+def _forget_graphs(mapper, connection, target):
+    if has_app_context() and 'skill_tree' in current_app.extensions:
+        get_skill_tree().invalidate()
+
+
+for _model in (Skill, SkillNode, NodeDependency):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _forget_graphs)
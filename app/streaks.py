@@ -0,0 +1,130 @@
+"""Habit streaks with daily, weekly and monthly periods.
+
+A habit's streak counts consecutive periods (days, ISO weeks or calendar
+months, by ``Habit.frequency``) in which it was completed at least once.
+Periods follow the owner's time zone (``User.timezone``). Each completion
+stores its period as an integer index (``Habit.last_period``), which keeps
+both checks cheap:
+
+- same index: already tracked this period, nothing changes
+- index + 1: the streak continues
+- anything older: the streak starts over at 1
+
+``rollover()`` resets streaks that lapsed without a click. It sends one
+set-based UPDATE per (frequency, time zone) pair rather than loading habits,
+and is safe to run at any time. Schedule it hourly (``flask main
+habit-rollover``) so every time zone's midnight is covered.
+"""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import distinct, func, select, update
+
+from .models import db, User, Habit
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+PERIOD_NAMES = {'daily': 'day', 'weekly': 'week', 'monthly': 'month'}
+
+DEFAULT_TIMEZONE = 'UTC'
+
+
+def get_zone(name):
+    """Return the ZoneInfo for ``name``, falling back to UTC for unknown names."""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def is_valid_timezone(name):
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+    return True
+
+
+def local_date(moment, zone):
+    """Return the date in ``zone`` of a naive UTC datetime."""
+    return moment.replace(tzinfo=timezone.utc).astimezone(zone).date()
+
+
+def period_index(day, frequency):
+    """Return the sequential index of the period ``day`` falls in.
+
+    Consecutive periods have consecutive indexes. Weeks are ISO weeks
+    (Monday to Sunday); unknown frequencies count as daily.
+    """
+    if frequency == 'weekly':
+        # date(1, 1, 1) is a Monday, so this counts whole Monday-based weeks
+        return (day.toordinal() - 1) // 7
+    if frequency == 'monthly':
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+
+def current_period(frequency, zone, now=None):
+    return period_index(local_date(now or datetime.utcnow(), zone), frequency)
+
+
+def track(habit, zone, now=None):
+    """Record a completion of ``habit`` (no commit).
+
+    Returns False (and changes nothing) when the habit was already completed
+    in the current period.
+    """
+    now = now or datetime.utcnow()
+    period = current_period(habit.frequency, zone, now)
+
+    last = habit.last_period
+    if last is None and habit.last_completed is not None:
+        last = period_index(local_date(habit.last_completed, zone), habit.frequency)
+
+    if last == period:
+        return False
+    if last == period - 1:
+        habit.current_streak = (habit.current_streak or 0) + 1
+    else:
+        habit.current_streak = 1
+    habit.best_streak = max(habit.best_streak or 0, habit.current_streak)
+    habit.last_completed = now
+    habit.last_period = period
+    return True
+
+
+def rollover(now=None):
+    """Reset every streak whose previous period passed without a completion.
+
+    Runs one UPDATE per frequency and distinct user time zone, then commits.
+    Returns the number of habits reset.
+    """
+    now = now or datetime.utcnow()
+    zones = db.session.scalars(select(distinct(func.coalesce(User.timezone, DEFAULT_TIMEZONE)))).all()
+
+    reset = 0
+    try:
+        for zone_name in zones:
+            users = select(User.id).where(func.coalesce(User.timezone, DEFAULT_TIMEZONE) == zone_name)
+            zone = get_zone(zone_name)
+            for frequency in FREQUENCIES:
+                frequency_match = (
+                    Habit.frequency == frequency if frequency != 'daily'
+                    else func.coalesce(Habit.frequency, 'daily').notin_(FREQUENCIES[1:])
+                )
+                result = db.session.execute(
+                    update(Habit)
+                    .where(
+                        frequency_match,
+                        Habit.user_id.in_(users),
+                        Habit.current_streak > 0,
+                        func.coalesce(Habit.last_period, -1) < current_period(frequency, zone, now) - 1,
+                    )
+                    .values(current_streak=0)
+                    .execution_options(synchronize_session=False)
+                )
+                reset += result.rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return reset
@@ -0,0 +1,94 @@
+"""Cached user loading for Flask-Login.
+
+Flask-Login already keeps the loaded user for the rest of a request; this
+adds a short-TTL process cache of the user row so most page loads and API
+polls skip the primary-key SELECT (and JSON decoding) altogether.
+
+Cached rows are turned back into session objects with
+``Session.merge(load=False)``, which reuses the instance already in the
+session's identity map when there is one and never emits SQL. Only safe
+(GET/HEAD) requests are served from the cache; requests that may write
+always load the current row, so a stale copy can never be written back.
+
+Any write to a user (ORM or atomic counter update) drops its entry, and
+drops it again once the transaction commits, so a GET that re-cached the
+pre-commit row in between can't keep serving it. That only happens in the
+process that made the write: the cache is per process, so writes from
+other gunicorn workers and CLI jobs don't clear it. Pages rendered from a
+cached row can therefore show XP, level and stats up to ``USER_CACHE_TTL``
+seconds (10 by default) out of date; keep the TTL short, or set it to 0 to
+disable the cache.
+"""
+import copy
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from .models import db, User
+from .progress_cache import MemoryBackend
+
+SAFE_METHODS = ('GET', 'HEAD')
+_STALE_KEY = 'stale_cached_users'
+
+
+class UserCache:
+    """Short-TTL cache of user rows keyed by id."""
+
+    def __init__(self, ttl=10, max_entries=10000):
+        self.ttl = ttl
+        self.backend = MemoryBackend(max_entries)
+        self._columns = [column.key for column in User.__mapper__.column_attrs]
+
+    def load(self, user_id):
+        """Return the user for ``user_id`` attached to the current session."""
+        if self.ttl > 0 and (not has_request_context() or request.method in SAFE_METHODS):
+            values = self.backend.get(user_id)
+            if values is not None:
+                cached = User(**copy.deepcopy(values))
+                make_transient_to_detached(cached)
+                return db.session.merge(cached, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None and self.ttl > 0:
+            values = {key: getattr(user, key) for key in self._columns}
+            self.backend.set(user_id, copy.deepcopy(values), self.ttl)
+        return user
+
+    def invalidate(self, user_id):
+        self.backend.delete(user_id)
+
+    def invalidate_on_commit(self, user_id, session=None):
+        """Drop ``user_id`` now and again when ``session``'s transaction ends."""
+        self.invalidate(user_id)
+        session = db.session() if session is None else session
+        session.info.setdefault(_STALE_KEY, set()).add((self, user_id))
+
+
+def init_user_cache(app):
+    """Attach the user cache configured for the app."""
+    app.extensions['user_cache'] = UserCache(
+        ttl=app.config.get('USER_CACHE_TTL', 10),
+        max_entries=app.config.get('USER_CACHE_SIZE', 10000),
+    )
+
+
+def get_user_cache():
+    """Return the user cache bound to the current app."""
+    return current_app.extensions['user_cache']
+
+
+def _forget_user(mapper, connection, target):
+    if has_app_context() and 'user_cache' in current_app.extensions:
+        get_user_cache().invalidate_on_commit(target.id, object_session(target))
+
+
+event.listen(User, 'after_update', _forget_user)
+event.listen(User, 'after_delete', _forget_user)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_stale_users(session):
+    for cache, user_id in session.info.pop(_STALE_KEY, ()):
+        cache.invalidate(user_id)
@@ -0,0 +1,148 @@
+"""Time-bucketed XP aggregates.
+
+Every XP award also adds its amount to the user's ``xp_bucket`` rows for the
+current hour, day and week (UTC, Monday-based weeks) with one multi-row
+upsert. XP earned in any window is then a sum over a handful of rows: the
+window is split into whole weeks in the middle, whole days next to them and
+hours at the edges, so a query reads at most 46 hour rows and 12 day rows
+plus one row per week, however much history there is.
+
+Windows are resolved to whole hours: a window starting or ending inside an
+hour counts that hour in full.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select
+
+from .database import upsert_insert
+from .models import db, XpBucket
+from .streaks import period_index
+
+GRANULARITIES = ('hour', 'day', 'week')
+
+# Most buckets served by one series read
+MAX_SERIES_BUCKETS = 1000
+
+_EPOCH = datetime(1970, 1, 1)
+_HOUR = timedelta(hours=1)
+_WEEK = timedelta(weeks=1)
+
+
+def bucket_index(moment, granularity):
+    """Return the index of the ``granularity`` bucket a naive UTC datetime falls in."""
+    if granularity == 'hour':
+        return (moment - _EPOCH) // _HOUR
+    if granularity == 'week':
+        return period_index(moment.date(), 'weekly')
+    return moment.date().toordinal()
+
+
+def bucket_start(index, granularity):
+    """Return the naive UTC datetime a bucket starts at."""
+    if granularity == 'hour':
+        return _EPOCH + index * _HOUR
+    if granularity == 'week':
+        return datetime.fromordinal(index * 7 + 1)
+    return datetime.fromordinal(index)
+
+
+def bump(user_id, amount, now=None):
+    """Add ``amount`` XP to a user's current hour, day and week buckets (no commit)."""
+    if not amount:
+        return
+    now = now or datetime.utcnow()
+    stmt = upsert_insert(XpBucket, db.session.get_bind()).values([
+        {'user_id': user_id, 'granularity': granularity,
+         'bucket': bucket_index(now, granularity), 'xp': amount}
+        for granularity in GRANULARITIES
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'granularity', 'bucket'],
+        set_={'xp': XpBucket.xp + stmt.excluded.xp},
+    )
+    db.session.execute(stmt)
+
+
+def _ceil(moment, granularity):
+    index = bucket_index(moment, granularity)
+    if bucket_start(index, granularity) < moment:
+        index += 1
+    return index
+
+
+def split_window(start, end):
+    """Cover ``[start, end)`` with the fewest buckets.
+
+    Returns ``(granularity, first, stop)`` index ranges (``stop`` excluded).
+    """
+    first_hour, stop_hour = bucket_index(start, 'hour'), _ceil(end, 'hour')
+    if first_hour >= stop_hour:
+        return []
+    start, end = bucket_start(first_hour, 'hour'), bucket_start(stop_hour, 'hour')
+
+    first_day, stop_day = _ceil(start, 'day'), bucket_index(end, 'day')
+    if first_day >= stop_day:
+        return [('hour', first_hour, stop_hour)]
+    ranges = [('hour', first_hour, bucket_index(bucket_start(first_day, 'day'), 'hour')),
+              ('hour', bucket_index(bucket_start(stop_day, 'day'), 'hour'), stop_hour)]
+
+    first_week = _ceil(bucket_start(first_day, 'day'), 'week')
+    stop_week = bucket_index(bucket_start(stop_day, 'day'), 'week')
+    if first_week >= stop_week:
+        ranges.append(('day', first_day, stop_day))
+    else:
+        ranges += [('day', first_day, bucket_index(bucket_start(first_week, 'week'), 'day')),
+                   ('day', bucket_index(bucket_start(stop_week, 'week'), 'day'), stop_day),
+                   ('week', first_week, stop_week)]
+    return [(granularity, first, stop) for granularity, first, stop in ranges if first < stop]
+
+
+def xp_gained(user_id, start, end):
+    """Return the XP a user earned in ``[start, end)`` (naive UTC datetimes)."""
+    ranges = split_window(start, end)
+    if not ranges:
+        return 0
+    return db.session.scalar(
+        select(func.coalesce(func.sum(XpBucket.xp), 0))
+        .where(XpBucket.user_id == user_id, or_(*(
+            and_(XpBucket.granularity == granularity, XpBucket.bucket >= first, XpBucket.bucket < stop)
+            for granularity, first, stop in ranges
+        )))
+    )
+
+
+def xp_series(user_id, granularity, start, end):
+    """Return ``{'start', 'xp'}`` for every ``granularity`` bucket overlapping ``[start, end)``.
+
+    Buckets without XP are filled in with zero.
+    """
+    first, stop = bucket_index(start, granularity), _ceil(end, granularity)
+    rows = db.session.execute(
+        select(XpBucket.bucket, XpBucket.xp)
+        .where(XpBucket.user_id == user_id, XpBucket.granularity == granularity,
+               XpBucket.bucket >= first, XpBucket.bucket < stop)
+    )
+    by_bucket = dict(rows.all())
+    return [{'start': bucket_start(index, granularity).isoformat(), 'xp': by_bucket.get(index, 0)}
+            for index in range(first, stop)]
+
+
+def parse_window(start, end, granularity=None, now=None):
+    """Parse ISO ``start``/``end`` query values (default: the last 7 days).
+
+    Raises ValueError for malformed values, empty windows, unknown
+    granularities and series longer than ``MAX_SERIES_BUCKETS``.
+    """
+    now = now or datetime.utcnow()
+    end = datetime.fromisoformat(end) if end else now
+    start = datetime.fromisoformat(start) if start else end - _WEEK
+    if start.tzinfo or end.tzinfo:
+        raise ValueError('start and end must be UTC times without an offset')
+    if start >= end:
+        raise ValueError('start must be before end')
+    if granularity is not None:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'granularity must be one of {", ".join(GRANULARITIES)}')
+        if _ceil(end, granularity) - bucket_index(start, granularity) > MAX_SERIES_BUCKETS:
+            raise ValueError(f'At most {MAX_SERIES_BUCKETS} buckets per request')
+    return start, end
@@ -5,9 +5,69 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess-this-secret'
-    # SQLALCHEMY_DATABASE_URI is dynamically set in app/__init__.py to point to the instance folder for better structure.
+    # create_app uses DATABASE_URL when set and otherwise points this at the instance folder.
     # This is kept as a fallback or standard configuration object.
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'sololeveling.db')
         
-    SQLALCHEMY_TRACK_MODIFICATIONS = False # Why this false? To disable a Flask-SQLAlchemy feature that signals the app every time a change is about to be made in the database. This is unnecessary overhead and can be turned off. What does it do? It helps to reduce memory usage and improve performance.
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False # Why this false? To disable a Flask-SQLAlchemy feature that signals the app every time a change is about to be made in the database. This is unnecessary overhead and can be turned off. What does it do? It helps to reduce memory usage and improve performance.
+
+    # Connection pool settings (sizing is ignored for in-memory SQLite)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),  # extra connections allowed under burst load
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # seconds to wait for a free connection
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # seconds; stay under server idle timeouts
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes'),  # drop dead connections before use
+    }
+
+    # SQLite tuning applied to every new connection: 'production' (WAL, synchronous=NORMAL, busy_timeout, mmap, cache) or 'off'
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+
+    # Progress snapshot cache for /api/progress: 'memory' (per-process LRU) or 'sqlite' (local file shared by workers)
+    PROGRESS_CACHE_BACKEND = os.environ.get('PROGRESS_CACHE_BACKEND', 'memory')
+    PROGRESS_CACHE_PATH = os.environ.get('PROGRESS_CACHE_PATH')  # defaults to <instance>/progress_cache
+    PROGRESS_CACHE_TTL = int(os.environ.get('PROGRESS_CACHE_TTL', 15))  # seconds; bounds staleness across workers
+    PROGRESS_CACHE_SIZE = int(os.environ.get('PROGRESS_CACHE_SIZE', 10000))  # entries per process
+
+    # Process cache of user rows for Flask-Login's user_loader (GET/HEAD only); 0 disables it
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 10))  # seconds; bounds staleness across workers
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))  # entries per process
+
+    # Deferred work (achievement checks, daily reports) runs on a per-process thread pool
+    # fed by the job_queue table; 0 workers (always the case under TESTING) leaves jobs for `flask main run-jobs`
+    JOB_QUEUE_WORKERS = int(os.environ.get('JOB_QUEUE_WORKERS', 2))
+    JOB_QUEUE_BATCH_SIZE = int(os.environ.get('JOB_QUEUE_BATCH_SIZE', 20))  # jobs claimed per query
+    JOB_QUEUE_POLL_INTERVAL = float(os.environ.get('JOB_QUEUE_POLL_INTERVAL', 5))  # seconds between idle polls
+    JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get('JOB_QUEUE_MAX_ATTEMPTS', 5))
+    JOB_QUEUE_RETRY_DELAY = int(os.environ.get('JOB_QUEUE_RETRY_DELAY', 10))  # seconds, times the attempt number
+    # Serve /api/jobs/metrics (to any logged-in user) for scraping; otherwise use `flask main job-metrics`
+    JOB_METRICS_ENDPOINT = os.environ.get('JOB_METRICS_ENDPOINT', '0').lower() in ('1', 'true', 'yes')
+
+    # Live notifications over Server-Sent Events (/api/notifications/stream). Every open stream holds a
+    # worker thread, so only enable it under a threaded or async server (gunicorn -k gthread or gevent);
+    # otherwise pages poll /api/notifications and /api/progress (ETag) every NOTIFICATION_POLL_SECONDS
+    SSE_ENABLED = os.environ.get('SSE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    NOTIFICATION_POLL_SECONDS = int(os.environ.get('NOTIFICATION_POLL_SECONDS', 30))
+    SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', 100))  # messages buffered per stream; oldest dropped first
+    SSE_MAX_STREAMS_PER_USER = int(os.environ.get('SSE_MAX_STREAMS_PER_USER', 5))
+    SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+
+    # In-memory leaderboards (global, per rank tier, weekly XP), rebuilt at startup and kept current by XP awards
+    LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('LEADERBOARD_REFRESH_SECONDS', 300))  # seconds until a rebuild picks up other processes' awards; 0 never
+    LEADERBOARD_MAX_ENTRIES = int(os.environ.get('LEADERBOARD_MAX_ENTRIES', 100))  # largest top-N page
+
+    # Quest deadline expiry (`flask main expire-quests`)
+    QUEST_EXPIRY_PENALTY = float(os.environ.get('QUEST_EXPIRY_PENALTY', 0))  # share of an expired quest's XP reward taken away; 0 disables
+
+    # Achievement definitions, cached per process and dropped when this process edits them
+    ACHIEVEMENT_DEFINITIONS_TTL = int(os.environ.get('ACHIEVEMENT_DEFINITIONS_TTL', 300))  # seconds until edits made elsewhere show up
+
+    # Skill tree graphs and per-user unlock frontiers (/api/skills/nodes), cached per process
+    SKILL_TREE_TTL = int(os.environ.get('SKILL_TREE_TTL', 300))  # seconds until edits made by other processes show up
+    SKILL_TREE_FRONTIERS = int(os.environ.get('SKILL_TREE_FRONTIERS', 10000))  # (user, tree) frontiers kept
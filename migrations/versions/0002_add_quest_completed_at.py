@@ -0,0 +1,24 @@
+"""add quest.completed_at
+
+Revision ID: 0002_add_quest_completed_at
+Revises: 0001_add_stats_and_streaks
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_add_quest_completed_at'
+down_revision = '0001_add_stats_and_streaks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Completion time drives the quest board's "completed in the last N days" window.
+    # Quests completed before this column existed stay NULL and drop out of the window.
+    op.add_column('quest', sa.Column('completed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('quest', 'completed_at')
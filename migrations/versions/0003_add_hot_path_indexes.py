@@ -0,0 +1,37 @@
+"""add composite indexes for hot query shapes
+
+Revision ID: 0003_add_hot_path_indexes
+Revises: 0002_add_quest_completed_at
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003_add_hot_path_indexes'
+down_revision = '0002_add_quest_completed_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Quest board / dashboard filters
+    op.create_index('ix_quest_user_completed', 'quest', ['user_id', 'completed'])
+    op.create_index('ix_quest_user_type', 'quest', ['user_id', 'quest_type'])
+    op.create_index('ix_habit_user', 'habit', ['user_id'])
+    op.create_index('ix_achievement_title', 'achievement', ['title'])
+
+    # Drop duplicate grants (keep the earliest) before enforcing one row per pair
+    op.execute(
+        'DELETE FROM earned_achievement WHERE id NOT IN ('
+        'SELECT MIN(id) FROM earned_achievement GROUP BY user_id, achievement_id)'
+    )
+    op.create_index('ix_earned_achievement_user_achievement', 'earned_achievement',
+                    ['user_id', 'achievement_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_earned_achievement_user_achievement', table_name='earned_achievement')
+    op.drop_index('ix_achievement_title', table_name='achievement')
+    op.drop_index('ix_habit_user', table_name='habit')
+    op.drop_index('ix_quest_user_type', table_name='quest')
+    op.drop_index('ix_quest_user_completed', table_name='quest')
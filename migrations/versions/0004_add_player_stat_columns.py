@@ -0,0 +1,29 @@
+"""add typed player stat columns
+
+Revision ID: 0004_add_player_stat_columns
+Revises: 0003_add_hot_path_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_add_player_stat_columns'
+down_revision = '0003_add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+PLAYER_STAT_COLUMNS = ('meditation_streak', 'books_read', 'habits_completed', 'goals_achieved', 'quests_completed')
+
+
+def upgrade():
+    # One column per player stat; the system_* columns come from 0001.
+    # Values are copied out of the legacy JSON columns afterwards by
+    # scripts/migrate_legacy_stats.py, in resumable chunks.
+    for name in PLAYER_STAT_COLUMNS:
+        op.add_column('user', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    for name in reversed(PLAYER_STAT_COLUMNS):
+        op.drop_column('user', name)
@@ -0,0 +1,90 @@
+"""add append-only activity log and per-user snapshots
+
+Revision ID: 0005_add_activity_log
+Revises: 0004_add_player_stat_columns
+Create Date: 2026-10-18
+
+Each user gets a baseline snapshot of their XP and player stats. Run this
+before scripts/migrate_legacy_stats.py, like 0004: until the backfill has
+moved a user's legacy ``player_stats`` JSON, the 0004 columns still hold 0,
+so the baseline is the column plus the legacy value (what the backfill will
+add to the column). Users the backfill already moved have no JSON left and
+are seeded from the columns alone, so running it first is harmless.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from scripts.migrate_legacy_stats import PLAYER_COLUMNS, legacy_deltas
+
+# revision identifiers, used by Alembic.
+revision = '0005_add_activity_log'
+down_revision = '0004_add_player_stat_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'activity_event',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('activity_type', sa.String(length=50), nullable=False),
+        sa.Column('xp_delta', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('stat_deltas', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_activity_event_user_id', 'activity_event', ['user_id', 'id'])
+
+    op.create_table(
+        'activity_snapshot',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), primary_key=True),
+        sa.Column('last_event_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('xp', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('stats', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+
+    _seed_snapshots(op.get_bind())
+
+
+# Users per snapshot INSERT
+SEED_BATCH = 1000
+
+
+def _seed_snapshots(bind):
+    """Fold history before the log into a baseline snapshot per user."""
+    stat_columns = tuple(PLAYER_COLUMNS.values())
+    legacy = 'player_stats' in {column['name'] for column in sa.inspect(bind).get_columns('user')}
+    select_sql = sa.text(
+        f"SELECT id, xp, {', '.join(stat_columns + (('player_stats',) if legacy else ()))} "
+        'FROM "user" WHERE id > :after ORDER BY id LIMIT :limit'
+    )
+    snapshot = sa.table(
+        'activity_snapshot',
+        sa.column('user_id', sa.Integer), sa.column('last_event_id', sa.Integer),
+        sa.column('xp', sa.Integer), sa.column('stats', sa.JSON), sa.column('created_at', sa.DateTime),
+    )
+
+    now = datetime.utcnow()
+    after = 0
+    while True:
+        rows = bind.execute(select_sql, {'after': after, 'limit': SEED_BATCH}).mappings().all()
+        if not rows:
+            break
+        snapshots = []
+        for row in rows:
+            pending = legacy_deltas(None, row['player_stats']) if legacy else {}
+            snapshots.append({
+                'user_id': row['id'], 'last_event_id': 0, 'xp': row['xp'] or 0, 'created_at': now,
+                'stats': {column: (row[column] or 0) + pending.get(column, 0) for column in stat_columns},
+            })
+        op.bulk_insert(snapshot, snapshots)
+        after = rows[-1]['id']
+
+
+def downgrade():
+    op.drop_table('activity_snapshot')
+    op.drop_index('ix_activity_event_user_id', table_name='activity_event')
+    op.drop_table('activity_event')
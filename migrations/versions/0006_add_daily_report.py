@@ -0,0 +1,37 @@
+"""add incrementally maintained daily reports
+
+Revision ID: 0006_add_daily_report
+Revises: 0005_add_activity_log
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_add_daily_report'
+down_revision = '0005_add_activity_log'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'daily_report',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('xp_gained', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('quests_completed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('habits_tracked', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('activities', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('the_win', sa.Text(), nullable=True),
+        sa.Column('the_lesson', sa.Text(), nullable=True),
+        sa.Column('the_plan', sa.Text(), nullable=True),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_daily_report_user_day', 'daily_report', ['user_id', 'day'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_daily_report_user_day', table_name='daily_report')
+    op.drop_table('daily_report')
@@ -0,0 +1,35 @@
+"""add durable job queue table
+
+Revision ID: 0007_add_job_queue
+Revises: 0006_add_daily_report
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_add_job_queue'
+down_revision = '0006_add_daily_report'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_queue',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('enqueued_at', sa.DateTime(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_job_queue_status_available', 'job_queue', ['status', 'available_at'])
+
+
+def downgrade():
+    op.drop_index('ix_job_queue_status_available', table_name='job_queue')
+    op.drop_table('job_queue')
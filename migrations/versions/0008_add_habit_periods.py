@@ -0,0 +1,48 @@
+"""add user time zones and habit streak periods
+
+Revision ID: 0008_add_habit_periods
+Revises: 0007_add_job_queue
+Create Date: 2026-10-18
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_add_habit_periods'
+down_revision = '0007_add_job_queue'
+branch_labels = None
+depends_on = None
+
+
+def _period_index(day, frequency):
+    # Same numbering as app.streaks.period_index (existing users are on UTC)
+    if frequency == 'weekly':
+        return (day.toordinal() - 1) // 7
+    if frequency == 'monthly':
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+
+def upgrade():
+    op.add_column('user', sa.Column('timezone', sa.String(length=50), nullable=False, server_default='UTC'))
+    op.add_column('habit', sa.Column('last_period', sa.Integer(), nullable=True))
+    op.create_index('ix_habit_frequency_period', 'habit', ['frequency', 'last_period'])
+
+    # One-off backfill so the rollover doesn't reset streaks tracked before this revision
+    conn = op.get_bind()
+    rows = conn.execute(sa.text('SELECT id, frequency, last_completed FROM habit WHERE last_completed IS NOT NULL')).all()
+    params = []
+    for habit_id, frequency, last_completed in rows:
+        if isinstance(last_completed, str):
+            last_completed = datetime.fromisoformat(last_completed)
+        params.append({'id': habit_id, 'period': _period_index(last_completed.date(), frequency)})
+    if params:
+        conn.execute(sa.text('UPDATE habit SET last_period = :period WHERE id = :id'), params)
+
+
+def downgrade():
+    op.drop_index('ix_habit_frequency_period', table_name='habit')
+    op.drop_column('habit', 'last_period')
+    op.drop_column('user', 'timezone')
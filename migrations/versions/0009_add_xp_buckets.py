@@ -0,0 +1,62 @@
+"""add hourly, daily and weekly XP buckets
+
+Revision ID: 0009_add_xp_buckets
+Revises: 0008_add_habit_periods
+Create Date: 2026-10-18
+"""
+from collections import Counter
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_add_xp_buckets'
+down_revision = '0008_add_habit_periods'
+branch_labels = None
+depends_on = None
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _bucket_indexes(moment):
+    # Same numbering as app.xp_windows.bucket_index
+    return {
+        'hour': int((moment - _EPOCH).total_seconds() // 3600),
+        'day': moment.date().toordinal(),
+        'week': (moment.date().toordinal() - 1) // 7,
+    }
+
+
+def upgrade():
+    op.create_table(
+        'xp_bucket',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('granularity', sa.String(length=10), nullable=False),
+        sa.Column('bucket', sa.Integer(), nullable=False),
+        sa.Column('xp', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_xp_bucket_user_period', 'xp_bucket', ['user_id', 'granularity', 'bucket'], unique=True)
+
+    # One-off backfill of the XP already recorded in the activity log
+    conn = op.get_bind()
+    totals = Counter()
+    rows = conn.execute(sa.text('SELECT user_id, created_at, xp_delta FROM activity_event WHERE xp_delta != 0'))
+    for user_id, created_at, xp_delta in rows:
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        for granularity, bucket in _bucket_indexes(created_at).items():
+            totals[user_id, granularity, bucket] += xp_delta
+    if totals:
+        conn.execute(
+            sa.text('INSERT INTO xp_bucket (user_id, granularity, bucket, xp) '
+                    'VALUES (:user_id, :granularity, :bucket, :xp)'),
+            [{'user_id': user_id, 'granularity': granularity, 'bucket': bucket, 'xp': xp}
+             for (user_id, granularity, bucket), xp in totals.items()]
+        )
+
+
+def downgrade():
+    op.drop_index('ix_xp_bucket_user_period', table_name='xp_bucket')
+    op.drop_table('xp_bucket')
@@ -0,0 +1,47 @@
+"""add recurring quests and quest recurrence keys
+
+Revision ID: 0010_add_recurring_quests
+Revises: 0009_add_xp_buckets
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0010_add_recurring_quests'
+down_revision = '0009_add_xp_buckets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'recurring_quest',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('difficulty', sa.String(length=50), nullable=True),
+        sa.Column('xp_reward', sa.Integer(), nullable=True),
+        sa.Column('quest_type', sa.String(length=50), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('until', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_recurring_quest_type_active', 'recurring_quest', ['quest_type', 'active', 'id'])
+
+    with op.batch_alter_table('quest') as batch_op:
+        batch_op.add_column(sa.Column('recurring_quest_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('period', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_quest_recurring_quest', 'recurring_quest', ['recurring_quest_id'], ['id'])
+    op.create_index('ix_quest_recurrence', 'quest', ['recurring_quest_id', 'period'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_quest_recurrence', table_name='quest')
+    with op.batch_alter_table('quest') as batch_op:
+        batch_op.drop_constraint('fk_quest_recurring_quest', type_='foreignkey')
+        batch_op.drop_column('period')
+        batch_op.drop_column('recurring_quest_id')
+    op.drop_index('ix_recurring_quest_type_active', table_name='recurring_quest')
+    op.drop_table('recurring_quest')
@@ -0,0 +1,25 @@
+"""add quest expiry and the (completed, deadline) due-date index
+
+Revision ID: 0011_add_quest_expiry
+Revises: 0010_add_recurring_quests
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011_add_quest_expiry'
+down_revision = '0010_add_recurring_quests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('quest', sa.Column('failed_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_quest_completed_deadline', 'quest', ['completed', 'deadline'],
+                    sqlite_where=sa.text('failed_at IS NULL'), postgresql_where=sa.text('failed_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_quest_completed_deadline', table_name='quest')
+    op.drop_column('quest', 'failed_at')
@@ -0,0 +1,63 @@
+"""add skill trees and per-user skill node progress
+
+Revision ID: 0012_add_skill_tree
+Revises: 0011_add_quest_expiry
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0012_add_skill_tree'
+down_revision = '0011_add_quest_expiry'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'skill',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(length=100), nullable=False, unique=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        'skill_node',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('skill_id', sa.Integer(), sa.ForeignKey('skill.id'), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('node_type', sa.String(length=20), nullable=False, server_default='lesson'),
+        sa.Column('xp_reward', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_skill_node_skill', 'skill_node', ['skill_id'])
+    op.create_table(
+        'node_dependency',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('node_id', sa.Integer(), sa.ForeignKey('skill_node.id'), nullable=False),
+        sa.Column('requires_id', sa.Integer(), sa.ForeignKey('skill_node.id'), nullable=False),
+        sa.Column('required', sa.Boolean(), nullable=False, server_default=sa.true()),
+    )
+    op.create_index('ix_node_dependency_edge', 'node_dependency', ['node_id', 'requires_id'], unique=True)
+    op.create_table(
+        'user_skill_node',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('node_id', sa.Integer(), sa.ForeignKey('skill_node.id'), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_user_skill_node_user_node', 'user_skill_node', ['user_id', 'node_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_skill_node_user_node', table_name='user_skill_node')
+    op.drop_table('user_skill_node')
+    op.drop_index('ix_node_dependency_edge', table_name='node_dependency')
+    op.drop_table('node_dependency')
+    op.drop_index('ix_skill_node_skill', table_name='skill_node')
+    op.drop_table('skill_node')
+    op.drop_table('skill')
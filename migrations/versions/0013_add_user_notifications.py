@@ -0,0 +1,30 @@
+"""add stored notifications for deferred work
+
+Revision ID: 0013_add_user_notifications
+Revises: 0012_add_skill_tree
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0013_add_user_notifications'
+down_revision = '0012_add_skill_tree'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_notification',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_user_notification_user_id', 'user_notification', ['user_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_user_notification_user_id', table_name='user_notification')
+    op.drop_table('user_notification')
@@ -0,0 +1,37 @@
+"""index the quest board's open and recently closed ranges
+
+Revision ID: 0014_add_quest_board_indexes
+Revises: 0013_add_user_notifications
+Create Date: 2026-10-18
+
+ix_quest_user_open replaces ix_quest_user_completed: it serves the same
+open-quest lookups, already in id order and without expired quests.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0014_add_quest_board_indexes'
+down_revision = '0013_add_user_notifications'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_quest_user_open', 'quest', ['user_id', 'id'],
+                    sqlite_where=sa.text('completed = 0 AND failed_at IS NULL'),
+                    postgresql_where=sa.text('completed = false AND failed_at IS NULL'))
+    # Partial, so neither is mistaken for a way to find open (NULL) quests
+    op.create_index('ix_quest_user_completed_at', 'quest', ['user_id', 'completed_at'],
+                    sqlite_where=sa.text('completed_at IS NOT NULL'),
+                    postgresql_where=sa.text('completed_at IS NOT NULL'))
+    op.create_index('ix_quest_user_failed_at', 'quest', ['user_id', 'failed_at'],
+                    sqlite_where=sa.text('failed_at IS NOT NULL'), postgresql_where=sa.text('failed_at IS NOT NULL'))
+    op.drop_index('ix_quest_user_completed', table_name='quest')
+
+
+def downgrade():
+    op.create_index('ix_quest_user_completed', 'quest', ['user_id', 'completed'])
+    op.drop_index('ix_quest_user_failed_at', table_name='quest')
+    op.drop_index('ix_quest_user_completed_at', table_name='quest')
+    op.drop_index('ix_quest_user_open', table_name='quest')
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Concurrent write benchmark for the SQLite profiles.
+
+Usage (from project root):
+
+$env:PYTHONPATH='.'; python .\\scripts\\bench_sqlite_writes.py --workers 8 --activities 200
+
+Each worker process plays the part of a gunicorn worker: it builds its own
+app and pushes activities for its own user through the activity pipeline
+(one transaction each) as fast as it can. The run is repeated with
+SQLITE_PROFILE='off' (SQLite defaults) and 'production' (WAL,
+synchronous=NORMAL, busy_timeout, ...) on separate scratch databases, and the
+committed write throughput plus the number of "database is locked" failures
+are printed for each.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import User, Achievement
+from app.helpers import run_activity
+
+
+def make_app(db_path, profile):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+        'SQLITE_PROFILE': profile,
+    })
+
+
+def setup(db_path, profile, workers):
+    from migrate_db import ACHIEVEMENT_DEFINITIONS
+
+    app = make_app(db_path, profile)
+    with app.app_context():
+        db.create_all()
+        for ach_def in ACHIEVEMENT_DEFINITIONS:
+            db.session.add(Achievement(**ach_def))
+        for n in range(workers):
+            u = User(username=f'bench{n}', email=f'bench{n}@example.com')
+            u.set_password('password')
+            db.session.add(u)
+        db.session.commit()
+
+
+def worker(args):
+    db_path, profile, index, activities = args
+    app = make_app(db_path, profile)
+    committed = locked = 0
+    with app.test_request_context():
+        user = User.query.filter_by(username=f'bench{index}').one()
+        for _ in range(activities):
+            try:
+                run_activity(user, 'COMPLETE_HABIT', {'habits_completed': 1})
+                committed += 1
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+    return committed, locked
+
+
+def run(profile, workers, activities):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_sqlite_'), 'bench.db')
+    setup(db_path, profile, workers)
+
+    started = time.perf_counter()
+    with Pool(workers) as pool:
+        results = pool.map(worker, [(db_path, profile, n, activities) for n in range(workers)])
+    elapsed = time.perf_counter() - started
+
+    committed = sum(r[0] for r in results)
+    locked = sum(r[1] for r in results)
+    return committed, locked, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--activities', type=int, default=200, help='activities per worker')
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers x {args.activities} activities')
+    print(f'{"profile":<12}{"committed":>10}{"locked":>8}{"seconds":>9}{"writes/s":>10}')
+    for profile in ('off', 'production'):
+        committed, locked, elapsed = run(profile, args.workers, args.activities)
+        print(f'{profile:<12}{committed:>10}{locked:>8}{elapsed:>9.2f}{committed / elapsed:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Index advisor: flag hot queries that SQLite answers with a full table scan.
+
+Usage (from project root):
+
+$env:PYTHONPATH='.'; python .\\scripts\\index_advisor.py
+
+The script builds a scratch SQLite database from the current models, drives
+a representative workload through the app (dashboard, player status, quest
+board, quest completion, activities, progress polling, habits), records every
+statement the app sends, and runs EXPLAIN QUERY PLAN over each distinct one.
+Any filtered query whose plan contains a bare ``SCAN <table>`` (no index) is
+reported. Exits with status 1 when full scans are found so it can run in CI.
+"""
+import os
+import sys
+import tempfile
+
+from sqlalchemy import event, inspect
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import User, Quest, Habit, Achievement
+
+
+def record_workload(app):
+    """Run the workload and return the distinct ``(statement, parameters)`` seen."""
+    from migrate_db import ACHIEVEMENT_DEFINITIONS
+
+    with app.app_context():
+        db.create_all()
+        for ach_def in ACHIEVEMENT_DEFINITIONS:
+            db.session.add(Achievement(**ach_def))
+        user = User(username='advisor', email='advisor@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        for n in range(20):
+            db.session.add(Quest(title=f'Quest {n}', difficulty='E', xp_reward=50,
+                                 quest_type=('daily', 'weekly', 'achievement')[n % 3], user_id=user.id))
+        db.session.add(Habit(title='Meditate', frequency='daily', user_id=user.id))
+        db.session.commit()
+        user_id = user.id
+        quest_ids = [q.id for q in Quest.query.filter_by(user_id=user_id).order_by(Quest.id).limit(4)]
+
+        recorded = {}
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            recorded.setdefault(statement, parameters)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            client = app.test_client()
+            client.post('/login', data={'username': 'advisor', 'password': 'password'})
+            client.get('/dashboard')
+            client.get('/player_info')
+            client.get('/pd/tasks')
+            client.post('/complete-task', json={'id': quest_ids[0]})
+            client.post('/pd/tasks/complete', json={'ids': quest_ids[1:]})
+            client.post('/complete-book')
+            client.post('/update-meditation')
+            client.get('/api/progress')
+            client.get('/api/achievements')
+            Habit.query.filter_by(user_id=user_id).all()
+            Achievement.query.filter_by(title='Bookworm').first()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    return list(recorded.items())
+
+
+def find_full_scans(engine, records):
+    """Return ``(statement, plan detail)`` pairs for filtered queries that scan a table."""
+    # Scans of subquery results (``SCAN anon_1``) are not table scans
+    tables = set(inspect(engine).get_table_names())
+    findings = []
+    with engine.connect() as conn:
+        raw = conn.connection.dbapi_connection
+        for statement, parameters in records:
+            if 'WHERE' not in statement.upper():
+                continue
+            try:
+                plan = raw.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            except Exception as e:
+                print(f'Could not explain statement: {e}\n  {statement}')
+                continue
+            for row in plan:
+                detail = row[-1]
+                words = detail.split()
+                if words[0] == 'SCAN' and words[1] in tables and 'INDEX' not in detail:
+                    findings.append((statement, detail))
+    return findings
+
+
+def main():
+    db_dir = tempfile.mkdtemp(prefix='index_advisor_')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(db_dir, 'advisor.db'),
+    })
+
+    records = record_workload(app)
+    with app.app_context():
+        findings = find_full_scans(db.engine, records)
+
+    print(f'Explained {len(records)} distinct statements')
+    if not findings:
+        print('No full table scans found.')
+        return 0
+
+    print(f'{len(findings)} full table scan(s):')
+    for statement, detail in findings:
+        print(f'\n- {detail}\n  {" ".join(statement.split())}')
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
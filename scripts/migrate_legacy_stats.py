@@ -1,29 +1,60 @@
 #!/usr/bin/env python3
 """
-Idempotent data migration script to copy legacy JSON stats into explicit columns.
+Streaming backfill of the legacy JSON stats into the typed stat columns.
 
 Usage (from project root, with venv activated if needed):
 
-$env:PYTHONPATH='.'; python .\scripts\migrate_legacy_stats.py
+$env:PYTHONPATH='.'; python .\\scripts\\migrate_legacy_stats.py [--chunk-size 1000] [--restart]
+
+Run it after `alembic upgrade head` (0004 adds the player stat columns) and
+before the legacy `core_stats` / `player_stats` JSON columns are dropped.
+The app may already be serving and incrementing the typed columns while it
+runs.
 
 This script will:
-- Read `core_stats` JSON and map keys to `system_strength`, `system_intelligence`,
-  `system_agility`, `system_willpower`, `system_discipline` when those columns
-  are currently NULL.
-- Read `player_stats` JSON (dict or list form) and populate the first available
-  `player_stat_N_name` / `player_stat_N_value` slots when empty, or fill
-  missing values for matching stat names.
-
-The operation is non-destructive and idempotent: it will not overwrite
-non-null explicit columns.
+- Walk the users that still have legacy JSON stats in primary-key order,
+  ``--chunk-size`` rows at a time (keyset pagination, so memory use does not
+  grow with the table).
+- Map `core_stats` keys to `system_strength`, `system_intelligence`,
+  `system_agility`, `system_willpower`, `system_discipline` and `player_stats`
+  (dict or list form) keys to the matching player stat columns.
+- Add each legacy value to its column as a delta over the column default
+  (``col = col + legacy - default``), so increments made since the deploy
+  are kept, and clear the user's JSON columns in the same UPDATE. The
+  cleared JSON is the per-user marker: a user is only ever moved once, even
+  if the script is re-run or runs twice at the same time.
+- Write each chunk with a single executemany UPDATE and commit it on its own,
+  then record the last user id in a checkpoint file. An interrupted run picks
+  up after the checkpoint; `--restart` ignores it (moved users are skipped
+  either way).
+
+Columns whose JSON value is missing or not an integer are left untouched.
+Unmapped JSON keys are dropped with the JSON, so take a backup first.
 """
+import argparse
 import json
+import os
 import sys
 from typing import Any
 
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from app import create_app, db
 from app.models import User
 
+CORE_COLUMNS = {key: f'system_{key}' for key in User.CORE_STAT_KEYS}
+PLAYER_COLUMNS = {key: key for key in User.PLAYER_STAT_KEYS}
+TARGET_COLUMNS = tuple(CORE_COLUMNS.values()) + tuple(PLAYER_COLUMNS.values())
+
+# Only the JSON columns that still exist are read, so a partly cleaned-up
+# schema works too
+LEGACY_COLUMNS = ('core_stats', 'player_stats')
+
+# Defaults the typed columns started from; legacy values are added on top
+COLUMN_DEFAULTS = {column: User.__table__.c[column].default.arg for column in TARGET_COLUMNS}
+
 
 def parse_json_field(value: Any):
     if value is None:
@@ -38,113 +69,136 @@ def parse_json_field(value: Any):
     return None
 
 
-def migrate_user(u: User) -> bool:
-    """Return True if user was modified."""
-    changed = False
-
-    core = parse_json_field(getattr(u, 'core_stats', None))
-    mapping = {
-        'strength': 'system_strength',
-        'intelligence': 'system_intelligence',
-        'agility': 'system_agility',
-        'willpower': 'system_willpower',
-        'discipline': 'system_discipline',
-    }
-
-    if isinstance(core, dict):
-        for k, target in mapping.items():
-            # try multiple key casings for robustness
-            val = core.get(k)
-            if val is None:
-                val = core.get(k.capitalize())
-            if val is None:
-                val = core.get(k.title())
-
-            cur = getattr(u, target, None)
-            # only set when current value is None
-            if cur is None and val is not None:
-                try:
-                    setattr(u, target, int(val))
-                    changed = True
-                except Exception:
-                    # ignore bad cast
-                    pass
-
-    # player_stats may be a dict {name: value} or a list [{name:..., value:...}]
-    pstats = parse_json_field(getattr(u, 'player_stats', None))
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stat_items(stats):
+    """Return ``(name, value)`` pairs from dict or list shaped JSON stats."""
+    if isinstance(stats, dict):
+        return list(stats.items())
     items = []
-    if isinstance(pstats, dict):
-        items = list(pstats.items())
-    elif isinstance(pstats, list):
-        for el in pstats:
-            if isinstance(el, dict):
-                # try common shapes
-                name = el.get('name') or el.get('stat')
-                val = el.get('value') or el.get('val') or el.get('amount')
-                if name is None and len(el) == 1:
-                    # e.g. [{"Strength": 5}]
-                    k = next(iter(el.keys()))
-                    name = k
-                    val = el[k]
-                if name is not None:
-                    items.append((str(name), val))
-
-    # populate player_stat_N_name/value slots
-    for i in range(1, 6):
-        name_attr = f'player_stat_{i}_name'
-        val_attr = f'player_stat_{i}_value'
-        cur_name = getattr(u, name_attr, None)
-        cur_val = getattr(u, val_attr, None)
-
-        # If name exists and value is missing, try to find in items by name
-        if cur_name and (cur_val is None):
-            for idx, (n, v) in enumerate(items):
-                if isinstance(n, str) and n.strip().lower() == str(cur_name).strip().lower():
-                    if v is not None:
-                        try:
-                            setattr(u, val_attr, int(v))
-                            changed = True
-                        except Exception:
-                            pass
-                    # remove matched item
-                    items.pop(idx)
-                    break
-
-        # If name slot empty, fill from next remaining item
-        if not cur_name and items:
-            n, v = items.pop(0)
-            try:
-                setattr(u, name_attr, str(n))
-                setattr(u, val_attr, int(v) if v is not None else 0)
-                changed = True
-            except Exception:
-                pass
-
-    return changed
+    if isinstance(stats, list):
+        for el in stats:
+            if not isinstance(el, dict):
+                continue
+            # try common shapes
+            name = el.get('name') or el.get('stat')
+            val = el.get('value') or el.get('val') or el.get('amount')
+            if name is None and len(el) == 1:
+                # e.g. [{"Strength": 5}]
+                name, val = next(iter(el.items()))
+            if name is not None:
+                items.append((str(name), val))
+    return items
+
+
+def stat_columns(core_stats, player_stats):
+    """Return the typed column values found in a user's legacy JSON stats.
+
+    Every target column is present in the result; columns without a usable
+    JSON value map to None.
+    """
+    values = dict.fromkeys(TARGET_COLUMNS)
+    for stats, mapping in ((core_stats, CORE_COLUMNS), (player_stats, PLAYER_COLUMNS)):
+        for name, val in _stat_items(parse_json_field(stats)):
+            column = mapping.get(str(name).strip().lower())
+            if column is not None:
+                values[column] = _as_int(val)
+    return values
+
+
+def legacy_deltas(core_stats, player_stats):
+    """Return ``{column: legacy value - column default}`` for a user's legacy JSON stats.
+
+    Columns without a usable JSON value get a delta of 0.
+    """
+    return {column: 0 if value is None else value - COLUMN_DEFAULTS[column]
+            for column, value in stat_columns(core_stats, player_stats).items()}
+
+
+def _update_sql(legacy):
+    moved = ', '.join(f'{column} = NULL' for column in legacy)
+    added = ', '.join(f'{column} = {column} + :{column}' for column in TARGET_COLUMNS)
+    pending = ' OR '.join(f'{column} IS NOT NULL' for column in legacy)
+    return text(f'UPDATE "user" SET {added}, {moved} WHERE id = :id AND ({pending})')
+
+
+def backfill(engine, chunk_size=1000, start_after=0, on_chunk=None):
+    """Move legacy JSON stats into the typed columns, one committed chunk at a time.
+
+    Users with ``id > start_after`` whose JSON stats haven't been moved yet are
+    processed in id order. ``on_chunk`` is called with the last id of each
+    chunk once that chunk has committed. Returns the number of users moved.
+    """
+    present = {column['name'] for column in inspect(engine).get_columns('user')}
+    legacy = [column for column in LEGACY_COLUMNS if column in present]
+    if not legacy:
+        return 0
+
+    pending = ' OR '.join(f'{column} IS NOT NULL' for column in legacy)
+    select_sql = text(
+        f'SELECT id, {", ".join(legacy)} FROM "user" WHERE id > :after AND ({pending}) '
+        'ORDER BY id LIMIT :limit'
+    )
+    update_sql = _update_sql(legacy)
+
+    updated = 0
+    last_id = start_after
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_sql, {'after': last_id, 'limit': chunk_size}).mappings().all()
+            if not rows:
+                break
+            params = [dict(legacy_deltas(row.get('core_stats'), row.get('player_stats')), id=row['id'])
+                      for row in rows]
+            conn.execute(update_sql, params)
+        updated += len(params)
+        last_id = rows[-1]['id']
+        if on_chunk is not None:
+            on_chunk(last_id)
+    return updated
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, last_id):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(str(last_id))
+    os.replace(tmp, path)
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--checkpoint', help='checkpoint file (default: instance/migrate_legacy_stats.checkpoint)')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the first user')
+    args = parser.parse_args()
+
     app = create_app()
+    checkpoint = args.checkpoint or os.path.join(app.instance_path, 'migrate_legacy_stats.checkpoint')
+    start_after = 0 if args.restart else read_checkpoint(checkpoint)
+    if start_after:
+        print(f'Resuming after user id={start_after}')
+
+    def on_chunk(last_id):
+        write_checkpoint(checkpoint, last_id)
+        print(f'  committed through user id={last_id}')
+
     with app.app_context():
-        users = User.query.order_by(User.id).all()
-        total = len(users)
-        print(f'Found {total} users to inspect')
-
-        updated = 0
-        updated_ids = []
-        for u in users:
-            try:
-                if migrate_user(u):
-                    updated += 1
-                    updated_ids.append(u.id)
-                    db.session.add(u)
-            except Exception as e:
-                print(f'Error processing user id={u.id}:', e)
-
-        if updated:
-            db.session.commit()
-
-        print(f'Updated {updated} users: {updated_ids}')
+        updated = backfill(db.engine, args.chunk_size, start_after, on_chunk)
+
+    print(f'Updated {updated} users')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,85 @@
+"""Shared fixtures: a test app on an in-memory database, its client and a logged-in hunter.
+
+Fixtures never hold an app context open, so every request made through the
+client gets its own session, as it would in production. Tests wrap direct
+database work in ``with app.app_context():``.
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import db, User, Achievement
+from migrate_db import ACHIEVEMENT_DEFINITIONS
+
+TEST_CONFIG = {'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def make_app():
+    """Return a factory for test apps with their tables created; keyword arguments override the config."""
+    def factory(**config):
+        app = create_app(dict(TEST_CONFIG, **config))
+        with app.app_context():
+            db.create_all()
+        return app
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_user():
+    """Return a function that creates and commits a user in the current app context."""
+    def add(username, password=PASSWORD, **fields):
+        fields.setdefault('email', f'{username}@example.com')
+        user = User(username=username, **fields)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return add
+
+
+@pytest.fixture
+def seed_achievements():
+    """Return a function that adds the standard achievement definitions in the current app context."""
+    def seed():
+        for ach_def in ACHIEVEMENT_DEFINITIONS:
+            db.session.add(Achievement(**ach_def))
+        db.session.commit()
+    return seed
+
+
+@pytest.fixture
+def login():
+    """Return a function that logs a test client in."""
+    def log_in(client, username='hunter', password=PASSWORD):
+        return client.post('/login', data={'username': username, 'password': password})
+    return log_in
+
+
+@pytest.fixture
+def user_id(app, add_user):
+    """Id of the ``hunter`` account."""
+    with app.app_context():
+        return add_user('hunter').id
+
+
+@pytest.fixture
+def auth_client(client, user_id, login):
+    """A client logged in as ``hunter``."""
+    login(client)
+    return client
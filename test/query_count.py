@@ -0,0 +1,35 @@
+"""Query counting helpers for tests.
+
+Usage::
+
+    with assert_max_queries(db.engine, 2):
+        client.get('/player_info')
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect every SQL statement executed on ``engine`` inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Fail if the block runs more than ``limit`` SQL statements."""
+    with count_queries(engine) as statements:
+        yield statements
+    if len(statements) > limit:
+        listing = '\n'.join(f'  {n}. {s}' for n, s in enumerate(statements, start=1))
+        raise AssertionError(f'Expected at most {limit} queries, got {len(statements)}:\n{listing}')
@@ -0,0 +1,124 @@
+"""Achievement engine: cached definitions/earned sets and changed-stat evaluation."""
+from app.achievements import get_achievement_engine
+from app.models import db, User, Achievement, EarnedAchievement
+from app.helpers import run_activity
+from app.requirements import RequirementIndex, compile_requirement
+from migrate_db import ACHIEVEMENT_DEFINITIONS
+from query_count import count_queries
+
+
+def test_steady_state_activity_runs_no_achievement_queries(app, add_user, seed_achievements):
+    with app.app_context():
+        seed_achievements()
+        u = add_user('engine')
+
+        # Warm the caches and earn Bookworm
+        for _ in range(5):
+            run_activity(u, 'READ_BOOK', {'books_read': 1})
+
+        with count_queries(db.engine) as statements:
+            run_activity(u, 'READ_BOOK', {'books_read': 1})
+            run_activity(u, 'COMPLETE_HABIT', {'habits_completed': 1})
+
+        # Progress serialization still loads the relationship; rule checks must not query
+        touched = [s for s in statements
+                   if 'FROM achievement' in s or s.startswith('SELECT earned_achievement.achievement_id')]
+        assert touched == []
+
+
+def test_new_achievement_invalidates_definitions(app, add_user):
+    with app.app_context():
+        u = add_user('late')
+
+        # No definitions yet, so nothing can be granted
+        result = run_activity(u, 'ACHIEVE_GOAL', {'goals_achieved': 5})
+        assert [n for n in result['notifications'] if n['type'] == 'achievement'] == []
+
+        db.session.add(Achievement(**ACHIEVEMENT_DEFINITIONS[-1]))
+        db.session.commit()
+
+        result = run_activity(u, 'ACHIEVE_GOAL', {'goals_achieved': 1})
+        assert [n['achievement'] for n in result['notifications'] if n['type'] == 'achievement'] == ['Goal Achiever']
+
+
+def test_achievements_added_elsewhere_show_up_after_the_ttl(tmp_path, make_app, add_user):
+    uri = 'sqlite:///' + str(tmp_path / 'shared.db')
+    worker = make_app(SQLALCHEMY_DATABASE_URI=uri, ACHIEVEMENT_DEFINITIONS_TTL=0)
+    with worker.app_context():
+        user_id = add_user('late', goals_achieved=4).id
+        engine = get_achievement_engine()
+        before = engine.definitions()
+        # Re-reading unchanged rows keeps the index
+        assert engine.definitions() is before
+
+    # Plain SQL from another process fires no mapper events here
+    with worker.app_context(), db.engine.begin() as conn:
+        conn.execute(db.text("INSERT INTO achievement (title, requirement) VALUES ('Goal Achiever', 'goals_achieved >= 5')"))
+
+    with worker.app_context():
+        result = run_activity(db.session.get(User, user_id), 'ACHIEVE_GOAL', {'goals_achieved': 1})
+        assert [n['achievement'] for n in result['notifications'] if n['type'] == 'achievement'] == ['Goal Achiever']
+
+
+def test_requirement_compiler():
+    assert compile_requirement('quests_completed >= 10')({'quests_completed': 10})
+    assert not compile_requirement('books_read > 5')({'books_read': 5})
+    compound = compile_requirement('books_read >= 5 and meditation_streak >= 7')
+    assert compound.stats == {'books_read', 'meditation_streak'}
+    assert not compound({'books_read': 9, 'meditation_streak': 1})
+
+    for bad in ('', '__import__("os")', 'books_read >= five', 'books_read >= 1 or xp >= 1'):
+        try:
+            compile_requirement(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{bad!r} should not compile')
+
+    index = RequirementIndex()
+    for n in range(1, 1001):
+        index.add(n, f'Reader {n}', compile_requirement(f'books_read >= {n}'))
+    index.add(2000, 'Balanced', compile_requirement('books_read >= 3 and goals_achieved >= 1'))
+
+    assert sorted(index.satisfied({'books_read': 3}, ['books_read'])) == [1, 2, 3]
+    assert sorted(index.satisfied({'books_read': 3, 'goals_achieved': 1}, ['goals_achieved'])) == [2000]
+    assert list(index.satisfied({'books_read': 3}, ['habits_completed'])) == []
+    # Given the old value, only the thresholds crossed since are visited
+    assert list(index.satisfied({'books_read': 502}, {'books_read': 500})) == [501, 502]
+    assert list(index.satisfied({'books_read': 3}, {'books_read': 3})) == []
+
+
+def test_achievement_added_from_requirement_only(app, add_user):
+    with app.app_context():
+        db.session.add(Achievement(title='Scholar', requirement='books_read >= 2 and level >= 1'))
+        db.session.add(Achievement(title='Broken', requirement='books_read ~ 2'))
+        u = add_user('scholar')
+
+        run_activity(u, 'READ_BOOK', {'books_read': 1})
+        result = run_activity(u, 'READ_BOOK', {'books_read': 1})
+        assert [n['achievement'] for n in result['notifications'] if n['type'] == 'achievement'] == ['Scholar']
+
+
+
+def test_grant_made_by_another_process_is_not_repeated(tmp_path, make_app, add_user, seed_achievements):
+    # Two apps on one database stand in for two workers with their own caches
+    uri = 'sqlite:///' + str(tmp_path / 'shared.db')
+    first, second = make_app(SQLALCHEMY_DATABASE_URI=uri), make_app(SQLALCHEMY_DATABASE_URI=uri)
+    with first.app_context():
+        seed_achievements()
+        user_id = add_user('twin', books_read=4).id
+
+    with second.app_context():
+        assert get_achievement_engine().earned_ids(user_id) == set()
+
+    with first.app_context():
+        result = run_activity(db.session.get(User, user_id), 'READ_BOOK', {'books_read': 1})
+        assert [n['achievement'] for n in result['notifications'] if n['type'] == 'achievement'] == ['Bookworm']
+
+    with second.app_context():
+        result = run_activity(db.session.get(User, user_id), 'READ_BOOK', {'books_read': 1})
+        assert [n for n in result['notifications'] if n['type'] == 'achievement'] == []
+        assert EarnedAchievement.query.filter_by(user_id=user_id).count() == 1
+        assert db.session.get(User, user_id).books_read == 6
+        bookworm = Achievement.query.filter_by(title='Bookworm').one().id
+        assert bookworm in get_achievement_engine().earned_ids(user_id)
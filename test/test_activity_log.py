@@ -0,0 +1,41 @@
+"""Activity events are logged with each change and replay to the user's totals."""
+from app.models import db, Quest, ActivityEvent, ActivitySnapshot
+from app.activity_log import replay, rollup
+from app.helpers import run_activity, complete_quests
+
+
+def current_totals(user):
+    return dict(user.player_stats, xp=user.xp)
+
+
+def test_replay_matches_user_row(app, add_user):
+    with app.app_context():
+        u = add_user('logger')
+        db.session.add_all([Quest(title=f'Q{n}', xp_reward=50, user_id=u.id) for n in range(2)])
+        db.session.commit()
+        quest_ids = [q.id for q in Quest.query.all()]
+
+        run_activity(u, 'READ_BOOK', {'books_read': 1})
+        run_activity(u, 'MEDITATION_DAILY', {'meditation_streak': 1})
+        complete_quests(u, quest_ids)
+
+        events = ActivityEvent.query.order_by(ActivityEvent.id).all()
+        assert [(e.activity_type, e.xp_delta, e.stat_deltas) for e in events] == [
+            ('READ_BOOK', 150, {'books_read': 1}),
+            ('MEDITATION_DAILY', 50, {'meditation_streak': 1}),
+            ('COMPLETE_QUEST', 100, {'quests_completed': 2}),
+        ]
+        totals, last_event_id = replay(u.id)
+        assert last_event_id == events[-1].id
+        assert totals == current_totals(u)
+
+        # Users below the threshold are left alone
+        assert rollup(min_events=4) == 0
+        assert rollup(min_events=3) == 1
+        snapshot = db.session.get(ActivitySnapshot, u.id)
+        assert (snapshot.last_event_id, snapshot.xp) == (events[-1].id, 300)
+
+        run_activity(u, 'COMPLETE_HABIT', {'habits_completed': 1})
+        totals, last_event_id = replay(u.id)
+        assert last_event_id == snapshot.last_event_id + 1
+        assert totals == current_totals(u)
@@ -0,0 +1,32 @@
+"""Activity pipeline: stats, XP and achievements land in a single commit."""
+from sqlalchemy import event
+
+from app.models import db, EarnedAchievement
+from app.helpers import run_activity
+
+
+def test_activity_commits_once(app, add_user, seed_achievements):
+    with app.app_context():
+        seed_achievements()
+        u = add_user('pipeline', quests_completed=1, books_read=4, xp=900)
+
+        commits = []
+        event.listen(db.session(), 'after_commit', lambda session: commits.append(1))
+
+        result = run_activity(u, 'READ_BOOK', {'books_read': 1})
+
+        assert len(commits) == 1
+        assert u.books_read == 5
+        assert u.level == 2
+        types = [n['type'] for n in result['notifications']]
+        assert types.count('levelup') == 1
+        # The user's first check also catches up on Beginner Hunter, met before it
+        assert sorted(n['achievement'] for n in result['notifications'] if n['type'] == 'achievement') == [
+            'Beginner Hunter', 'Bookworm']
+        assert EarnedAchievement.query.filter_by(user_id=u.id).count() == 2
+
+        # A second activity does not grant the same achievements again
+        result = run_activity(u, 'READ_BOOK', {'books_read': 1})
+        assert [n for n in result['notifications'] if n['type'] == 'achievement'] == []
+        assert EarnedAchievement.query.filter_by(user_id=u.id).count() == 2
+
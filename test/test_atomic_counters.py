@@ -0,0 +1,37 @@
+"""Stat and XP increments are single atomic UPDATE statements."""
+from sqlalchemy import text
+
+from app.models import db, User
+from app.counters import award_xp
+from app.helpers import apply_stat_updates
+from query_count import count_queries
+
+
+def test_increments_are_not_lost(tmp_path, make_app, add_user):
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'counters.db'))
+    with app.app_context():
+        u = add_user('racer')
+
+        # The instance is loaded, then another request bumps the same counter
+        user = db.session.get(User, u.id)
+        assert user.books_read == 0
+        with db.engine.begin() as conn:
+            conn.execute(text('UPDATE "user" SET books_read = books_read + 1, xp = xp + 100 WHERE id = :id'),
+                          {'id': user.id})
+
+        with count_queries(db.engine) as statements:
+            apply_stat_updates(user, {'books_read': 1, 'not_a_stat': 5})
+        assert len(statements) == 1 and statements[0].startswith('UPDATE user SET books_read=')
+        assert 'RETURNING' in statements[0]
+        assert user.books_read == 2
+
+        with count_queries(db.engine) as statements:
+            info = award_xp(user, 900, {'goals_achieved': 1})
+        assert [s.split(' SET')[0].split(' (')[0] for s in statements] == [
+            'UPDATE user', 'INSERT INTO xp_bucket', 'UPDATE user']
+        assert info == {'leveledUp': True, 'newLevel': 2, 'newRank': 'E-Rank Hunter'}
+        assert (user.xp, user.goals_achieved, user.level) == (1000, 1, 2)
+        db.session.commit()
+
+        row = db.session.execute(text('SELECT books_read, goals_achieved, xp, level FROM "user"')).one()
+        assert tuple(row) == (2, 1, 1000, 2)
@@ -0,0 +1,80 @@
+"""Batch quest completion via POST /pd/tasks/complete."""
+from app.helpers import complete_quests
+from app.models import db, User, Quest
+
+
+def test_batch_completion(app, client, add_user, seed_achievements, login):
+    with app.app_context():
+        seed_achievements()
+        u = add_user('batcher')
+        other = add_user('other')
+
+        mine = [Quest(title=f'Quest {n}', xp_reward=400, quest_type='daily', user_id=u.id) for n in range(3)]
+        done = Quest(title='Done', xp_reward=400, quest_type='daily', user_id=u.id, completed=True)
+        theirs = Quest(title='Theirs', xp_reward=400, quest_type='daily', user_id=other.id)
+        db.session.add_all(mine + [done, theirs])
+        db.session.commit()
+        ids = [q.id for q in mine]
+
+        login(client, 'batcher')
+
+        resp = client.post('/pd/tasks/complete', json={'ids': ids + [done.id, theirs.id, 9999]})
+        data = resp.get_json()
+        assert resp.status_code == 200
+        assert data['completed'] == ids
+        assert data['xp_gained'] == 1200
+        assert {s['id']: s['reason'] for s in data['skipped']} == {
+            done.id: 'already_completed', theirs.id: 'not_found', 9999: 'not_found'}
+        assert [n['type'] for n in data['notifications']] == ['levelup', 'achievement']
+        assert data['progress']['progress']['quests_completed'] == 3
+
+        assert db.session.get(Quest, theirs.id).completed is False
+        assert db.session.get(User, u.id).xp == 1200
+
+        assert client.post('/pd/tasks/complete', json={'ids': []}).status_code == 400
+        assert client.post('/pd/tasks/complete', json={'ids': ['x']}).status_code == 400
+
+
+
+def test_completion_claims_quests_in_sql(app, add_user):
+    with app.app_context():
+        u = add_user('racer')
+        quests = [Quest(title=f'Quest {n}', xp_reward=100, quest_type='daily', user_id=u.id) for n in range(3)]
+        db.session.add_all(quests)
+        db.session.commit()
+        ids = [q.id for q in quests]
+        assert not any(q.completed for q in quests)  # loaded as open
+
+        # Another request completes one quest and the expiry sweep fails another
+        with db.engine.begin() as conn:
+            conn.execute(db.text('UPDATE quest SET completed = 1 WHERE id = :id'), {'id': ids[0]})
+            conn.execute(db.text("UPDATE quest SET failed_at = '2026-10-18 00:00:00' WHERE id = :id"), {'id': ids[1]})
+
+        result = complete_quests(u, ids)
+        assert result['completed'] == [ids[2]] and result['xp_gained'] == 100
+        assert {s['id']: s['reason'] for s in result['skipped']} == {
+            ids[0]: 'already_completed', ids[1]: 'expired'}
+        assert complete_quests(u, [ids[2]])['skipped'] == [{'id': ids[2], 'reason': 'already_completed'}]
+        assert (db.session.get(User, u.id).xp, db.session.get(User, u.id).quests_completed) == (100, 1)
+
+
+def test_single_task_route_checks_ownership(app, auth_client, add_user, user_id):
+    client = auth_client
+    with app.app_context():
+        other_id = add_user('other').id
+        mine = Quest(title='Mine', xp_reward=1000, quest_type='daily', user_id=user_id)
+        theirs = Quest(title='Theirs', xp_reward=1000, quest_type='daily', user_id=other_id)
+        db.session.add_all([mine, theirs])
+        db.session.commit()
+        mine_id, theirs_id = mine.id, theirs.id
+
+    assert client.post(f'/pd/tasks/{theirs_id}/complete').status_code == 404
+    data = client.post(f'/pd/tasks/{mine_id}/complete').get_json()
+    assert (data['xp_gained'], data['new_total_xp'], data['level']) == (1000, 1000, 2)
+    assert [n['type'] for n in data['notifications']] == ['levelup']
+    assert client.post(f'/pd/tasks/{mine_id}/complete').get_json()['message'] == 'Task already completed!'
+
+    with app.app_context():
+        assert db.session.get(Quest, theirs_id).completed is False
+        assert db.session.get(User, other_id).xp == 0
+        assert db.session.get(User, user_id).quests_completed == 1
@@ -0,0 +1,43 @@
+"""Daily reports are kept up to date as activities happen and read by range."""
+from datetime import datetime, timedelta
+
+from app.jobs import get_job_queue
+from app.models import db, User, Quest, DailyReport
+from query_count import count_queries
+
+
+def test_report_counters_and_range(app, auth_client, user_id):
+    client = auth_client
+    with app.app_context():
+        db.session.add(Quest(title='Q', xp_reward=50, user_id=user_id))
+        db.session.commit()
+        quest_id = Quest.query.one().id
+        engine = db.engine
+
+    client.post('/complete-task', json={'id': quest_id})
+    client.post('/complete-habit')
+    client.post('/complete-habit')
+
+    form = {'the_win': 'Shipped', 'the_lesson': 'Rest', 'the_plan': 'More'}
+    assert client.post('/daily-report', data=form).status_code == 302
+    client.post('/daily-report', data=form)  # second submission earns nothing
+
+    # The activity routes queue their report updates
+    with app.app_context():
+        assert get_job_queue().run_pending() > 0
+
+    today = datetime.utcnow().date()
+    with count_queries(engine) as statements:
+        resp = client.get(f'/api/daily-report?start={today - timedelta(days=364)}&end={today}')
+    days = resp.get_json()['days']
+    assert len(days) == 365
+    assert days[-1] == {'day': today.isoformat(), 'xp_gained': 50 + 30 + 30 + 50,
+                        'quests_completed': 1, 'habits_tracked': 2, 'activities': 4, 'submitted': True}
+    assert all(day['activities'] == 0 for day in days[:-1])
+    assert len([s for s in statements if 'FROM daily_report' in s]) == 1
+
+    with app.app_context():
+        assert DailyReport.query.count() == 1
+        assert db.session.get(User, user_id).xp == 160
+
+    assert client.get('/api/daily-report?start=2026-01-02&end=2026-01-01').status_code == 400
@@ -0,0 +1,34 @@
+"""Dashboard and player status pages run a bounded number of queries."""
+from app.models import db, Quest, Achievement, EarnedAchievement
+from app.queries import user_activity_counts
+from query_count import assert_max_queries
+
+
+def test_pages_use_bounded_queries(app, client, add_user, login):
+    with app.app_context():
+        u = add_user('busy')
+
+        for n in range(30):
+            db.session.add(Quest(title=f'Quest {n}', quest_type='daily', xp_reward=50,
+                                 completed=n % 3 == 0, user_id=u.id))
+        for n in range(4):
+            ach = Achievement(title=f'Ach {n}')
+            db.session.add(ach)
+            db.session.flush()
+            db.session.add(EarnedAchievement(user_id=u.id, achievement_id=ach.id))
+        db.session.commit()
+
+        assert user_activity_counts(u.id) == {'total_quests': 30, 'active_quests': 20, 'achievements_count': 4}
+
+        login(client, 'busy')
+
+        # User load + one aggregate query
+        with assert_max_queries(db.engine, 2):
+            resp = client.get('/player_info')
+        assert resp.status_code == 200
+
+        # User load + active quests
+        with assert_max_queries(db.engine, 2):
+            resp = client.get('/dashboard')
+        assert resp.status_code == 200
+        assert resp.get_data(as_text=True).count('data-activity-id=') == 5
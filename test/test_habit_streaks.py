@@ -0,0 +1,70 @@
+"""Habit streaks follow their period and owner's time zone; lapsed ones roll over in bulk."""
+from datetime import date, datetime
+
+from app.models import db, Habit
+from app import streaks
+from query_count import count_queries
+
+
+def test_period_index_boundaries():
+    # Sunday and the following Monday are in different ISO weeks
+    assert streaks.period_index(date(2026, 10, 19), 'weekly') == streaks.period_index(date(2026, 10, 18), 'weekly') + 1
+    assert streaks.period_index(date(2026, 10, 25), 'weekly') == streaks.period_index(date(2026, 10, 19), 'weekly')
+    assert streaks.period_index(date(2027, 1, 1), 'monthly') == streaks.period_index(date(2026, 12, 31), 'monthly') + 1
+    assert streaks.period_index(date(2026, 3, 1), 'daily') == streaks.period_index(date(2026, 2, 28), 'daily') + 1
+
+
+def test_track_uses_period_and_time_zone():
+    tokyo = streaks.get_zone('Asia/Tokyo')
+    habit = Habit(title='Read', frequency='daily', current_streak=0, best_streak=0)
+
+    # 20:00 UTC on the 18th is already the 19th in Tokyo
+    assert streaks.track(habit, tokyo, datetime(2026, 10, 18, 10)) is True
+    assert streaks.track(habit, tokyo, datetime(2026, 10, 18, 20)) is True
+    assert streaks.track(habit, tokyo, datetime(2026, 10, 18, 22)) is False
+    assert (habit.current_streak, habit.best_streak) == (2, 2)
+
+    weekly = Habit(title='Run', frequency='weekly', current_streak=0, best_streak=0)
+    utc = streaks.get_zone('UTC')
+    assert streaks.track(weekly, utc, datetime(2026, 10, 12, 9))
+    assert not streaks.track(weekly, utc, datetime(2026, 10, 18, 9))
+    assert streaks.track(weekly, utc, datetime(2026, 10, 24, 9))
+    assert streaks.track(weekly, utc, datetime(2026, 11, 9, 9))  # skipped a week
+    assert (weekly.current_streak, weekly.best_streak) == (1, 2)
+
+
+def test_track_route_checks_ownership_and_rollover_is_set_based(app, client, add_user, login):
+    with app.app_context():
+        owner = add_user('owner', timezone='America/New_York')
+        other = add_user('other')
+        theirs = Habit(title='Theirs', frequency='daily', user_id=other.id)
+        mine = Habit(title='Mine', frequency='weekly', user_id=owner.id)
+        db.session.add_all([theirs, mine])
+        db.session.commit()
+        theirs_id, mine_id = theirs.id, mine.id
+
+    login(client, 'owner')
+    assert client.post('/pd/habits/track', json={'habit_id': theirs_id}).status_code == 404
+    resp = client.post('/pd/habits/track', json={'habit_id': mine_id}).get_json()
+    assert (resp['tracked'], resp['current_streak']) == (True, 1)
+    resp = client.post('/pd/habits/track', json={'habit_id': mine_id}).get_json()
+    assert (resp['tracked'], resp['message']) == (False, 'Already tracked this week.')
+
+    with app.app_context():
+        now = datetime.utcnow()
+        ny = streaks.get_zone('America/New_York')
+        db.session.add_all([
+            Habit(title=f'Lapsed {n}', frequency='daily', user_id=1, current_streak=3,
+                  last_period=streaks.current_period('daily', ny, now) - 2)
+            for n in range(50)
+        ])
+        db.session.add(Habit(title='Fresh', frequency='daily', user_id=1, current_streak=3,
+                             last_period=streaks.current_period('daily', ny, now) - 1))
+        db.session.commit()
+
+        with count_queries(db.engine) as statements:
+            assert streaks.rollover(now) == 50
+        # One UPDATE per frequency for each of the two time zones
+        assert len([s for s in statements if s.startswith('UPDATE habit')]) == 6
+        assert Habit.query.filter_by(title='Fresh').one().current_streak == 3
+        assert db.session.get(Habit, mine_id).current_streak == 1
@@ -0,0 +1,14 @@
+"""The recorded app workload runs without full table scans."""
+from app.models import db
+from scripts.index_advisor import record_workload, find_full_scans
+
+
+def test_no_full_scans(tmp_path, make_app):
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'advisor.db'))
+
+    records = record_workload(app)
+    with app.app_context():
+        findings = find_full_scans(db.engine, records)
+
+    assert records
+    assert findings == []
@@ -0,0 +1,99 @@
+"""Deferred activity work goes through the durable job queue."""
+import json
+import time
+
+import pytest
+
+from app.jobs import enqueue, get_job_queue, job
+from app.models import db, EarnedAchievement, DailyReport, Job
+
+calls = []
+
+
+@job('test_flaky')
+def flaky_job(payload):
+    calls.append(payload['n'])
+    if payload['n'] == 0:
+        raise RuntimeError('boom')
+
+
+@pytest.fixture
+def make_queue_app(tmp_path, make_app, add_user, seed_achievements):
+    """Apps on a file database (the worker threads need their own connections)."""
+    def factory(**config):
+        app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'jobs.db'), **config)
+        with app.app_context():
+            seed_achievements()
+            add_user('queued', books_read=4)
+        return app
+    return factory
+
+
+def test_activity_work_is_queued_then_run(make_queue_app, login):
+    app = make_queue_app(JOB_METRICS_ENDPOINT=True)
+    client = app.test_client()
+    login(client, 'queued')
+
+    resp = client.post('/complete-book')
+    assert resp.get_json()['notifications'] == []
+
+    metrics = client.get('/api/jobs/metrics').get_json()
+    assert metrics['depth'] == 2 and metrics['lag_seconds'] >= 0
+    with app.app_context():
+        assert EarnedAchievement.query.count() == 0
+        assert get_job_queue().run_pending() == 2  # achievements, then the report
+        assert [a.achievement.title for a in EarnedAchievement.query.all()] == ['Bookworm']
+        assert DailyReport.query.one().xp_gained == 150
+        assert Job.query.count() == 0
+
+    metrics = client.get('/api/jobs/metrics').get_json()
+    assert (metrics['depth'], metrics['processed'], metrics['lag_seconds']) == (0, 2, 0.0)
+
+
+def test_job_metrics_are_not_served_by_default(make_queue_app, login):
+    app = make_queue_app()
+    client = app.test_client()
+    login(client, 'queued')
+    client.post('/complete-book')
+
+    assert client.get('/api/jobs/metrics').status_code == 404
+    result = app.test_cli_runner().invoke(args=['main', 'job-metrics'])
+    assert result.exit_code == 0 and json.loads(result.output)['depth'] == 2
+
+
+def test_failed_jobs_are_retried(make_queue_app):
+    app = make_queue_app(JOB_QUEUE_RETRY_DELAY=0)
+    with app.app_context():
+        enqueue('test_flaky', {'n': 0})
+        enqueue('test_flaky', {'n': 1})
+        db.session.commit()
+
+        queue = get_job_queue()
+        queue.max_attempts = 2
+        del calls[:]
+        # With no backoff the retry runs in the same drain
+        assert queue.run_pending() == 3
+        assert calls == [0, 1, 0]
+        failed = Job.query.one()
+        assert (failed.status, failed.attempts, failed.last_error) == ('failed', 2, 'RuntimeError: boom')
+        assert queue.metrics()['failed'] == 1
+
+
+def test_worker_threads_drain_the_queue(make_queue_app, login):
+    app = make_queue_app()
+    queue = app.extensions['job_queue']
+    queue.workers = 2
+    queue.poll_interval = 0.05
+    queue.start()
+    try:
+        client = app.test_client()
+        login(client, 'queued')
+        client.post('/complete-habit')
+        deadline = time.monotonic() + 5
+        with app.app_context():
+            while Job.query.count() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert Job.query.count() == 0
+            assert DailyReport.query.one().habits_tracked == 1
+    finally:
+        queue.stop()
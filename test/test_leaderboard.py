@@ -0,0 +1,82 @@
+"""Leaderboards are rebuilt from the database and kept current by XP awards."""
+from datetime import datetime, timedelta
+
+from app import xp_windows
+from app.counters import award_xp
+from app.leaderboard import RankedScores, get_leaderboard
+from app.models import db, User
+
+
+def test_ranked_scores_positions_and_neighbours():
+    scores = RankedScores({1: 50, 2: 80, 3: 50, 4: 10})
+    assert scores.top(2) == [(0, 2, 80), (1, 1, 50)]
+    assert scores.position(3) == 2  # ties go to the lower id
+
+    scores.add(4, 100)
+    assert scores.position(4) == 0
+    assert scores.around(1, 1) == [(1, 2, 80), (2, 1, 50), (3, 3, 50)]
+    scores.remove(2)
+    assert scores.position(2) is None and scores.around(2, 1) == []
+    assert len(scores) == 3
+
+
+def test_boards_follow_committed_awards(app):
+    with app.app_context():
+        users = [User(username=f'hunter{i}', email=f'hunter{i}@example.com', password_hash='x', xp=xp, level=level)
+                 for i, (xp, level) in enumerate([(900, 1), (2600, 3), (300, 1)])]
+        db.session.add_all(users)
+        db.session.flush()
+        # Only XP earned since Monday counts for the weekly board
+        xp_windows.bump(users[2].id, 200)
+        xp_windows.bump(users[1].id, 500, now=datetime.utcnow() - timedelta(days=8))
+        db.session.commit()
+        ids = [u.id for u in users]
+
+        leaderboard = get_leaderboard()
+        leaderboard.rebuild()
+        assert [entry[1] for entry in leaderboard.top('global', 10)[1]] == [ids[1], ids[0], ids[2]]
+        assert leaderboard.top('weekly', 10) == (1, [(0, ids[2], 200)])
+        assert leaderboard.top('tier', 10, 'D-Rank Hunter') == (1, [(0, ids[1], 2600)])
+
+        # Rolled-back awards never reach the boards
+        award_xp(users[2], 5000)
+        db.session.rollback()
+        assert leaderboard.around(ids[2], 'global', 0) == (3, 2, [(2, ids[2], 300)])
+
+        # Reaching level 3 moves the user to the D-Rank tier
+        user = db.session.get(User, ids[0])
+        award_xp(user, 1700)
+        db.session.commit()
+        assert leaderboard.top('global', 1)[1] == [(0, ids[0], 2600)]
+        assert [entry[1] for entry in leaderboard.top('tier', 10, 'D-Rank Hunter')[1]] == [ids[0], ids[1]]
+        assert leaderboard.top('tier', 10, 'E-Rank Hunter') == (1, [(0, ids[2], 300)])
+        assert leaderboard.around(ids[0], 'weekly', 1) == (2, 0, [(0, ids[0], 1700), (1, ids[2], 200)])
+
+
+def test_leaderboard_endpoints(app, client, add_user, login):
+    with app.app_context():
+        for i in range(6):
+            add_user(f'hunter{i}', xp=i * 100)
+
+    login(client, 'hunter2')
+
+    top = client.get('/api/leaderboard?limit=2').get_json()
+    assert top['size'] == 6
+    assert [(e['position'], e['username'], e['xp']) for e in top['entries']] == [
+        (1, 'hunter5', 500), (2, 'hunter4', 400)]
+
+    me = client.get('/api/leaderboard/me?k=1').get_json()
+    assert me['position'] == 4
+    assert [e['username'] for e in me['entries']] == ['hunter3', 'hunter2', 'hunter1']
+
+    tier = client.get('/api/leaderboard/me?board=tier&k=0').get_json()
+    assert tier['tier'] == 'E-Rank Hunter' and tier['position'] == 4
+
+    # Nothing earned this week yet, then a completed habit puts the user on the board
+    assert client.get('/api/leaderboard/me?board=weekly').get_json()['position'] is None
+    client.post('/complete-habit')
+    weekly = client.get('/api/leaderboard?board=weekly').get_json()
+    assert [(e['username'], e['xp']) for e in weekly['entries']] == [('hunter2', 30)]
+
+    assert client.get('/api/leaderboard?board=monthly').status_code == 400
+    assert client.get('/api/leaderboard?board=tier&tier=Z-Rank').status_code == 400
@@ -0,0 +1,117 @@
+"""Activity notifications are pushed over SSE through bounded per-stream buffers."""
+import json
+
+from app.jobs import get_job_queue
+from app.notifications import NotificationBroker
+
+
+def read_event(chunks):
+    for chunk in chunks:
+        text = chunk.decode()
+        if text.startswith('event: '):
+            lines = text.strip().split('\n')
+            return lines[0][len('event: '):], json.loads(lines[1][len('data: '):])
+
+
+def test_stream_pushes_progress_and_responses_carry_level_ups(make_app, add_user, login):
+    app = make_app(SSE_ENABLED=True, SSE_HEARTBEAT_SECONDS=0.05)
+    with app.app_context():
+        add_user('listener', xp=980)
+
+    client = app.test_client()
+    login(client, 'listener')
+    resp = client.get('/api/notifications/stream', buffered=False)
+    assert resp.mimetype == 'text/event-stream'
+    chunks = iter(resp.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    assert next(chunks) == b': keepalive\n\n'
+
+    # Other workers' streams never see the level-up, so only the response carries it
+    assert client.post('/complete-habit').get_json()['notifications'] == [{
+        'type': 'levelup', 'message': 'Advanced to Level 2!', 'details': {'level': 2, 'rank': 'E-Rank Hunter'}}]
+    event, progress = read_event(chunks)
+    assert event == 'progress' and progress['xp'] == 1010
+
+    broker = app.extensions['notification_broker']
+    assert broker.subscriber_count() == 1
+    resp.close()
+    assert broker.subscriber_count() == 0
+
+
+def test_deferred_jobs_do_not_repeat_the_level_up(make_app, add_user, login):
+    app = make_app()
+    with app.app_context():
+        user_id = add_user('listener', xp=980).id
+    client = app.test_client()
+    login(client, 'listener')
+    subscription = app.extensions['notification_broker'].subscribe(user_id)
+
+    assert [n['type'] for n in client.post('/complete-habit').get_json()['notifications']] == ['levelup']
+    with app.app_context():
+        get_job_queue().run_pending()
+    messages, _ = subscription.get(timeout=0)
+    assert [event for event, _ in messages] == ['progress']
+
+
+def test_deferred_achievements_reach_streams_in_other_processes(tmp_path, make_app, add_user, login,
+                                                                seed_achievements):
+    uri = 'sqlite:///' + str(tmp_path / 'shared.db')
+    worker = make_app(SQLALCHEMY_DATABASE_URI=uri)
+    web = make_app(SQLALCHEMY_DATABASE_URI=uri, SSE_ENABLED=True, SSE_HEARTBEAT_SECONDS=0.05)
+    with worker.app_context():
+        seed_achievements()
+        add_user('listener', books_read=4)
+
+    client = web.test_client()
+    login(client, 'listener')
+    resp = client.get('/api/notifications/stream', buffered=False)
+    chunks = iter(resp.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    assert client.get('/api/notifications').get_json() == {'notifications': [], 'last_id': 0}
+
+    worker_client = worker.test_client()
+    login(worker_client, 'listener')
+    worker_client.post('/complete-book')
+    with worker.app_context():
+        get_job_queue().run_pending()
+
+    # Sent by the web process although the job ran in the worker, with the row id as event id
+    while not (chunk := next(chunks)).startswith(b'id: '):
+        pass
+    lines = chunk.decode().strip().split('\n')
+    assert lines[:2] == ['id: 1', 'event: achievement']
+    assert json.loads(lines[2][len('data: '):])['achievement'] == 'Bookworm'
+    resp.close()
+
+    polled = client.get('/api/notifications?after=0').get_json()
+    assert [n['achievement'] for n in polled['notifications']] == ['Bookworm'] and polled['last_id'] == 1
+    assert client.get('/api/notifications?after=1').get_json() == {'notifications': [], 'last_id': 1}
+
+    assert web.test_cli_runner().invoke(args=['main', 'prune-notifications']).output == 'Pruned 0 notifications.\n'
+    assert web.test_cli_runner().invoke(args=['main', 'prune-notifications', '--days', '-1']).output == \
+        'Pruned 1 notifications.\n'
+
+
+def test_pages_poll_unless_the_stream_is_enabled(make_app, add_user, login):
+    for enabled in (False, True):
+        app = make_app(SSE_ENABLED=enabled)
+        with app.app_context():
+            add_user('listener')
+        client = app.test_client()
+        login(client, 'listener')
+
+        assert (client.get('/api/notifications/stream').status_code == 404) is not enabled
+        assert ('new EventSource' in client.get('/').get_data(as_text=True)) is enabled
+
+
+def test_slow_subscriber_buffer_is_bounded():
+    broker = NotificationBroker(buffer_size=3, max_streams_per_user=1)
+    subscription = broker.subscribe(7)
+    assert broker.subscribe(7) is None
+
+    for n in range(5):
+        broker.publish(7, 'progress', {'n': n})
+    messages, dropped = subscription.get(timeout=0)
+    assert [data['n'] for _, data in messages] == [2, 3, 4]
+    assert dropped == 2
+    assert subscription.get(timeout=0) == ([], 0)
@@ -0,0 +1,54 @@
+"""Progress snapshot cache behind /api/progress with ETag revalidation."""
+import sqlite3
+
+from app.models import db
+from app.progress_cache import SqliteBackend
+from query_count import count_queries
+
+
+def run_polls(app, add_user, login):
+    with app.app_context():
+        add_user('poller')
+
+        client = app.test_client()
+        login(client, 'poller')
+
+        first = client.get('/api/progress')
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and first.get_json()['xp'] == 0
+
+        with count_queries(db.engine) as statements:
+            unchanged = client.get('/api/progress', headers={'If-None-Match': etag})
+        assert unchanged.status_code == 304
+        assert not [s for s in statements if 'earned_achievement' in s]
+
+        # An activity refreshes the snapshot, so the old ETag no longer matches
+        client.post('/complete-book')
+        changed = client.get('/api/progress', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.get_json()['progress']['books_read'] == 1
+        assert changed.headers['ETag'] != etag
+
+
+def test_memory_backend(app, add_user, login):
+    run_polls(app, add_user, login)
+
+
+def test_sqlite_backend(tmp_path, make_app, add_user, login):
+    app = make_app(PROGRESS_CACHE_BACKEND='sqlite', PROGRESS_CACHE_PATH=str(tmp_path / 'progress.sqlite'))
+    run_polls(app, add_user, login)
+
+
+def test_sqlite_backend_shares_invalidations(tmp_path):
+    path = str(tmp_path / 'progress.sqlite')
+    worker_a, worker_b = SqliteBackend(path), SqliteBackend(path)
+    worker_a.set(1, {'etag': 'old'}, 60)
+    assert worker_b.get(1) == {'etag': 'old'}
+
+    worker_b.delete(1)
+    assert worker_a.get(1) is None
+
+    # A record that doesn't decode is a miss, not an error
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO progress_cache VALUES ('2', 1e12, '{\"etag\":')")
+    assert worker_a.get(2) is None
@@ -0,0 +1,56 @@
+"""Progression table: bisect level/rank lookup agrees with the original curve."""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.counters import award_xp
+from app.models import User
+from app.progression import (
+    BASE_LEVEL_THRESHOLDS, HUNTER_RANKS, LEVEL_THRESHOLDS, MAX_LEVEL,
+    level_for_xp, level_progress, rank_for_level,
+)
+from app.pd_routes import calculate_level
+
+
+def linear_level(xp):
+    level = 1
+    for idx, threshold in enumerate(BASE_LEVEL_THRESHOLDS):
+        if xp >= threshold:
+            level = idx + 1
+    return level
+
+
+def test_level_table_matches_base_curve():
+    assert LEVEL_THRESHOLDS[:10] == BASE_LEVEL_THRESHOLDS
+    assert len(LEVEL_THRESHOLDS) == MAX_LEVEL
+    assert all(a < b for a, b in zip(LEVEL_THRESHOLDS, LEVEL_THRESHOLDS[1:]))
+
+    for xp in (0, 1, 999, 1000, 2499, 2500, 29999, 30000, 38000):
+        assert level_for_xp(xp) == linear_level(xp)
+    assert calculate_level(1000) == level_for_xp(1000)
+    assert level_for_xp(LEVEL_THRESHOLDS[-1] * 2) == MAX_LEVEL
+
+
+def test_rank_lookup():
+    for level in range(1, 40):
+        expected = [rank for req, rank in sorted(HUNTER_RANKS.items()) if level >= req][-1]
+        assert rank_for_level(level) == expected
+
+
+def test_award_xp_levels_and_progress():
+    u = User(username='climber', email='climber@example.com', level=1, xp=0, rank='E-Rank Hunter')
+    info = award_xp(u, 5000)
+    assert info == {'leveledUp': True, 'newLevel': 4, 'newRank': 'D-Rank Hunter'}
+
+    info = award_xp(u, 10)
+    assert info['leveledUp'] is False and info['newRank'] is None
+
+    assert level_progress(u.xp, u.level) == ((5010 - 5000) / 3000 * 100, 8000 - 5010)
+    assert level_progress(0, MAX_LEVEL) == (100.0, 0)
+
+
+if __name__ == '__main__':
+    test_level_table_matches_base_curve()
+    test_rank_lookup()
+    test_award_xp_levels_and_progress()
+    print('PROGRESSION: PASS')
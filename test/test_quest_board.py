@@ -0,0 +1,56 @@
+"""Quest board: one query per page, completion window and keyset pagination."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.models import db, Quest
+from app.queries import _quest_board_ids, quest_board
+from query_count import assert_max_queries
+
+
+def test_quest_board_window_and_pages(app, client, add_user, login):
+    with app.app_context():
+        u = add_user('veteran')
+
+        now = datetime.utcnow()
+        types = ('daily', 'weekly', 'achievement')
+        for n in range(9):
+            db.session.add(Quest(title=f'Open {n}', quest_type=types[n % 3], user_id=u.id))
+        db.session.add(Quest(title='Recent', quest_type='daily', user_id=u.id,
+                             completed=True, completed_at=now - timedelta(days=1)))
+        db.session.add(Quest(title='Ancient', quest_type='daily', user_id=u.id,
+                             completed=True, completed_at=now - timedelta(days=400)))
+        db.session.add(Quest(title='Legacy', quest_type='weekly', user_id=u.id, completed=True))
+        db.session.commit()
+
+        user_id = u.id
+        with assert_max_queries(db.engine, 1):
+            board, cursor = quest_board(user_id, completed_within_days=7, limit=4)
+        assert cursor is not None
+        assert sum(len(quests) for quests in board.values()) == 4
+
+        titles = [q.title for quests in board.values() for q in quests]
+        while cursor is not None:
+            board, cursor = quest_board(u.id, completed_within_days=7, after_id=cursor, limit=4)
+            titles += [q.title for quests in board.values() for q in quests]
+
+        assert sorted(titles) == sorted([f'Open {n}' for n in range(9)] + ['Recent'])
+
+        board, _ = quest_board(u.id, completed_within_days=1000)
+        assert 'Ancient' in [q.title for q in board['daily']]
+
+        # Each branch is an index range: history outside the window is never read
+        ids = _quest_board_ids(user_id, now - timedelta(days=7), 5, 4)
+        sql = select(ids.c.id).compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+        searches = [step for step in plan if step.startswith(('SEARCH', 'SCAN quest'))]
+        assert searches == [
+            'SEARCH quest USING INDEX ix_quest_user_open (user_id=? AND id>?)',
+            'SEARCH quest USING COVERING INDEX ix_quest_user_completed_at (user_id=? AND completed_at>?)',
+            'SEARCH quest USING COVERING INDEX ix_quest_user_failed_at (user_id=? AND failed_at>?)',
+        ]
+
+        login(client, 'veteran')
+        resp = client.get('/pd/tasks?limit=5')
+        assert resp.status_code == 200
+        assert 'Load more quests' in resp.get_data(as_text=True)
@@ -0,0 +1,83 @@
+"""Overdue quests are expired in bounded batches from the due-date index."""
+from datetime import datetime, timedelta
+
+from app.expiry import due_quests, sweep
+from app.models import db, User, Quest, RecurringQuest, ActivityEvent
+from query_count import count_queries
+
+
+def test_sweep_expires_overdue_quests_in_batches(app):
+    now = datetime(2026, 10, 18, 12)
+    with app.app_context():
+        rich = User(username='rich', email='rich@example.com', password_hash='x', xp=1200, level=2)
+        poor = User(username='poor', email='poor@example.com', password_hash='x', xp=30)
+        db.session.add_all([rich, poor])
+        db.session.flush()
+        for i in range(5):
+            db.session.add(Quest(title=f'Late {i}', xp_reward=100, quest_type='daily', user_id=rich.id,
+                                 deadline=now - timedelta(days=1, hours=i + 1)))
+        db.session.add_all([
+            Quest(title='Late', xp_reward=100, quest_type='daily', user_id=poor.id, deadline=now - timedelta(days=1)),
+            Quest(title='Done', xp_reward=100, quest_type='daily', user_id=poor.id, completed=True,
+                  deadline=now - timedelta(days=1)),
+            Quest(title='Upcoming', xp_reward=100, quest_type='weekly', user_id=poor.id, deadline=now + timedelta(days=1)),
+            Quest(title='Open-ended', xp_reward=100, quest_type='achievement', user_id=poor.id),
+        ])
+        db.session.commit()
+        rich_id, poor_id = rich.id, poor.id
+
+        # A range scan of the due-date index that stops at now, with no sort
+        due = due_quests(now, 2).compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = ' '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {due}')))
+        assert 'USING INDEX ix_quest_completed_deadline (completed=? AND deadline<?)' in plan
+        assert 'TEMP B-TREE' not in plan
+
+        with count_queries(db.engine) as statements:
+            summary = sweep(now=now, batch_size=2, penalty=0.5)
+        assert summary == {'expired': 6, 'penalty_xp': 250 + 30, 'batches': 3}
+        assert sum(s.startswith('UPDATE quest SET failed_at') for s in statements) == 4
+
+        failed = {q.title for q in Quest.query.filter(Quest.failed_at.isnot(None))}
+        assert failed == {f'Late {i}' for i in range(5)} | {'Late'}
+        # Penalties never push XP below zero or take levels away
+        assert (db.session.get(User, rich_id).xp, db.session.get(User, rich_id).level) == (950, 2)
+        assert db.session.get(User, poor_id).xp == 0
+        assert ActivityEvent.query.filter_by(activity_type='QUEST_EXPIRED').count() == 4
+
+        # Expired quests have left the queue: nothing to do on the next run
+        assert sweep(now=now, penalty=0.5) == {'expired': 0, 'penalty_xp': 0, 'batches': 0}
+
+
+def test_one_off_quests_fail_after_their_due_day(app, user_id):
+    with app.app_context():
+        template = RecurringQuest(user_id=user_id, title='Daily', quest_type='daily', xp_reward=10)
+        db.session.add(template)
+        db.session.flush()
+        db.session.add_all([
+            Quest(title='Due today', xp_reward=10, quest_type='daily', user_id=user_id,
+                  deadline=datetime(2026, 10, 18)),
+            # Recurring instances end at the exact end of their period
+            Quest(title='Daily', xp_reward=10, quest_type='daily', user_id=user_id,
+                  deadline=datetime(2026, 10, 18, 12), recurring_quest_id=template.id, period=1),
+        ])
+        db.session.commit()
+
+        assert sweep(now=datetime(2026, 10, 18, 12))['expired'] == 1
+        assert sweep(now=datetime(2026, 10, 18, 23, 59))['expired'] == 0
+        assert sweep(now=datetime(2026, 10, 19))['expired'] == 1
+        assert Quest.query.filter_by(title='Due today').one().failed_at == datetime(2026, 10, 19)
+
+
+def test_expired_quests_cannot_be_completed(app, auth_client, user_id):
+    client = auth_client
+    with app.app_context():
+        quest = Quest(title='Too late', xp_reward=50, quest_type='daily', user_id=user_id,
+                      deadline=datetime.utcnow() - timedelta(days=1, minutes=1))
+        db.session.add(quest)
+        db.session.commit()
+        quest_id = quest.id
+        assert sweep()['expired'] == 1
+
+    resp = client.post('/complete-task', json={'id': quest_id})
+    assert resp.status_code == 400 and resp.get_json()['message'] == 'Quest expired'
+    assert 'Expired' in client.get('/pd/tasks').get_data(as_text=True)
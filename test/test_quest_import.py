@@ -0,0 +1,43 @@
+"""Bulk quest import from JSON Lines (endpoint and CLI)."""
+import json
+
+from app.models import Quest
+
+
+def test_import_endpoint_reports_bad_lines(app, client, add_user, login):
+    with app.app_context():
+        u = add_user('importer')
+
+        lines = [json.dumps({'title': f'Pack quest {n}', 'difficulty': 'c', 'quest_type': 'daily'})
+                 for n in range(7)]
+        lines.insert(2, '{not json')
+        lines.insert(4, json.dumps({'title': 'Bad', 'difficulty': 'Z', 'quest_type': 'daily'}))
+        lines.append(json.dumps({'title': 'Due', 'difficulty': 'S', 'quest_type': 'weekly', 'deadline': '2026-01-31',
+                                 'description': '  ' + 'x' * 5000}))
+        # Non-string descriptions are rejected per line rather than failing the whole chunk
+        lines.append(json.dumps({'title': 'Nested', 'difficulty': 'E', 'quest_type': 'daily', 'description': {'a': 1}}))
+        lines.append(json.dumps({'title': 'Listed', 'difficulty': 'E', 'quest_type': 'daily', 'description': ['a']}))
+        body = '\n'.join(lines) + '\n'
+
+        login(client, 'importer')
+        data = client.post('/pd/tasks/import', data=body, content_type='application/x-ndjson').get_json()
+
+        assert data['created'] == 8
+        assert [e['line'] for e in data['errors']] == [3, 5, 11, 12]
+        assert data['errors'][2]['error'] == 'Invalid description: expected a string'
+        assert Quest.query.filter_by(user_id=u.id, difficulty='C', xp_reward=200).count() == 7
+        due = Quest.query.filter_by(title='Due').one()
+        assert due.xp_reward == 1000 and due.description == 'x' * 2000
+
+
+def test_import_cli(tmp_path, app, add_user):
+    with app.app_context():
+        u = add_user('cli')
+
+        pack = tmp_path / 'pack.jsonl'
+        pack.write_text('\n'.join(
+            json.dumps({'title': f'CLI quest {n}', 'difficulty': 'E', 'quest_type': 'weekly'}) for n in range(3)))
+
+        result = app.test_cli_runner().invoke(args=['main', 'import-quests', str(pack), '--user', 'cli'])
+        assert 'Imported 3 quests' in result.output
+        assert Quest.query.filter_by(user_id=u.id).count() == 3
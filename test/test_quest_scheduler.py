@@ -0,0 +1,67 @@
+"""Recurring quests are issued once per period in set-based, idempotent batches."""
+import logging
+from datetime import datetime
+
+from app.models import db, User, Quest, RecurringQuest
+from app.quest_scheduler import materialize
+from query_count import count_queries
+
+
+def test_materialize_is_batched_and_idempotent(app, caplog):
+    with app.app_context():
+        utc = User(username='utc', email='utc@example.com', password_hash='x')
+        tokyo = User(username='tokyo', email='tokyo@example.com', password_hash='x', timezone='Asia/Tokyo')
+        db.session.add_all([utc, tokyo])
+        db.session.flush()
+        for i in range(5):
+            db.session.add(RecurringQuest(user_id=utc.id, title=f'Daily {i}', difficulty='E',
+                                          xp_reward=50, quest_type='daily'))
+        db.session.add_all([
+            RecurringQuest(user_id=tokyo.id, title='Weekly', difficulty='C', xp_reward=150, quest_type='weekly'),
+            RecurringQuest(user_id=tokyo.id, title='Ended', difficulty='E', quest_type='daily',
+                           until=datetime(2026, 10, 14)),
+            RecurringQuest(user_id=utc.id, title='Stopped', difficulty='E', quest_type='daily', active=False),
+        ])
+        db.session.commit()
+
+        # Wednesday 2026-10-14 20:00 UTC is already Thursday morning in Tokyo
+        now = datetime(2026, 10, 14, 20)
+        caplog.set_level(logging.INFO)
+        with count_queries(db.engine) as statements:
+            summary = materialize(now=now, batch_size=2)
+        assert summary == {'templates': 6, 'created': 6, 'batches': 4}
+        assert sum(s.startswith('INSERT INTO quest') for s in statements) == 4
+        assert sum('Quest scheduler:' in record.message for record in caplog.records) == 4
+
+        daily = Quest.query.filter_by(user_id=utc.id).order_by(Quest.id).all()
+        assert [q.title for q in daily] == [f'Daily {i}' for i in range(5)]
+        assert daily[0].deadline == datetime(2026, 10, 15) and not daily[0].completed
+        weekly = Quest.query.filter_by(user_id=tokyo.id).one()
+        # Tokyo's week ends at local midnight on Monday 10-19, 15:00 UTC the day before
+        assert (weekly.title, weekly.xp_reward, weekly.deadline) == ('Weekly', 150, datetime(2026, 10, 18, 15))
+
+        # A second run in the same period is a no-op; the next day issues new dailies
+        assert materialize(now=now, batch_size=2)['created'] == 0
+        assert materialize(now=datetime(2026, 10, 15, 12))['created'] == 5
+        assert Quest.query.count() == 11
+
+
+def test_recurring_task_endpoint(app, auth_client):
+    client = auth_client
+    resp = client.post('/pd/tasks/new', json={'title': 'Push-ups', 'description': '100 reps', 'difficulty': 'E',
+                                              'quest_type': 'daily', 'recurring': True})
+    body = resp.get_json()
+    assert body['quest_id'] is not None
+
+    with app.app_context():
+        quest = db.session.get(Quest, body['quest_id'])
+        assert quest.recurring_quest_id == body['recurring_quest_id'] and quest.title == 'Push-ups'
+        assert materialize()['created'] == 0
+
+    assert client.post(f"/pd/tasks/recurring/{body['recurring_quest_id']}/stop").status_code == 200
+    with app.app_context():
+        assert not db.session.get(RecurringQuest, body['recurring_quest_id']).active
+
+    resp = client.post('/pd/tasks/new', json={'title': 'Boss', 'description': '', 'difficulty': 'S',
+                                              'quest_type': 'achievement', 'recurring': True})
+    assert resp.status_code == 400
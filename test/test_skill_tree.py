@@ -0,0 +1,109 @@
+"""Skill trees: cached graphs, incremental unlock frontiers and the nodes API."""
+from app.models import db, User, Skill, SkillNode, NodeDependency, UserSkillNode
+from app.skill_tree import get_skill_tree
+from query_count import count_queries
+
+
+def build_tree():
+    """basics -> (loops, functions) -> recursion; loops ..> style (optional)."""
+    skill = Skill(name='Python')
+    db.session.add(skill)
+    db.session.flush()
+    nodes = {title: SkillNode(skill_id=skill.id, title=title, xp_reward=100,
+                              node_type='topic' if title == 'basics' else 'lesson')
+             for title in ('recursion', 'functions', 'loops', 'basics', 'style')}
+    db.session.add_all(nodes.values())
+    db.session.flush()
+    for node, requires, required in [('loops', 'basics', True), ('functions', 'basics', True),
+                                     ('recursion', 'loops', True), ('recursion', 'functions', True),
+                                     ('style', 'loops', False)]:
+        db.session.add(NodeDependency(node_id=nodes[node].id, requires_id=nodes[requires].id, required=required))
+    db.session.commit()
+    return skill.id, {title: node.id for title, node in nodes.items()}
+
+
+def test_graph_order_and_incremental_frontier(app):
+    with app.app_context():
+        skill_id, ids = build_tree()
+        engine = get_skill_tree()
+
+        graph = engine.graphs()[skill_id]
+        position = {node_id: index for index, node_id in enumerate(graph.order)}
+        assert position[ids['basics']] < position[ids['loops']] < position[ids['recursion']]
+        assert position[ids['functions']] < position[ids['recursion']]
+        with count_queries(db.engine) as statements:
+            assert engine.graphs()[skill_id] is graph
+        assert statements == []
+
+        # Optional edges don't lock a node
+        assert engine.unlockable(1, graph, set()) == {ids['basics'], ids['style']}
+        assert engine.unlockable(1, graph, {ids['basics']}) == {ids['loops'], ids['functions'], ids['style']}
+        assert engine.unlockable(1, graph, {ids['basics'], ids['loops']}) == {ids['functions'], ids['style']}
+        everything_but_recursion = {ids['basics'], ids['loops'], ids['functions']}
+        assert engine.unlockable(1, graph, everything_but_recursion) == {ids['recursion'], ids['style']}
+        # Undone progress rebuilds the frontier instead of advancing it
+        assert engine.unlockable(1, graph, {ids['basics']}) == {ids['loops'], ids['functions'], ids['style']}
+
+        # Editing the tree drops the cached graph
+        db.session.add(SkillNode(skill_id=skill_id, title='generators'))
+        db.session.commit()
+        assert engine.graphs()[skill_id] is not graph
+
+
+def test_skill_nodes_api(app, auth_client, user_id):
+    client = auth_client
+    with app.app_context():
+        skill_id, ids = build_tree()
+
+    assert client.get('/skills').status_code == 200
+
+    resp = client.get('/api/skills/nodes')
+    document = resp.get_json()
+    statuses = {node['label']: node['status'] for node in document['nodes']}
+    assert statuses == {'basics': 'unlocked', 'loops': 'locked', 'functions': 'locked',
+                        'recursion': 'locked', 'style': 'unlocked'}
+    assert document['nodes'][0]['group'] == 'topic'
+    assert {'from': ids['loops'], 'to': ids['style'], 'dashes': True} in document['edges']
+    assert document['skills'] == [{'id': skill_id, 'name': 'Python', 'completed': 0, 'total': 5}]
+
+    etag = resp.headers['ETag']
+    assert client.get('/api/skills/nodes', headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.post(f"/api/skills/nodes/{ids['loops']}", json={'status': 'completed'}).status_code == 400
+    assert client.post(f"/api/skills/nodes/{ids['basics']}", json={'status': 'in-progress'}).status_code == 200
+    result = client.post(f"/api/skills/nodes/{ids['basics']}", json={'status': 'completed'}).get_json()
+    assert result['xp_gained'] == 100
+    assert sorted(result['unlocked']) == sorted([ids['loops'], ids['functions']])
+    assert client.post(f"/api/skills/nodes/{ids['basics']}", json={'status': 'completed'}).status_code == 400
+
+    resp = client.get('/api/skills/nodes', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    statuses = {node['label']: node['status'] for node in resp.get_json()['nodes']}
+    assert (statuses['basics'], statuses['loops']) == ('completed', 'unlocked')
+
+    with app.app_context():
+        assert db.session.get(User, user_id).xp == 100
+        assert UserSkillNode.query.count() == 1
+
+    assert client.get('/api/skills/nodes?skill=999').status_code == 404
+
+
+def test_concurrent_first_submit_claims_the_existing_row(app, auth_client, user_id, monkeypatch):
+    with app.app_context():
+        skill_id, ids = build_tree()
+        engine = get_skill_tree()
+        assert engine.graph_for_node(ids['basics']) is engine.graphs()[skill_id]
+        assert engine.graph_for_node(999) is None
+        db.session.add(UserSkillNode(user_id=user_id, node_id=ids['basics'], status='in-progress'))
+        db.session.commit()
+    # Both requests read their progress before either row was written
+    monkeypatch.setattr(type(engine), 'user_progress', lambda self, user_id: {})
+
+    result = auth_client.post(f"/api/skills/nodes/{ids['basics']}", json={'status': 'completed'})
+    assert result.status_code == 200 and result.get_json()['xp_gained'] == 100
+    again = auth_client.post(f"/api/skills/nodes/{ids['basics']}", json={'status': 'completed'})
+    assert again.status_code == 400
+
+    with app.app_context():
+        assert db.session.get(User, user_id).xp == 100
+        assert UserSkillNode.query.one().status == 'completed'
@@ -0,0 +1,67 @@
+"""Legacy JSON stats are copied into the typed columns in resumable chunks."""
+import json
+
+from sqlalchemy import text
+
+from app.models import db, User
+from scripts.migrate_legacy_stats import backfill
+
+
+def make_legacy_db(tmp_path, make_app, add_user):
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'legacy.db'))
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE "user" ADD COLUMN core_stats JSON'))
+            conn.execute(text('ALTER TABLE "user" ADD COLUMN player_stats JSON'))
+        for n in range(5):
+            add_user(f'legacy{n}')
+        with db.engine.begin() as conn:
+            for n in range(5):
+                conn.execute(text('UPDATE "user" SET core_stats = :core, player_stats = :player WHERE username = :name'), {
+                    'core': json.dumps({'strength': 20 + n, 'Agility': 11}),
+                    'player': json.dumps([{'name': 'books_read', 'value': n}, {'meditation_streak': 7}]),
+                    'name': f'legacy{n}',
+                })
+    return app
+
+
+def test_backfill_resumes_from_checkpoint(tmp_path, make_app, add_user):
+    app = make_legacy_db(tmp_path, make_app, add_user)
+    with app.app_context():
+        checkpoints = []
+        assert backfill(db.engine, chunk_size=2, start_after=2, on_chunk=checkpoints.append) == 3
+        assert checkpoints == [4, 5]
+
+        # A fresh run only picks up the users the first one skipped
+        assert backfill(db.engine, chunk_size=2, on_chunk=checkpoints.append) == 2
+        assert checkpoints == [4, 5, 2]
+
+        db.session.expire_all()
+        users = User.query.order_by(User.id).all()
+        assert [u.strength for u in users] == [20, 21, 22, 23, 24]
+        assert [u.books_read for u in users] == [0, 1, 2, 3, 4]
+        assert all(u.agility == 11 and u.meditation_streak == 7 and u.intelligence == 10 for u in users)
+
+
+def test_backfill_keeps_increments_made_after_deploy(tmp_path, make_app, add_user):
+    app = make_legacy_db(tmp_path, make_app, add_user)
+    with app.app_context():
+        # The app is already serving and bumping the typed columns
+        with db.engine.begin() as conn:
+            conn.execute(text('UPDATE "user" SET books_read = books_read + 1, system_strength = system_strength + 1'))
+        assert backfill(db.engine, chunk_size=2) == 5
+        with db.engine.begin() as conn:
+            conn.execute(text('UPDATE "user" SET books_read = books_read + 1'))
+
+        # Moved users are never added again
+        assert backfill(db.engine, chunk_size=2) == 0
+
+        db.session.expire_all()
+        users = User.query.order_by(User.id).all()
+        assert [u.strength for u in users] == [21, 22, 23, 24, 25]
+        assert [u.books_read for u in users] == [2, 3, 4, 5, 6]
+        assert users[4].player_stats['books_read'] == 6
+        with db.engine.connect() as conn:
+            assert conn.execute(text(
+                'SELECT COUNT(*) FROM "user" WHERE core_stats IS NOT NULL OR player_stats IS NOT NULL'
+            )).scalar() == 0
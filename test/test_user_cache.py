@@ -0,0 +1,56 @@
+"""Cached Flask-Login user loader."""
+from app.counters import award_xp
+from app.models import db, User
+from app.user_cache import get_user_cache
+from query_count import count_queries
+
+
+def user_selects(statements):
+    return [s for s in statements if s.startswith('SELECT user.')]
+
+
+def test_cached_user_loader(app, auth_client):
+    # Requests run outside a test-held app context so each gets a fresh session
+    client = auth_client
+    with app.app_context():
+        engine = db.engine
+    client.get('/player_info')
+
+    with count_queries(engine) as statements:
+        resp = client.get('/player_info')
+    assert resp.status_code == 200
+    assert user_selects(statements) == []
+
+    # Writes always load the current row, and an ORM update evicts the cache
+    with count_queries(engine) as statements:
+        client.post('/complete-book')
+    assert statements[0].startswith('SELECT user.')
+
+    with count_queries(engine) as statements:
+        resp = client.get('/dashboard')
+    assert 'Total XP: 150' in resp.get_data(as_text=True)
+    assert len(user_selects(statements)) == 1
+
+
+def test_cache_disabled(make_app, add_user, login):
+    app = make_app(USER_CACHE_TTL=0)
+    with app.app_context():
+        add_user('cached')
+        engine = db.engine
+    client = app.test_client()
+    login(client, 'cached')
+    client.get('/player_info')
+
+    with count_queries(engine) as statements:
+        client.get('/player_info')
+    assert len(user_selects(statements)) == 1
+
+
+def test_cache_dropped_again_after_commit(app, user_id):
+    with app.app_context():
+        cache = get_user_cache()
+        award_xp(db.session.get(User, user_id), 50)
+        # A concurrent GET re-caches the row before this transaction commits
+        cache.backend.set(user_id, {'id': user_id, 'xp': 0}, cache.ttl)
+        db.session.commit()
+        assert cache.backend.get(user_id) is None
@@ -0,0 +1,55 @@
+"""XP awards maintain hour/day/week buckets that window queries merge."""
+from datetime import datetime
+
+from app.models import db, User, XpBucket
+from app.xp_windows import bump, split_window, xp_gained, xp_series
+from query_count import count_queries
+
+
+def test_split_window_uses_the_largest_buckets():
+    # Wed 2026-10-07 22:30 to Tue 2026-10-20 01:00: hours, days, one week, days, hours
+    ranges = split_window(datetime(2026, 10, 7, 22, 30), datetime(2026, 10, 20, 1, 0))
+    assert [(granularity, stop - first) for granularity, first, stop in ranges] == [
+        ('hour', 2), ('hour', 1), ('day', 4), ('day', 1), ('week', 1)]
+    assert split_window(datetime(2026, 10, 7, 10, 15), datetime(2026, 10, 7, 10, 45))[0][0] == 'hour'
+    assert split_window(datetime(2026, 10, 7, 11), datetime(2026, 10, 7, 11)) == []
+
+
+def test_windows_merge_buckets(app):
+    with app.app_context():
+        u = User(username='hunter', email='hunter@example.com', password_hash='x')
+        db.session.add(u)
+        db.session.commit()
+
+        for moment, amount in [(datetime(2026, 10, 5, 9), 10), (datetime(2026, 10, 5, 9, 40), 5),
+                               (datetime(2026, 10, 12, 23), 20), (datetime(2026, 10, 19, 0, 30), 40)]:
+            bump(u.id, amount, now=moment)
+        db.session.commit()
+        assert db.session.query(XpBucket).count() == 3 * 3  # the two 10-05 awards share buckets
+
+        user_id = u.id
+        with count_queries(db.engine) as queries:
+            assert xp_gained(user_id, datetime(2026, 10, 1), datetime(2026, 10, 31)) == 75
+        assert len(queries) == 1
+        assert xp_gained(u.id, datetime(2026, 10, 5, 9, 30), datetime(2026, 10, 19)) == 35
+        assert xp_gained(u.id, datetime(2026, 10, 5, 10), datetime(2026, 10, 19)) == 20
+        assert xp_gained(u.id, datetime(2026, 10, 12), datetime(2026, 10, 19, 1)) == 60
+
+        assert [b['xp'] for b in xp_series(u.id, 'week', datetime(2026, 10, 5), datetime(2026, 10, 26))] == [
+            15, 20, 40]
+
+
+def test_awards_fill_buckets_and_api(app, auth_client, user_id):
+    client = auth_client
+    client.post('/complete-habit')
+    client.post('/complete-book')
+
+    with app.app_context():
+        xp = db.session.get(User, user_id).xp
+
+    window = client.get('/api/xp-window?granularity=day').get_json()
+    assert window['xp'] == xp > 0
+    assert len(window['buckets']) == 8 and window['buckets'][-1]['xp'] == xp
+
+    assert client.get('/api/xp-window?granularity=hour&start=2020-01-01T00:00').status_code == 400
+    assert client.get('/api/xp-window?start=2026-10-19&end=2026-10-18').status_code == 400